@@ -0,0 +1,516 @@
+"""Graph runner for the Deep Research pipeline.
+
+    plan -> research -> analyze -> critique -> report
+                           ^           |
+                           +- reflect -+
+
+The planner splits the query into tasks, each with its own tool calls and
+the tasks it builds on. Research runs the plan in waves: every task whose
+dependencies are done runs as a parallel branch (its tool fan-out, then a
+summary of its findings), and the branches are merged into the state in
+plan order once the wave is complete.
+
+The critic scores each draft. The loop ends as soon as its confidence
+reaches ``research_confidence_threshold``, when ``max_iterations`` drafts
+have been written, or when the critic's answer cannot be read. Otherwise
+reflection re-runs only the tool calls of the tools the critic flagged,
+keeps every other result from before, and the draft is revised.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import update
+
+from agents.state import PlannedToolCall, ResearchPlan, ResearchState, ThoughtStep
+from api.websocket import ws_manager
+from config import get_settings
+from llm.gateway import LLMGateway, llm_gateway
+from llm.providers import LLMError
+from models import ResearchSession
+from services.persistence import SessionWriter, session_writer
+from services.report_stream import ReportStream
+from tools.base import ToolCall, ToolRegistry, tool_registry
+from utils import async_session_factory, logger
+
+PLANNER_SYSTEM = (
+    "You plan equity research on Indian listed companies. Reply with JSON only: "
+    '{"tasks": [{"task": str, "tools": [{"tool_name": str, "params": {}}], '
+    '"depends_on": [task indices]}], "rationale": str}. Make tasks independent '
+    "unless one needs another's findings."
+)
+ANALYST_SYSTEM = "You are an equity research analyst. Cite the data you rely on."
+CRITIC_SYSTEM = (
+    "You review equity research drafts. Reply with JSON only: "
+    '{"confidence": number between 0 and 1, "feedback": str, '
+    '"flagged_tools": [names of tools whose data is missing, stale or wrong]}.'
+)
+REPORTER_SYSTEM = "You write equity research reports in Markdown."
+
+_JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+
+def _parse_json(text: str) -> dict[str, Any] | None:
+    """The JSON object in an LLM reply (fenced or not), or None."""
+    match = _JSON_OBJECT.search(text)
+    if match is None:
+        return None
+    try:
+        data = json.loads(match.group(0))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def parse_plan(text: str, query: str) -> ResearchPlan:
+    """Read the planner's reply; fall back to researching the query as one task."""
+    data = _parse_json(text) or {}
+    kept = [
+        (i, item)
+        for i, item in enumerate(data.get("tasks") or [])
+        if isinstance(item, dict) and item.get("task")
+    ]
+    if not kept:
+        return ResearchPlan(
+            tasks=[query],
+            tools_needed=[],
+            rationale="The planner's reply could not be read; researching the query directly.",
+        )
+    # The planner's dependency indices count every item, unreadable ones included
+    renumber = {old: new for new, (old, _) in enumerate(kept)}
+    task_tools, depends_on = {}, {}
+    for i, (_, item) in enumerate(kept):
+        task_tools[i] = [
+            PlannedToolCall(tool_name=str(c["tool_name"]), params=c.get("params") or {})
+            for c in item.get("tools") or []
+            if isinstance(c, dict) and c.get("tool_name")
+        ]
+        depends_on[i] = [
+            renumber[d]
+            for d in item.get("depends_on") or []
+            if isinstance(d, int) and d in renumber
+        ]
+    return ResearchPlan(
+        tasks=[str(item["task"]) for _, item in kept],
+        tools_needed=sorted({c.tool_name for calls in task_tools.values() for c in calls}),
+        rationale=str(data.get("rationale") or ""),
+        task_tools=task_tools,
+        depends_on=depends_on,
+    )
+
+
+def task_waves(plan: ResearchPlan) -> list[list[int]]:
+    """Task indices grouped so each wave depends only on earlier waves.
+
+    Dependencies on unknown tasks are ignored; tasks caught in a cycle run
+    together in a last wave.
+    """
+    count = len(plan.tasks)
+    pending = {
+        i: {d for d in plan.depends_on.get(i, []) if 0 <= d < count and d != i}
+        for i in range(count)
+    }
+    waves = []
+    while pending:
+        ready = sorted(i for i, deps in pending.items() if not deps)
+        if not ready:
+            ready = sorted(pending)
+        waves.append(ready)
+        for i in ready:
+            del pending[i]
+        for deps in pending.values():
+            deps.difference_update(ready)
+    return waves
+
+
+class _Branch:
+    """What one task's branch adds to the state."""
+
+    __slots__ = ("task", "calls", "results", "findings")
+
+    def __init__(self, task: int, calls: list[PlannedToolCall], results: list, findings: str):
+        self.task = task
+        self.calls = calls
+        self.results = results
+        self.findings = findings
+
+
+class ResearchGraph:
+    """Runs the Deep Research pipeline for one session at a time per ``run`` call."""
+
+    def __init__(
+        self,
+        llm: LLMGateway | None = None,
+        tools: ToolRegistry | None = None,
+        writer: SessionWriter | None = None,
+    ) -> None:
+        settings = get_settings()
+        self.llm = llm or llm_gateway
+        self.tools = tools or tool_registry
+        self.writer = writer or session_writer
+        self.threshold = settings.research_confidence_threshold
+        self.output_chars = settings.research_tool_output_chars
+
+    async def run(
+        self, session_id: str, query: str, max_iterations: int = 2, include_news: bool = True
+    ) -> ResearchState:
+        """Run every node for a session and return the final state.
+
+        Rows left by an earlier attempt of the session are dropped first, so a
+        retried job does not duplicate them. On failure the session is moved
+        to "error" and the exception propagates to the worker.
+        """
+        state: ResearchState = {
+            "session_id": session_id,
+            "query": query,
+            "ticker": None,
+            "current_step": 0,
+            "thought_log": [],
+            "tool_calls": [],
+            "tool_call_tasks": [],
+            "tool_results": [],
+            "task_findings": [],
+            "citations": [],
+            "critic_feedback": "",
+            "confidence": None,
+            "flagged_tools": [],
+            "iteration_count": 0,
+        }
+        try:
+            await self.writer.reset_session(session_id)
+            await self._plan(state, include_news)
+            await self._research(state)
+            while True:
+                await self._analyze(state)
+                readable = await self._critique(state)
+                if not readable or state["confidence"] >= self.threshold:
+                    break
+                if state["iteration_count"] >= max_iterations:
+                    break
+                await self._reflect(state)
+            await self._report(state)
+        except Exception as exc:
+            try:
+                await self._set_status(state, "error")
+            except Exception as status_exc:
+                await logger.aerror(
+                    "research_status_failed", session_id=session_id, error=str(status_exc)
+                )
+            await logger.aerror("research_failed", session_id=session_id, error=str(exc))
+            raise
+        return state
+
+    # -- Nodes -------------------------------------------------------------
+
+    async def _plan(self, state: ResearchState, include_news: bool) -> None:
+        await self._set_status(state, "planning")
+        tools = "\n".join(f"- {t['name']}: {t['description']}" for t in self.tools.list_tools())
+        reply = await self.llm.complete(
+            f"Query: {state['query']}\n"
+            f"News sentiment: {'include' if include_news else 'skip'}\n"
+            f"Available tools:\n{tools or '- none'}",
+            system=PLANNER_SYSTEM,
+        )
+        plan = parse_plan(reply.text, state["query"])
+        state["plan"] = plan
+        await self._think(
+            state,
+            "planning",
+            f"Planned {len(plan.tasks)} task(s)",
+            "\n".join(f"{i + 1}. {task}" for i, task in enumerate(plan.tasks))
+            + (f"\n\n{plan.rationale}" if plan.rationale else ""),
+        )
+
+    async def _research(self, state: ResearchState) -> None:
+        await self._set_status(state, "researching")
+        plan = state["plan"]
+        findings = [""] * len(plan.tasks)
+        for wave in task_waves(plan):
+            branches = await asyncio.gather(*(self._branch(state, i, findings) for i in wave))
+            for branch in branches:  # merged in plan order, whatever finished first
+                findings[branch.task] = branch.findings
+                state["tool_calls"].extend(branch.calls)
+                state["tool_call_tasks"].extend([branch.task] * len(branch.calls))
+                state["tool_results"].extend(branch.results)
+                for result in branch.results:
+                    state["citations"].extend(result.citations)
+        state["task_findings"] = findings
+
+    async def _branch(self, state: ResearchState, task: int, findings: list[str]) -> _Branch:
+        plan = state["plan"]
+        calls = [
+            c for c in plan.task_tools.get(task, []) if self.tools.get(c.tool_name) is not None
+        ]
+        results = await self.tools.run_many(
+            [ToolCall(tool_name=c.tool_name, params=c.params) for c in calls]
+        )
+        text = await self._summarize(state, task, results, findings)
+        step_id = await self._think(state, "researching", plan.tasks[task], text)
+        for call, result in zip(calls, results):
+            await self.writer.record_tool_execution(
+                state["session_id"],
+                step_id,
+                call.tool_name,
+                call.params,
+                result.output if result.error is None else {"error": result.error},
+                result.execution_time_ms,
+            )
+        return _Branch(task, calls, results, text)
+
+    async def _analyze(self, state: ResearchState) -> None:
+        await self._set_status(state, "analyzing")
+        state["iteration_count"] += 1
+        plan = state["plan"]
+        findings = "\n\n".join(
+            f"## {task}\n{text}" for task, text in zip(plan.tasks, state["task_findings"])
+        )
+        revision = ""
+        if state["critic_feedback"]:
+            revision = (
+                f"\n\nPrevious draft:\n{state['analysis_draft']}\n\n"
+                f"Reviewer feedback to address:\n{state['critic_feedback']}"
+            )
+        reply = await self.llm.complete(
+            f"Research query: {state['query']}\n\nFindings:\n{findings}\n\n"
+            f"Tool data:\n{self._tool_digest(state['tool_results'])}{revision}\n\n"
+            "Write the analysis.",
+            system=ANALYST_SYSTEM,
+            max_tokens=2048,
+        )
+        state["analysis_draft"] = reply.text
+        await self._think(
+            state, "analyzing", f"Draft {state['iteration_count']}", reply.text[:500]
+        )
+
+    async def _critique(self, state: ResearchState) -> bool:
+        """Score the draft; False if the critic's reply could not be read."""
+        await self._set_status(state, "reflecting")
+        used = {c.tool_name for c in state["tool_calls"]}
+        # Identical drafts get identical prompts, so repeat reviews hit the LLM cache
+        reply = await self.llm.complete(
+            f"Research query: {state['query']}\n\nDraft:\n{state['analysis_draft']}\n\n"
+            f"Tools used: {', '.join(sorted(used)) or 'none'}",
+            system=CRITIC_SYSTEM,
+        )
+        verdict = _parse_json(reply.text)
+        try:
+            confidence = min(1.0, max(0.0, float(verdict["confidence"])))
+        except (TypeError, KeyError, ValueError):
+            await logger.awarning("research_critic_unreadable", session_id=state["session_id"])
+            state["confidence"] = None
+            return False
+        flagged = verdict.get("flagged_tools") or []
+        state["confidence"] = confidence
+        state["critic_feedback"] = str(verdict.get("feedback") or "")
+        state["flagged_tools"] = sorted({str(t) for t in flagged if t in used})
+        await self._think(
+            state,
+            "reflecting",
+            f"Review of draft {state['iteration_count']}",
+            state["critic_feedback"],
+            confidence,
+        )
+        return True
+
+    async def _reflect(self, state: ResearchState) -> None:
+        """Refetch the flagged tools' calls and re-summarize the tasks they feed.
+
+        Every other tool result is reused as is.
+        """
+        flagged = set(state["flagged_tools"])
+        rerun = [i for i, c in enumerate(state["tool_calls"]) if c.tool_name in flagged]
+        if not rerun:
+            return  # the draft is revised from the feedback alone
+        calls = [state["tool_calls"][i] for i in rerun]
+        for call in calls:
+            # Otherwise the tool result cache would answer with the same data
+            await self.tools.get(call.tool_name).invalidate(call.params)
+        results = await self.tools.run_many(
+            [ToolCall(tool_name=c.tool_name, params=c.params) for c in calls]
+        )
+        for i, result in zip(rerun, results):
+            state["tool_results"][i] = result
+        state["citations"] = [c for r in state["tool_results"] for c in r.citations]
+
+        # Tasks with refetched data, then every task building on their findings
+        plan = state["plan"]
+        stale = {state["tool_call_tasks"][i] for i in rerun}
+        findings = state["task_findings"]
+        for wave in task_waves(plan):
+            wave = [
+                t for t in wave if t in stale or stale.intersection(plan.depends_on.get(t, []))
+            ]
+            stale.update(wave)
+            texts = await asyncio.gather(
+                *(self._summarize(state, t, self._task_results(state, t), findings) for t in wave)
+            )
+            for task, text in zip(wave, texts):
+                findings[task] = text
+
+        step_id = await self._think(
+            state,
+            "researching",
+            f"Refetched {', '.join(sorted(flagged))}",
+            f"Re-ran {len(rerun)} of {len(state['tool_calls'])} tool call(s).",
+        )
+        for call, result in zip(calls, results):
+            await self.writer.record_tool_execution(
+                state["session_id"],
+                step_id,
+                call.tool_name,
+                call.params,
+                result.output if result.error is None else {"error": result.error},
+                result.execution_time_ms,
+            )
+
+    async def _report(self, state: ResearchState) -> None:
+        """Write both report sections, streaming each chunk as it is generated.
+
+        The full report is generated alongside the executive summary; its
+        chunks queue up until the summary is written, so each section's
+        deltas stay contiguous.
+        """
+        await self._set_status(state, "reporting")
+        draft = state["analysis_draft"]
+        summary_chunks = self.llm.stream(
+            f"Summarize for an investor in five bullet points:\n\n{draft}",
+            system=REPORTER_SYSTEM,
+        )
+        report_chunks = self.llm.stream(
+            f"Research query: {state['query']}\n\nAnalysis:\n{draft}\n\n"
+            "Write the full report with sections and a conclusion.",
+            system=REPORTER_SYSTEM,
+            max_tokens=4096,
+        )
+        pending: asyncio.Queue[str | None] = asyncio.Queue()
+
+        async def generate_report() -> None:
+            try:
+                async for chunk in report_chunks:
+                    await pending.put(chunk)
+            finally:
+                await pending.put(None)
+
+        stream = ReportStream(state["session_id"])
+        generating = asyncio.create_task(generate_report())
+        try:
+            summary = []
+            async for chunk in summary_chunks:
+                summary.append(chunk)
+                await stream.write("executive_summary", chunk)
+            report = []
+            while (chunk := await pending.get()) is not None:
+                report.append(chunk)
+                await stream.write("full_report", chunk)
+            await generating  # raises if the report's generation failed
+        finally:
+            generating.cancel()
+            await asyncio.gather(generating, return_exceptions=True)
+            # Close both generations now, not at GC: each holds a gateway slot
+            await summary_chunks.aclose()
+            await report_chunks.aclose()
+        state["executive_summary"] = "".join(summary)
+        state["final_report"] = "".join(report)
+        await stream.finish(
+            {
+                "iterations": state["iteration_count"],
+                "confidence": state["confidence"],
+                "tasks": len(state["plan"].tasks),
+                "tool_calls": len(state["tool_calls"]),
+            }
+        )
+        for n, citation in enumerate(state["citations"], start=1):
+            await self.writer.record_citation(
+                state["session_id"],
+                f"[{n}]",
+                citation.source_type,
+                citation.source_name,
+                citation.url,
+                citation.content_snippet,
+                citation.page_number,
+            )
+        await self.writer.complete_session(state["session_id"])
+        await self._set_status(state, "complete")
+
+    # -- Helpers -----------------------------------------------------------
+
+    async def _summarize(
+        self, state: ResearchState, task: int, results: list, findings: list[str]
+    ) -> str:
+        """What a task's tool data (and the findings it builds on) shows; "" on failure."""
+        plan = state["plan"]
+        context = "\n".join(
+            f"Findings of '{plan.tasks[d]}':\n{findings[d]}"
+            for d in plan.depends_on.get(task, [])
+            if 0 <= d < len(findings) and findings[d]
+        )
+        try:
+            reply = await self.llm.complete(
+                f"Research query: {state['query']}\nTask: {plan.tasks[task]}\n"
+                f"{context}\nTool data:\n{self._tool_digest(results)}\n"
+                "Summarize what this data shows for the task.",
+                system=ANALYST_SYSTEM,
+            )
+        except LLMError as exc:
+            await logger.awarning("research_branch_failed", task=task, error=str(exc))
+            return ""
+        return reply.text
+
+    @staticmethod
+    def _task_results(state: ResearchState, task: int) -> list:
+        return [
+            result
+            for result, owner in zip(state["tool_results"], state["tool_call_tasks"])
+            if owner == task
+        ]
+
+    async def _think(
+        self,
+        state: ResearchState,
+        step_type: str,
+        title: str,
+        content: str = "",
+        confidence: float | None = None,
+    ) -> UUID:
+        state["current_step"] += 1
+        state["thought_log"].append(
+            ThoughtStep(step_type=step_type, title=title, content=content, confidence=confidence)
+        )
+        return await self.writer.record_thought_step(
+            state["session_id"], state["current_step"], step_type, title, content, confidence
+        )
+
+    async def _set_status(self, state: ResearchState, status: str) -> None:
+        """Move the session to ``status``; a no-op once the user has cancelled it."""
+        async with async_session_factory() as db:
+            result = await db.execute(
+                update(ResearchSession)
+                .where(
+                    ResearchSession.id == UUID(state["session_id"]),
+                    ResearchSession.status != "cancelled",
+                )
+                .values(status=status)
+            )
+            await db.commit()
+        if result.rowcount == 0:
+            return  # cancelled; the worker stops the job
+        state["status"] = status
+        await ws_manager.send_status(state["session_id"], status)
+
+    def _tool_digest(self, results: list) -> str:
+        parts = []
+        for result in results:
+            if result.error is not None:
+                parts.append(f"[{result.tool_name}] failed: {result.error}")
+                continue
+            output = json.dumps(result.output, default=str, separators=(",", ":"))
+            parts.append(f"[{result.tool_name}] {output[: self.output_chars]}")
+        return "\n".join(parts) or "(none)"
+
+
+research_graph = ResearchGraph()
@@ -30,6 +30,7 @@ class ToolResult(BaseModel):
     output: dict[str, Any]
     citations: list[Citation] = Field(default_factory=list)
     execution_time_ms: int = 0
+    error: str | None = None  # set when the tool failed or timed out
 
 
 class ThoughtStep(BaseModel):
@@ -41,12 +42,23 @@ class ThoughtStep(BaseModel):
     confidence: float | None = None
 
 
+class PlannedToolCall(BaseModel):
+    """A tool call the planner attached to one of its tasks."""
+
+    tool_name: str
+    params: dict[str, Any] = Field(default_factory=dict)
+
+
 class ResearchPlan(BaseModel):
     """A plan generated by the Planner node."""
 
     tasks: list[str]
     tools_needed: list[str]
     rationale: str
+    # By task index: the tool calls a task needs and the tasks it builds on.
+    # Tasks whose dependencies are done run as parallel branches.
+    task_tools: dict[int, list[PlannedToolCall]] = Field(default_factory=dict)
+    depends_on: dict[int, list[int]] = Field(default_factory=dict)
 
 
 # ==========================================================================
@@ -68,12 +80,17 @@ class ResearchState(TypedDict, total=False):
     thought_log: list[ThoughtStep]
 
     # Data
+    tool_calls: list[PlannedToolCall]  # tool_results[i] answers tool_calls[i]
+    tool_call_tasks: list[int]  # the plan task each tool call belongs to
     tool_results: list[ToolResult]
+    task_findings: list[str]  # one per plan task
     citations: list[Citation]
 
     # Analysis
     analysis_draft: str
     critic_feedback: str
+    confidence: float | None  # the critic's, for the current draft
+    flagged_tools: list[str]  # tools whose data the critic wants refetched
     iteration_count: int
 
     # Output
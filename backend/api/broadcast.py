@@ -0,0 +1,144 @@
+"""Broadcast backends that carry WebSocket events between processes.
+
+``ConnectionManager`` publishes every encoded event to a backend and the
+backend hands it to the ``deliver`` callback of each process that has a
+subscriber for that session. The in-memory backend delivers straight back to
+the publishing process (single worker). The Redis backend lets any process
+(API workers, job workers) publish and every API worker deliver to its own
+clients, using one pub/sub connection per process multiplexed across
+session channels.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections.abc import Callable
+
+from config import get_settings
+from utils import get_redis, logger
+
+# (session_id, kind, encoded event) -> None
+DeliverFn = Callable[[str, str, str], None]
+
+
+class BroadcastBackend(ABC):
+    """Pub/sub transport for encoded session events."""
+
+    def __init__(self) -> None:
+        self._deliver: DeliverFn | None = None
+
+    def bind(self, deliver: DeliverFn) -> None:
+        """Set the callback that receives events for locally subscribed sessions."""
+        self._deliver = deliver
+
+    @abstractmethod
+    async def publish(self, session_id: str, kind: str, text: str) -> None:
+        """Send an encoded event to every subscriber of a session."""
+        ...
+
+    @abstractmethod
+    async def subscribe(self, session_id: str) -> None:
+        """Start receiving events for a session in this process."""
+        ...
+
+    @abstractmethod
+    async def unsubscribe(self, session_id: str) -> None:
+        """Stop receiving events for a session in this process."""
+        ...
+
+    async def close(self) -> None:
+        """Release any connections held by the backend."""
+        return None
+
+
+class MemoryBroadcast(BroadcastBackend):
+    """Delivers in-process only. Correct only with a single worker."""
+
+    async def publish(self, session_id: str, kind: str, text: str) -> None:
+        if self._deliver is not None:
+            self._deliver(session_id, kind, text)
+
+    async def subscribe(self, session_id: str) -> None:
+        return None
+
+    async def unsubscribe(self, session_id: str) -> None:
+        return None
+
+
+class RedisBroadcast(BroadcastBackend):
+    """Redis pub/sub backend with one subscription connection per process."""
+
+    def __init__(self, prefix: str = "slingshot:ws:") -> None:
+        super().__init__()
+        self.prefix = prefix
+        self._pubsub = None
+        self._reader: asyncio.Task | None = None
+        self._channels: set[str] = set()
+
+    async def publish(self, session_id: str, kind: str, text: str) -> None:
+        # kind travels in front of the JSON so receivers need not re-parse it;
+        # encoded JSON never contains a raw newline
+        await get_redis().publish(self.prefix + session_id, f"{kind}\n{text}")
+
+    async def subscribe(self, session_id: str) -> None:
+        channel = self.prefix + session_id
+        if channel in self._channels:
+            return
+        self._channels.add(channel)
+        if self._pubsub is None:
+            self._pubsub = get_redis().pubsub()
+        await self._pubsub.subscribe(channel)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def unsubscribe(self, session_id: str) -> None:
+        channel = self.prefix + session_id
+        if channel not in self._channels:
+            return
+        self._channels.discard(channel)
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(channel)
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                await logger.awarning("ws_broadcast_read_error", error=str(exc))
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel = message["channel"]
+            if isinstance(channel, bytes):
+                channel = channel.decode()
+            data = message["data"]
+            if isinstance(data, bytes):
+                data = data.decode()
+            kind, _, text = data.partition("\n")
+            if self._deliver is not None:
+                self._deliver(channel.removeprefix(self.prefix), kind, text)
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self._channels.clear()
+
+
+def make_broadcast_backend() -> BroadcastBackend:
+    """Build the backend selected by ``Settings.ws_broadcast_backend``."""
+    backend = get_settings().ws_broadcast_backend
+    if backend == "redis":
+        return RedisBroadcast()
+    if backend == "memory":
+        return MemoryBroadcast()
+    raise ValueError(f"Unknown ws_broadcast_backend: {backend}")
@@ -0,0 +1,203 @@
+"""Bounded, sequence-numbered per-session event logs for WebSocket replay.
+
+Every event sent for a session is appended to its log and stamped with a
+per-session ``seq``. A client that reconnects with ``last_seq`` is sent only
+the events it missed. Logs are evicted shortly after a session reaches a
+terminal status; a client that falls further behind than the buffer holds is
+told to resync from the REST endpoints instead.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+from config import get_settings
+from utils import get_redis
+
+# Statuses after which a session emits nothing further
+TERMINAL_STATUSES = {"complete", "error", "cancelled"}
+
+
+def stamp_seq(seq: int, text: str) -> str:
+    """Insert ``seq`` as the first key of an encoded JSON object."""
+    return f'{{"seq":{seq},{text[1:]}' if text != "{}" else f'{{"seq":{seq}}}'
+
+
+def seq_of(text: str) -> int:
+    """Read back the seq stamped by ``stamp_seq`` (0 if absent)."""
+    if not text.startswith('{"seq":'):
+        return 0
+    end = text.find(",", 7)
+    return int(text[7:end] if end != -1 else text[7:-1])
+
+
+class EventLog(ABC):
+    """Per-session replay buffer of encoded events."""
+
+    @abstractmethod
+    async def append(self, session_id: str, kind: str, text: str) -> str:
+        """Assign the next seq to an encoded event and store it.
+
+        Returns the encoded event with its seq stamped in.
+        """
+        ...
+
+    @abstractmethod
+    async def since(self, session_id: str, last_seq: int) -> tuple[list[tuple[str, str]], bool]:
+        """Return ``(kind, text)`` for events after ``last_seq``, oldest first.
+
+        The flag is True when events after ``last_seq`` have already been
+        evicted, so the replay is incomplete.
+        """
+        ...
+
+    @abstractmethod
+    async def close_session(self, session_id: str) -> None:
+        """Schedule eviction of a finished session's log."""
+        ...
+
+
+class MemoryEventLog(EventLog):
+    """In-process ring buffers. Only sees events produced in this process."""
+
+    def __init__(
+        self,
+        max_events: int | None = None,
+        grace_seconds: float | None = None,
+        idle_seconds: float = 3600.0,
+    ) -> None:
+        settings = get_settings()
+        self.max_events = max_events or settings.ws_event_log_size
+        self.grace_seconds = (
+            settings.ws_event_log_grace_seconds if grace_seconds is None else grace_seconds
+        )
+        self.idle_seconds = idle_seconds
+        # session_id -> (ring of (seq, kind, text), last seq, last append time),
+        # least recently appended first
+        self._logs: OrderedDict[str, tuple[deque[tuple[int, str, str]], int, float]] = (
+            OrderedDict()
+        )
+        self._closing: dict[str, asyncio.TimerHandle] = {}
+
+    async def append(self, session_id: str, kind: str, text: str) -> str:
+        now = time.monotonic()
+        self._cancel_close(session_id)  # a retried session is live again
+        entry = self._logs.pop(session_id, None)
+        ring, last, _ = entry or (deque(maxlen=self.max_events), 0, now)
+        seq = last + 1
+        stamped = stamp_seq(seq, text)
+        ring.append((seq, kind, stamped))
+        self._logs[session_id] = (ring, seq, now)
+        self._evict_idle(now)
+        return stamped
+
+    async def since(self, session_id: str, last_seq: int) -> tuple[list[tuple[str, str]], bool]:
+        entry = self._logs.get(session_id)
+        if entry is None:
+            # A client holding a seq saw events that have since been evicted
+            return [], last_seq > 0
+        ring, last, _ = entry
+        events = [(kind, text) for seq, kind, text in ring if seq > last_seq]
+        truncated = last > last_seq and (not ring or ring[0][0] > last_seq + 1)
+        return events, truncated
+
+    async def close_session(self, session_id: str) -> None:
+        self._cancel_close(session_id)
+        self._closing[session_id] = asyncio.get_running_loop().call_later(
+            self.grace_seconds, self._evict, session_id
+        )
+
+    def _cancel_close(self, session_id: str) -> None:
+        if (pending := self._closing.pop(session_id, None)) is not None:
+            pending.cancel()
+
+    def _evict(self, session_id: str) -> None:
+        self._cancel_close(session_id)
+        self._logs.pop(session_id, None)
+
+    def _evict_idle(self, now: float) -> None:
+        # Sessions that never reach a terminal status (crashed pipelines);
+        # the oldest appends come first, so stop at the first live one
+        while self._logs:
+            session_id, (_, _, at) = next(iter(self._logs.items()))
+            if now - at <= self.idle_seconds:
+                break
+            self._evict(session_id)
+
+
+_APPEND_SCRIPT = """
+local seq = redis.call('INCR', KEYS[2])
+redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], seq .. '-0', 'k', ARGV[1], 'd', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return seq
+"""
+
+
+class RedisEventLog(EventLog):
+    """Redis stream per session, shared by all workers.
+
+    Stream entry IDs are ``<seq>-0``; seq comes from a counter incremented in
+    the same script as the XADD, so IDs stay ordered across producers.
+    """
+
+    def __init__(
+        self,
+        max_events: int | None = None,
+        grace_seconds: float | None = None,
+        idle_seconds: int = 3600,
+        prefix: str = "slingshot:events:",
+    ) -> None:
+        settings = get_settings()
+        self.max_events = max_events or settings.ws_event_log_size
+        self.grace_seconds = (
+            settings.ws_event_log_grace_seconds if grace_seconds is None else grace_seconds
+        )
+        self.idle_seconds = idle_seconds
+        self.prefix = prefix
+        self._script = None
+
+    def _keys(self, session_id: str) -> tuple[str, str]:
+        return self.prefix + session_id, self.prefix + session_id + ":seq"
+
+    async def append(self, session_id: str, kind: str, text: str) -> str:
+        if self._script is None:
+            self._script = get_redis().register_script(_APPEND_SCRIPT)
+        seq = await self._script(
+            keys=list(self._keys(session_id)),
+            args=[kind, text, self.max_events, self.idle_seconds],
+        )
+        return stamp_seq(int(seq), text)
+
+    async def since(self, session_id: str, last_seq: int) -> tuple[list[tuple[str, str]], bool]:
+        stream, counter = self._keys(session_id)
+        redis = get_redis()
+        entries = await redis.xrange(stream, min=f"{last_seq + 1}-0", max="+")
+        events = []
+        for entry_id, fields in entries:
+            seq = int(entry_id.decode().split("-")[0])
+            events.append((fields[b"k"].decode(), stamp_seq(seq, fields[b"d"].decode())))
+        if events:
+            truncated = seq_of(events[0][1]) > last_seq + 1
+        else:
+            current = await redis.get(counter)
+            truncated = int(current) > last_seq if current is not None else last_seq > 0
+        return events, truncated
+
+    async def close_session(self, session_id: str) -> None:
+        redis = get_redis()
+        for key in self._keys(session_id):
+            await redis.expire(key, int(self.grace_seconds))
+
+
+def make_event_log() -> EventLog:
+    """Build the log selected by ``Settings.ws_event_log_backend``."""
+    backend = get_settings().ws_event_log_backend
+    if backend == "redis":
+        return RedisEventLog()
+    if backend == "memory":
+        return MemoryEventLog()
+    raise ValueError(f"Unknown ws_event_log_backend: {backend}")
@@ -2,42 +2,245 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from pathlib import Path
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import StressTestRequest
-from utils import get_db, logger
+from config import get_settings
+from jobs.queue import Job, get_job_queue
+from models import (
+    Holding,
+    HoldingResponse,
+    MonteCarloRequest,
+    MonteCarloResponse,
+    Portfolio,
+    PortfolioResponse,
+    PortfolioUploadResponse,
+    StressTest,
+    StressTestRequest,
+    StressTestResponse,
+)
+from services.portfolio_import import ImportFileError, parse_holdings, save_portfolio
+from telemetry.tracing import bind_session, inject
+from utils import get_db, get_user_id, logger
+from vault.positions import load_positions
+from vault.stress_test import resolve_scenarios, run_stress_tests
 
 router = APIRouter(prefix="/api/v1/portfolio", tags=["portfolio"])
 
 
-@router.post("")
+@router.post("", response_model=PortfolioUploadResponse)
 async def upload_portfolio(
-    file: UploadFile = File(None),
+    file: UploadFile = File(...),
+    name: str | None = Form(None, max_length=100),
+    strict: bool = Form(False),
     db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_id),
 ):
-    """Upload a portfolio from CSV or PDF."""
-    # TODO (Phase 4): Parse file, extract holdings, save to DB
-    await logger.ainfo("portfolio_upload", filename=file.filename if file else None)
-    return {"message": "Portfolio upload endpoint (not yet implemented)"}
+    """Upload a portfolio from a CSV or XLSX holdings file.
+
+    Rows that fail validation are reported with their row numbers and the
+    rest are imported. With ``strict``, any row error rejects the upload.
+    """
+    name = name or Path(file.filename or "").stem[:100] or "Portfolio"
+    try:
+        parsed = await parse_holdings(file)
+    except ImportFileError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    response = PortfolioUploadResponse(
+        name=name,
+        rows_read=parsed.rows_read,
+        holdings_count=len(parsed.holdings),
+        error_count=parsed.error_count,
+        errors=parsed.errors,
+    )
+    if not parsed.holdings or (strict and parsed.error_count):
+        raise HTTPException(status_code=422, detail=response.model_dump())
 
+    portfolio_id = await save_portfolio(db, user_id, name, parsed.holdings)
+    response.portfolio_id = str(portfolio_id)
+    await logger.ainfo(
+        "portfolio_uploaded",
+        portfolio_id=response.portfolio_id,
+        filename=file.filename,
+        rows=parsed.rows_read,
+        holdings=len(parsed.holdings),
+        errors=parsed.error_count,
+    )
+    return response
 
-@router.get("/{portfolio_id}")
+
+@router.get("/{portfolio_id}", response_model=PortfolioResponse)
 async def get_portfolio(
     portfolio_id: str,
     db: AsyncSession = Depends(get_db),
 ):
-    """Get a portfolio by ID."""
-    # TODO (Phase 4): Fetch from database
-    raise HTTPException(status_code=404, detail="Portfolio not found")
+    """Get a portfolio with its holdings at the last refreshed quotes.
+
+    Prices come from ``Holding.current_price`` as stored by the quote
+    refresher; a page view never fetches quotes itself.
+    """
+    try:
+        pid = UUID(portfolio_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    portfolio = await db.get(Portfolio, pid)
+    if portfolio is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    rows = (await db.execute(select(Holding).where(Holding.portfolio_id == pid))).scalars()
+    holdings = [HoldingResponse.model_validate(h, from_attributes=True) for h in rows]
+    return PortfolioResponse(
+        id=portfolio_id,
+        name=portfolio.name,
+        holdings=holdings,
+        total_invested=round(sum(h.quantity * h.avg_buy_price for h in holdings), 2),
+        total_value=round(
+            sum(h.quantity * (h.current_price or h.avg_buy_price) for h in holdings), 2
+        ),
+    )
 
 
-@router.post("/{portfolio_id}/stress-test")
+@router.post("/{portfolio_id}/stress-test", response_model=StressTestResponse)
 async def run_stress_test(
     portfolio_id: str,
     request: StressTestRequest,
     db: AsyncSession = Depends(get_db),
 ):
-    """Run a stress test on a portfolio."""
-    # TODO (Phase 4): Run stress test
-    raise HTTPException(status_code=404, detail="Portfolio not found")
+    """Run one or more stress scenarios on a portfolio in a single batch."""
+    try:
+        pid = UUID(portfolio_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    if await db.get(Portfolio, pid) is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+
+    try:
+        scenarios = resolve_scenarios(request.scenario_name, request.parameters, request.scenarios)
+        positions = await load_positions(db, pid)
+        results = run_stress_tests(positions, scenarios)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    stress_test = StressTest(
+        portfolio_id=pid,
+        scenario_name=request.scenario_name,
+        parameters={**request.parameters, "scenarios": [s.name for s in scenarios]},
+        results=results,
+    )
+    db.add(stress_test)
+    await db.commit()
+    await logger.ainfo(
+        "stress_test_completed",
+        portfolio_id=portfolio_id,
+        holdings=len(positions),
+        scenarios=len(scenarios),
+    )
+    return StressTestResponse(
+        stress_test_id=str(stress_test.id),
+        portfolio_id=portfolio_id,
+        scenario_name=request.scenario_name,
+        portfolio_value=results["portfolio_value"],
+        results=results["scenarios"],
+    )
+
+
+@router.post("/{portfolio_id}/monte-carlo", response_model=MonteCarloResponse)
+async def start_monte_carlo(
+    portfolio_id: str,
+    request: MonteCarloRequest,
+    db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_id),
+):
+    """Start a Monte Carlo VaR / CVaR / drawdown simulation.
+
+    Returns immediately with the stress test ID. The simulation runs on the
+    job workers and streams progress via ``/ws/portfolio/{stress_test_id}``.
+    """
+    settings = get_settings()
+    try:
+        pid = UUID(portfolio_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    if await db.get(Portfolio, pid) is None:
+        raise HTTPException(status_code=404, detail="Portfolio not found")
+    parameters = request.model_dump()
+    parameters["paths"] = request.paths or settings.mc_paths
+    parameters["horizon_days"] = request.horizon_days or settings.mc_horizon_days
+    if parameters["paths"] > settings.mc_max_paths:
+        raise HTTPException(status_code=400, detail=f"At most {settings.mc_max_paths} paths")
+    if not all(0.5 <= level < 1 for level in request.confidence_levels):
+        raise HTTPException(status_code=400, detail="Confidence levels must be in [0.5, 1)")
+
+    stress_test = StressTest(portfolio_id=pid, scenario_name="monte_carlo", parameters=parameters)
+    db.add(stress_test)
+    await db.commit()  # the row must exist before a worker can pick the job up
+    stress_test_id = str(stress_test.id)
+    bind_session(stress_test_id)
+    await get_job_queue().enqueue(
+        Job(
+            id=stress_test_id,
+            kind="monte_carlo",
+            user_id=user_id,
+            payload={"portfolio_id": portfolio_id, **parameters},
+            trace=inject(),
+        )
+    )
+    await logger.ainfo(
+        "monte_carlo_started",
+        stress_test_id=stress_test_id,
+        portfolio_id=portfolio_id,
+        paths=parameters["paths"],
+    )
+    return MonteCarloResponse(
+        stress_test_id=stress_test_id,
+        portfolio_id=portfolio_id,
+        status="queued",
+        parameters=parameters,
+    )
+
+
+@router.get("/{portfolio_id}/monte-carlo/{stress_test_id}", response_model=MonteCarloResponse)
+async def get_monte_carlo(
+    portfolio_id: str,
+    stress_test_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """Get a Monte Carlo simulation and, once it has completed, its results.
+
+    A simulation without results whose job has left the queue failed (its
+    retries ran out) or was dropped, and is reported as "error".
+    """
+    try:
+        pid, sid = UUID(portfolio_id), UUID(stress_test_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    stress_test = await db.get(StressTest, sid)
+    if (
+        stress_test is None
+        or stress_test.scenario_name != "monte_carlo"
+        or stress_test.portfolio_id != pid
+    ):
+        raise HTTPException(status_code=404, detail="Simulation not found")
+    error = None
+    if stress_test.results is not None:
+        status = "complete"
+    elif (job := await get_job_queue().get(stress_test_id)) is not None:
+        # A job waiting for its first worker is queued; one being retried has run
+        leased = await get_job_queue().is_leased(stress_test_id)
+        status = "running" if leased or job.attempts else "queued"
+        error = job.last_error  # of the attempt being retried, if any
+    else:
+        status = "error"
+        error = "Simulation failed"
+    return MonteCarloResponse(
+        stress_test_id=stress_test_id,
+        portfolio_id=portfolio_id,
+        status=status,
+        parameters=stress_test.parameters or {},
+        results=stress_test.results,
+        error=error,
+    )
@@ -2,11 +2,18 @@
 
 from __future__ import annotations
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from models import ResearchRequest, ResearchResponse
-from utils import generate_session_id, get_db, logger
+from api.websocket import ws_manager
+from jobs.queue import Job, get_job_queue
+from models import Report, ResearchRequest, ResearchResponse, ResearchSession
+from services.session_reads import get_research_json, invalidate
+from telemetry.tracing import bind_session, inject
+from utils import generate_session_id, get_db, get_user_id, logger
 
 router = APIRouter(prefix="/api/v1/research", tags=["research"])
 
@@ -14,20 +21,33 @@ router = APIRouter(prefix="/api/v1/research", tags=["research"])
 @router.post("", response_model=ResearchResponse)
 async def start_research(
     request: ResearchRequest,
-    background_tasks: BackgroundTasks,
     db: AsyncSession = Depends(get_db),
+    user_id: str = Depends(get_user_id),
 ):
     """Start a new research session.
 
-    Returns immediately with a session_id. The actual research runs in the
-    background and streams updates via WebSocket.
+    Returns immediately with a session_id. The research runs on the job
+    workers and streams updates via WebSocket.
     """
     session_id = generate_session_id()
+    bind_session(session_id)
+    db.add(
+        ResearchSession(
+            id=UUID(session_id), user_id=user_id, query=request.query, status="planning"
+        )
+    )
+    await db.commit()  # the session must exist before a worker can pick the job up
+    await get_job_queue().enqueue(
+        Job(
+            id=session_id,
+            kind="research",
+            user_id=user_id,
+            payload=request.model_dump(),
+            trace=inject(),
+        )
+    )
     await logger.ainfo("research_started", session_id=session_id, query=request.query)
 
-    # TODO (Phase 2): Kick off LangGraph orchestrator in background
-    # background_tasks.add_task(run_research_pipeline, session_id, request, db)
-
     return ResearchResponse(
         session_id=session_id,
         query=request.query,
@@ -35,14 +55,45 @@ async def start_research(
     )
 
 
+@router.post("/{session_id}/cancel", response_model=ResearchResponse)
+async def cancel_research(
+    session_id: str,
+    db: AsyncSession = Depends(get_db),
+):
+    """Cancel a queued or running research session."""
+    try:
+        sid = UUID(session_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Session not found")
+    session = await db.get(ResearchSession, sid)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    if session.status in ("complete", "error", "cancelled"):
+        raise HTTPException(status_code=409, detail=f"Session already {session.status}")
+
+    await get_job_queue().cancel(session_id)
+    await db.execute(
+        update(ResearchSession).where(ResearchSession.id == sid).values(status="cancelled")
+    )
+    await db.commit()
+    # The session may have completed (and been cached) since it was checked
+    await invalidate(session_id)
+    await ws_manager.send_status(session_id, "cancelled")
+    await logger.ainfo("research_cancelled", session_id=session_id)
+    return ResearchResponse(session_id=session_id, query=session.query, status="cancelled")
+
+
 @router.get("/{session_id}", response_model=ResearchResponse)
 async def get_research(
     session_id: str,
     db: AsyncSession = Depends(get_db),
 ):
     """Get full research session results."""
-    # TODO (Phase 2): Fetch from database
-    raise HTTPException(status_code=404, detail="Session not found")
+    body = await get_research_json(db, session_id)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    # Already encoded (and cached once complete); skip response_model re-validation
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/{session_id}/report")
@@ -51,5 +102,18 @@ async def get_report(
     db: AsyncSession = Depends(get_db),
 ):
     """Get final report for a session."""
-    # TODO (Phase 2): Fetch report from database
-    raise HTTPException(status_code=404, detail="Report not found")
+    try:
+        sid = UUID(session_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Report not found")
+    report = (
+        await db.execute(select(Report).where(Report.session_id == sid))
+    ).scalar_one_or_none()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return {
+        "session_id": session_id,
+        "executive_summary": report.executive_summary,
+        "full_report": report.full_report,
+        "report_metadata": report.report_metadata,
+    }
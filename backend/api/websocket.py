@@ -4,45 +4,291 @@ from __future__ import annotations
 
 import asyncio
 import json
+import time
+from collections import deque
+from collections.abc import Callable
 from typing import Any
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 
+from api.broadcast import BroadcastBackend, make_broadcast_backend
+from api.event_log import TERMINAL_STATUSES, EventLog, make_event_log, seq_of
+from config import get_settings
+from telemetry.metrics import WS_FRAMES_DROPPED, WS_SEND_SECONDS
 from utils import logger
 
 router = APIRouter()
 
+# Events that may be merged or dropped when a client falls behind. Anything
+# else (report_delta, error) is always delivered.
+_DROPPABLE = {"thought_step"}
+# Events where only the latest one queued matters
+_LATEST_ONLY = {"status_change", "simulation_progress"}
+
+
+class _Frame:
+    """A pre-encoded outgoing message.
+
+    ``kind`` is the event name, "batch" for coalesced JSON events (``text``
+    then holds comma-joined objects without brackets) or "raw" for
+    non-JSON text such as "pong". ``seq`` is the event-log sequence number
+    (the first one for a batch, 0 when unsequenced).
+    """
+
+    __slots__ = ("kind", "text", "count", "seq")
+
+    def __init__(self, kind: str, text: str, count: int = 1, seq: int = 0) -> None:
+        self.kind = kind
+        self.text = text
+        self.count = count
+        self.seq = seq
+
+
+class _ClientConnection:
+    """One WebSocket with its own bounded send queue and writer task.
+
+    Broadcasters only enqueue, so a slow client never stalls the others.
+    When several JSON events are queued the writer sends them as a single
+    JSON array. A connection created ``paused`` queues live events without
+    sending until ``replay`` has put the missed ones in front of them.
+
+    The queue never grows past ``ws_send_queue_size`` (plus any replayed
+    backlog): when the slow-consumer policy cannot make room, the client is
+    disconnected and resumes from its ``last_seq``.
+    """
+
+    def __init__(
+        self, websocket: WebSocket, on_dead: Callable[[], None], paused: bool = False
+    ) -> None:
+        settings = get_settings()
+        self.websocket = websocket
+        self.max_queue = settings.ws_send_queue_size
+        self.send_timeout = settings.ws_send_timeout_seconds
+        self.policy = settings.ws_slow_consumer_policy
+        self.limit = self.max_queue  # hard cap, raised by the replayed backlog
+        self._queue: deque[_Frame] = deque()
+        self._ready = asyncio.Event()
+        self._resumed = asyncio.Event()
+        if not paused:
+            self._resumed.set()
+        self._on_dead = on_dead
+        self._task = asyncio.create_task(self._writer())
+
+    def push(self, frame: _Frame) -> bool:
+        """Enqueue a frame. Returns False if the client should be disconnected."""
+        if frame.kind in _LATEST_ONLY:
+            # Drop superseded events of the same kind still queued
+            self._queue = deque(f for f in self._queue if f.kind != frame.kind)
+
+        if len(self._queue) >= self.max_queue:
+            if self.policy == "disconnect":
+                return False
+            if self.policy == "drop":
+                if frame.kind in _DROPPABLE:
+                    WS_FRAMES_DROPPED.inc()
+                    return True
+                self._drop_oldest_droppable()
+            else:
+                self._coalesce()
+            if len(self._queue) >= self.limit:
+                # Only undroppable frames left (report_delta, status):
+                # disconnect rather than queue without bound
+                return False
+
+        self._queue.append(frame)
+        self._ready.set()
+        return True
+
+    def _drop_oldest_droppable(self) -> None:
+        for i, f in enumerate(self._queue):
+            if f.kind in _DROPPABLE:
+                del self._queue[i]
+                WS_FRAMES_DROPPED.inc()
+                return
+
+    def _coalesce(self) -> None:
+        """Merge all queued droppable events into one batch frame, keeping order."""
+        mergeable = [f for f in self._queue if f.kind in _DROPPABLE or f.kind == "batch"]
+        if len(mergeable) < 2:
+            return
+        WS_FRAMES_DROPPED.inc(amount=len(mergeable) - 1)
+        batch = _Frame(
+            "batch",
+            ",".join(f.text for f in mergeable),
+            sum(f.count for f in mergeable),
+            mergeable[0].seq,
+        )
+        queue: deque[_Frame] = deque()
+        for f in self._queue:
+            if f.kind in _DROPPABLE or f.kind == "batch":
+                if f is mergeable[0]:
+                    queue.append(batch)
+            else:
+                queue.append(f)
+        self._queue = queue
+
+    def replay(self, frames: list[_Frame]) -> None:
+        """Queue missed events ahead of live ones and start sending."""
+        # Live events queued while paused are newer than anything already
+        # logged, so keep only replayed events older than the first of them
+        live = [f.seq for f in self._queue if f.seq]
+        first_live = min(live) if live else None
+        missed = [f for f in frames if first_live is None or f.seq < first_live]
+        self._queue = deque([*missed, *self._queue])
+        self.limit = self.max_queue + len(missed)
+        self._resumed.set()
+        self._ready.set()
+
+    async def _writer(self) -> None:
+        try:
+            await self._resumed.wait()
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self._queue:
+                    await self._send(*self._take_batch())
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._on_dead()
+
+    def _take_batch(self) -> tuple[str, str]:
+        """Pop the next message and its label: a raw frame alone, or a run of JSON events."""
+        if self._queue[0].kind == "raw":
+            return "raw", self._queue.popleft().text
+        parts: list[str] = []
+        count = 0
+        while self._queue and self._queue[0].kind != "raw":
+            frame = self._queue.popleft()
+            parts.append(frame.text)
+            count += frame.count
+        if count == 1:
+            return frame.kind, parts[0]
+        return "batch", "[" + ",".join(parts) + "]"
+
+    async def _send(self, label: str, text: str) -> None:
+        start = time.perf_counter()
+        async with asyncio.timeout(self.send_timeout):
+            await self.websocket.send_text(text)
+        WS_SEND_SECONDS.observe(time.perf_counter() - start, label)
+
+    def close(self) -> None:
+        self._task.cancel()
+
 
 class ConnectionManager:
-    """Manages active WebSocket connections per research session."""
+    """Manages active WebSocket connections per research session.
 
-    def __init__(self) -> None:
-        # session_id -> list of active websocket connections
-        self._connections: dict[str, list[WebSocket]] = {}
+    Events are published through a broadcast backend and delivered to the
+    connections held by whichever process has them, so producers need not
+    run in the worker a client is connected to.
+    """
+
+    def __init__(
+        self,
+        backend: BroadcastBackend | None = None,
+        event_log: EventLog | None = None,
+    ) -> None:
+        # session_id -> websocket -> its send queue and writer
+        self._connections: dict[str, dict[WebSocket, _ClientConnection]] = {}
+        self._backend = backend or make_broadcast_backend()
+        self._backend.bind(self._deliver)
+        self._log = event_log or make_event_log()
 
-    async def connect(self, session_id: str, websocket: WebSocket) -> None:
+    async def connect(
+        self, session_id: str, websocket: WebSocket, last_seq: int | None = None
+    ) -> None:
+        """Accept a connection, replaying logged events after ``last_seq`` if given."""
         await websocket.accept()
-        self._connections.setdefault(session_id, []).append(websocket)
-        await logger.ainfo("ws_connected", session_id=session_id)
+        client = _ClientConnection(
+            websocket, lambda: self._drop(session_id, websocket), paused=last_seq is not None
+        )
+        self._connections.setdefault(session_id, {})[websocket] = client
+        await self._backend.subscribe(session_id)
+        if last_seq is not None:
+            await self._replay(session_id, client, last_seq)
+        await logger.ainfo("ws_connected", session_id=session_id, last_seq=last_seq)
+
+    async def _replay(self, session_id: str, client: _ClientConnection, last_seq: int) -> None:
+        try:
+            events, truncated = await self._log.since(session_id, last_seq)
+        except Exception as exc:
+            await logger.awarning("ws_replay_failed", session_id=session_id, error=str(exc))
+            events, truncated = [], True
+        frames = [_Frame(kind, text, seq=seq_of(text)) for kind, text in events]
+        if truncated:
+            # Tell the client to refetch state over REST before applying the rest
+            notice = {"event": "replay_truncated", "session_id": session_id}
+            frames.insert(0, _Frame("replay_truncated", json.dumps(notice, separators=(",", ":"))))
+        client.replay(frames)
 
     def disconnect(self, session_id: str, websocket: WebSocket) -> None:
-        conns = self._connections.get(session_id, [])
-        if websocket in conns:
-            conns.remove(websocket)
-        if not conns:
-            self._connections.pop(session_id, None)
+        conns = self._connections.get(session_id, {})
+        client = conns.pop(websocket, None)
+        if client is not None:
+            client.close()
+        if not conns and self._connections.pop(session_id, None) is not None:
+            asyncio.create_task(self._release(session_id))
+
+    async def _release(self, session_id: str) -> None:
+        # A client may have reconnected while this was scheduled
+        if session_id not in self._connections:
+            await self._backend.unsubscribe(session_id)
+
+    async def close(self) -> None:
+        """Shut down the broadcast backend (on application shutdown)."""
+        await self._backend.close()
+
+    def _drop(self, session_id: str, websocket: WebSocket) -> None:
+        """Disconnect a dead or too-slow client and close its socket."""
+        if websocket not in self._connections.get(session_id, {}):
+            return
+        self.disconnect(session_id, websocket)
+        asyncio.create_task(self._close_quietly(websocket))
+        logger.warning("ws_slow_consumer_dropped", session_id=session_id)
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket) -> None:
+        try:
+            # 1013: try again later -- the client may reconnect
+            await websocket.close(code=1013)
+        except Exception:
+            pass
 
     async def send_event(self, session_id: str, event: dict[str, Any]) -> None:
-        """Broadcast an event to all connections for a session."""
-        conns = self._connections.get(session_id, [])
-        dead: list[WebSocket] = []
-        for ws in conns:
-            try:
-                await ws.send_json(event)
-            except Exception:
-                dead.append(ws)
-        for ws in dead:
-            self.disconnect(session_id, ws)
+        """Broadcast an event to all connections for a session.
+
+        The event is serialized once and published to the broadcast backend;
+        delivery only enqueues, so this never waits on a client's socket.
+        """
+        kind = event.get("event", "")
+        text = json.dumps(event, separators=(",", ":"))
+        try:
+            text = await self._log.append(session_id, kind, text)
+        except Exception as exc:
+            # Still deliver live; only reconnect replay is lost
+            await logger.awarning("ws_event_log_failed", session_id=session_id, error=str(exc))
+        try:
+            await self._backend.publish(session_id, kind, text)
+        except Exception as exc:
+            await logger.awarning("ws_publish_failed", session_id=session_id, error=str(exc))
+
+    def _deliver(self, session_id: str, kind: str, text: str) -> None:
+        """Fan an encoded event out to this process's connections for a session."""
+        conns = self._connections.get(session_id)
+        if not conns:
+            return
+        frame = _Frame(kind, text, seq=seq_of(text))
+        slow = [ws for ws, client in conns.items() if not client.push(frame)]
+        for ws in slow:
+            self._drop(session_id, ws)
+
+    def pong(self, session_id: str, websocket: WebSocket) -> None:
+        """Answer a keep-alive ping through the connection's writer."""
+        client = self._connections.get(session_id, {}).get(websocket)
+        if client is not None:
+            client.push(_Frame("raw", "pong"))
+        logger.info("ws_ping", session_id=session_id)  # sampled, see log_sample_rates
 
     async def send_thought_step(
         self,
@@ -78,15 +324,44 @@ class ConnectionManager:
                 "status": status,
             },
         )
+        if status in TERMINAL_STATUSES:
+            await self._log.close_session(session_id)
+
+    async def send_report_delta(
+        self, session_id: str, section: str, index: int, text: str
+    ) -> None:
+        await self.send_event(
+            session_id,
+            {
+                "event": "report_delta",
+                "session_id": session_id,
+                "section": section,
+                "index": index,
+                "text": text,
+            },
+        )
+
+    async def send_report_complete(
+        self, session_id: str, chunks: int, sections: dict[str, dict[str, Any]]
+    ) -> None:
+        await self.send_event(
+            session_id,
+            {
+                "event": "report_complete",
+                "session_id": session_id,
+                "chunks": chunks,
+                "sections": sections,
+            },
+        )
 
-    async def send_report(self, session_id: str, executive_summary: str, full_report: str) -> None:
+    async def send_progress(self, session_id: str, completed: int, total: int) -> None:
         await self.send_event(
             session_id,
             {
-                "event": "report_ready",
+                "event": "simulation_progress",
                 "session_id": session_id,
-                "executive_summary": executive_summary,
-                "full_report": full_report,
+                "completed": completed,
+                "total": total,
             },
         )
 
@@ -106,28 +381,50 @@ ws_manager = ConnectionManager()
 
 
 @router.websocket("/ws/research/{session_id}")
-async def research_websocket(websocket: WebSocket, session_id: str):
-    """WebSocket endpoint for real-time research updates."""
-    await ws_manager.connect(session_id, websocket)
+async def research_websocket(websocket: WebSocket, session_id: str, last_seq: int | None = None):
+    """WebSocket endpoint for real-time research updates.
+
+    Pass ``last_seq`` (0 for everything still buffered) to replay missed events.
+    """
+    await ws_manager.connect(session_id, websocket, last_seq)
     try:
         while True:
             # Keep connection alive; client can send pings
             data = await websocket.receive_text()
             if data == "ping":
-                await websocket.send_text("pong")
+                ws_manager.pong(session_id, websocket)
     except WebSocketDisconnect:
         ws_manager.disconnect(session_id, websocket)
         await logger.ainfo("ws_disconnected", session_id=session_id)
 
 
 @router.websocket("/ws/macro/{session_id}")
-async def macro_websocket(websocket: WebSocket, session_id: str):
-    """WebSocket endpoint for real-time macro analysis updates."""
-    await ws_manager.connect(session_id, websocket)
+async def macro_websocket(websocket: WebSocket, session_id: str, last_seq: int | None = None):
+    """WebSocket endpoint for real-time macro analysis updates.
+
+    Pass ``last_seq`` (0 for everything still buffered) to replay missed events.
+    """
+    await ws_manager.connect(session_id, websocket, last_seq)
+    try:
+        while True:
+            data = await websocket.receive_text()
+            if data == "ping":
+                ws_manager.pong(session_id, websocket)
+    except WebSocketDisconnect:
+        ws_manager.disconnect(session_id, websocket)
+
+
+@router.websocket("/ws/portfolio/{session_id}")
+async def portfolio_websocket(websocket: WebSocket, session_id: str, last_seq: int | None = None):
+    """WebSocket endpoint for portfolio simulation progress.
+
+    ``session_id`` is the stress test ID. Pass ``last_seq`` to replay missed events.
+    """
+    await ws_manager.connect(session_id, websocket, last_seq)
     try:
         while True:
             data = await websocket.receive_text()
             if data == "ping":
-                await websocket.send_text("pong")
+                ws_manager.pong(session_id, websocket)
     except WebSocketDisconnect:
         ws_manager.disconnect(session_id, websocket)
@@ -0,0 +1 @@
+"""__init__ for jobs package."""
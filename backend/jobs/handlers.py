@@ -0,0 +1,74 @@
+"""Job handlers: one coroutine per job kind, run by the worker pool."""
+
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from uuid import UUID
+
+from sqlalchemy import update
+
+from agents.deep_research import research_graph
+from api.websocket import ws_manager
+from jobs.queue import Job
+from models import StressTest
+from utils import async_session_factory, logger
+from vault.monte_carlo import MonteCarloConfig, monte_carlo_engine
+from vault.positions import load_positions
+
+JobHandler = Callable[[Job], Awaitable[None]]
+
+HANDLERS: dict[str, JobHandler] = {}
+
+
+def handler(kind: str) -> Callable[[JobHandler], JobHandler]:
+    """Register a coroutine as the handler for a job kind."""
+
+    def register(fn: JobHandler) -> JobHandler:
+        HANDLERS[kind] = fn
+        return fn
+
+    return register
+
+
+@handler("research")
+async def run_research_job(job: Job) -> None:
+    """Run the Deep Research pipeline for a session."""
+    state = await research_graph.run(
+        job.id,
+        job.payload["query"],
+        max_iterations=job.payload.get("max_iterations", 2),
+        include_news=job.payload.get("include_news", True),
+    )
+    await logger.ainfo(
+        "research_completed",
+        session_id=job.id,
+        iterations=state["iteration_count"],
+        confidence=state["confidence"],
+        tool_calls=len(state["tool_calls"]),
+    )
+
+
+@handler("monte_carlo")
+async def run_monte_carlo_job(job: Job) -> None:
+    """Simulate a portfolio and store the results on its stress test row."""
+    await ws_manager.send_status(job.id, "simulating")
+    async with async_session_factory() as db:
+        positions = await load_positions(db, UUID(job.payload["portfolio_id"]))
+    config = MonteCarloConfig.model_validate(job.payload)
+
+    async def progress(completed: int, total: int) -> None:
+        await ws_manager.send_progress(job.id, completed, total)
+
+    results = await monte_carlo_engine.simulate(positions, config, progress)
+    async with async_session_factory() as db:
+        await db.execute(
+            update(StressTest).where(StressTest.id == UUID(job.id)).values(results=results)
+        )
+        await db.commit()
+    await ws_manager.send_status(job.id, "complete")
+    await logger.ainfo(
+        "monte_carlo_completed",
+        stress_test_id=job.id,
+        holdings=len(positions),
+        paths=config.paths,
+    )
@@ -0,0 +1,434 @@
+"""Durable job queue for long-running agent pipelines.
+
+Jobs are enqueued by the API and executed by separate worker processes
+(``python -m jobs.worker``). The Redis queue keeps everything needed to
+survive restarts in Redis:
+
+  - ``ready``: sorted by priority (0 = most urgent), FIFO within a priority.
+  - ``delayed``: retries waiting out their backoff.
+  - ``leases``: running jobs with a lease the worker renews by heartbeat.
+    Leases of crashed workers expire and their jobs go back to ``ready``;
+    each expiry counts as a failed attempt.
+  - ``running:<user>``: per-user counters enforcing ``job_user_concurrency``.
+
+Claiming a job, promoting due retries and reclaiming expired leases happen in
+one atomic script, so any number of workers can share the queue.
+``MemoryJobQueue`` implements the same semantics in-process for tests.
+"""
+
+from __future__ import annotations
+
+import heapq
+import json
+import random
+import time
+from abc import ABC, abstractmethod
+from typing import Any
+
+from pydantic import BaseModel, Field
+
+from config import get_settings
+from utils import get_redis
+
+
+class Job(BaseModel):
+    """A unit of work. ``id`` is the session id it runs for."""
+
+    id: str
+    kind: str  # a key of jobs.handlers.HANDLERS
+    user_id: str
+    payload: dict[str, Any] = Field(default_factory=dict)
+    priority: int = Field(default=5, ge=0, le=9)
+    attempts: int = 0
+    max_attempts: int = Field(default_factory=lambda: get_settings().job_max_attempts)
+    enqueued_ms: int = Field(default_factory=lambda: int(time.time() * 1000))
+    last_error: str | None = None
+    trace: dict[str, Any] | None = None  # telemetry.tracing.inject() of the enqueuer
+
+    @property
+    def score(self) -> str:
+        # Priority-major, then enqueue order; kept as a string so Lua never
+        # round-trips it through a float
+        return str(self.priority * 10**13 + self.enqueued_ms)
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter for the given attempt number."""
+    base = get_settings().job_backoff_base_seconds
+    return random.uniform(0, base * 2 ** max(attempts - 1, 0))
+
+
+class JobQueue(ABC):
+    """Queue interface shared by the API (producer) and workers (consumers)."""
+
+    @abstractmethod
+    async def enqueue(self, job: Job) -> None: ...
+
+    @abstractmethod
+    async def claim(self) -> Job | None:
+        """Lease the most urgent runnable job, or None if there is none."""
+        ...
+
+    @abstractmethod
+    async def heartbeat(self, job: Job) -> None:
+        """Extend a running job's lease."""
+        ...
+
+    @abstractmethod
+    async def ack(self, job: Job) -> None:
+        """Mark a leased job done and forget it."""
+        ...
+
+    @abstractmethod
+    async def fail(self, job: Job, error: str) -> bool:
+        """Release a failed job. Returns True if it was scheduled for retry."""
+        ...
+
+    @abstractmethod
+    async def cancel(self, job_id: str) -> None:
+        """Drop a queued job, or flag a running one for its worker to stop."""
+        ...
+
+    @abstractmethod
+    async def is_cancelled(self, job_id: str) -> bool: ...
+
+    @abstractmethod
+    async def is_leased(self, job_id: str) -> bool:
+        """Whether a worker currently holds the job."""
+        ...
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Job | None:
+        """A queued, running or retrying job; None once it is done, dead or dropped."""
+        ...
+
+
+# ---------------------------------------------------------------------------
+# Redis
+# ---------------------------------------------------------------------------
+
+# KEYS: ready, delayed, leases, dead   ARGV: now_ms, lease_ms, user_limit, prefix, page
+_CLAIM_SCRIPT = """
+local now = tonumber(ARGV[1])
+local prefix = ARGV[4]
+local page = tonumber(ARGV[5])
+
+local function requeue(id)
+  local raw = redis.call('GET', prefix .. 'job:' .. id)
+  if raw then redis.call('ZADD', KEYS[1], cjson.decode(raw).score, id) end
+end
+
+-- Count an attempt in place: _dump ends every job with its attempts and
+-- last_error, so the last unescaped ', "attempts": ' is the real field.
+-- (Re-encoding with cjson would turn empty lists into objects.)
+local function reclaimed(raw, job)
+  local at, from = nil, 1
+  while true do
+    local found = string.find(raw, ', "attempts": ', from, true)
+    if not found then break end
+    at, from = found, found + 1
+  end
+  local attempts = job.attempts + 1
+  if not (at and string.find(raw, '^%d+, "last_error": ', at + 14)) then
+    return raw, attempts  -- not written by this _dump; count without storing
+  end
+  return string.sub(raw, 1, at - 1) .. ', "attempts": ' .. attempts
+    .. ', "last_error": "lease expired"}', attempts
+end
+
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, 100)) do
+  redis.call('ZREM', KEYS[2], id)
+  requeue(id)
+end
+
+-- An expired lease means the worker died mid-job: that counts as an attempt,
+-- so a job that keeps killing its worker ends up dead-lettered
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now, 'LIMIT', 0, 100)) do
+  redis.call('ZREM', KEYS[3], id)
+  local key = prefix .. 'job:' .. id
+  local raw = redis.call('GET', key)
+  if raw then
+    local job = cjson.decode(raw)
+    redis.call('DECR', prefix .. 'running:' .. job.user_id)
+    local updated, attempts = reclaimed(raw, job)
+    if attempts >= job.max_attempts then
+      redis.call('DEL', key)
+      redis.call('LPUSH', KEYS[4], updated)
+      redis.call('LTRIM', KEYS[4], 0, 999)
+    else
+      redis.call('SET', key, updated)
+      redis.call('ZADD', KEYS[1], job.score, id)
+    end
+  end
+end
+
+-- Walk the ready set a page at a time, past users already at their limit
+local capped = {}
+local start = 0
+while true do
+  local ids = redis.call('ZRANGE', KEYS[1], start, start + page - 1)
+  if #ids == 0 then return false end
+  local removed = 0
+  for _, id in ipairs(ids) do
+    local raw = redis.call('GET', prefix .. 'job:' .. id)
+    if not raw then
+      redis.call('ZREM', KEYS[1], id)
+      removed = removed + 1
+    else
+      local user = cjson.decode(raw).user_id
+      if not capped[user] then
+        local counter = prefix .. 'running:' .. user
+        if tonumber(redis.call('GET', counter) or '0') < tonumber(ARGV[3]) then
+          redis.call('ZREM', KEYS[1], id)
+          redis.call('INCR', counter)
+          redis.call('ZADD', KEYS[3], now + tonumber(ARGV[2]), id)
+          return raw
+        end
+        capped[user] = true
+      end
+    end
+  end
+  start = start + page - removed
+end
+"""
+
+# KEYS: leases, running counter   ARGV: job id
+_RELEASE_SCRIPT = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 1 then
+  redis.call('DECR', KEYS[2])
+  return 1
+end
+return 0
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """Job queue shared by every API and worker process through Redis."""
+
+    def __init__(self, prefix: str = "slingshot:jobs:", scan: int = 50) -> None:
+        self.prefix = prefix
+        self.scan = scan  # queued jobs read per step while skipping users at their limit
+        self._claim = None
+        self._release = None
+
+    def _key(self, name: str) -> str:
+        return self.prefix + name
+
+    def _scripts(self) -> None:
+        if self._claim is None:
+            redis = get_redis()
+            self._claim = redis.register_script(_CLAIM_SCRIPT)
+            self._release = redis.register_script(_RELEASE_SCRIPT)
+
+    async def enqueue(self, job: Job) -> None:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.set(self._key(f"job:{job.id}"), _dump(job))
+        pipe.zadd(self._key("ready"), {job.id: job.score})
+        await pipe.execute()
+
+    async def claim(self) -> Job | None:
+        self._scripts()
+        settings = get_settings()
+        raw = await self._claim(
+            keys=[
+                self._key("ready"),
+                self._key("delayed"),
+                self._key("leases"),
+                self._key("dead"),
+            ],
+            args=[
+                int(time.time() * 1000),
+                int(settings.job_lease_seconds * 1000),
+                settings.job_user_concurrency,
+                self.prefix,
+                self.scan,
+            ],
+        )
+        return Job.model_validate_json(raw) if raw else None
+
+    async def heartbeat(self, job: Job) -> None:
+        expiry = int((time.time() + get_settings().job_lease_seconds) * 1000)
+        await get_redis().zadd(self._key("leases"), {job.id: expiry}, xx=True)
+
+    async def _release_lease(self, job: Job) -> bool:
+        self._scripts()
+        released = await self._release(
+            keys=[self._key("leases"), self._key(f"running:{job.user_id}")], args=[job.id]
+        )
+        return bool(released)
+
+    async def ack(self, job: Job) -> None:
+        await self._release_lease(job)
+        await get_redis().delete(self._key(f"job:{job.id}"), self._key(f"cancel:{job.id}"))
+
+    async def fail(self, job: Job, error: str) -> bool:
+        if not await self._release_lease(job):
+            return False  # lease already expired and the job was reclaimed
+        job.attempts += 1
+        job.last_error = error
+        redis = get_redis()
+        if job.attempts >= job.max_attempts:
+            pipe = redis.pipeline(transaction=True)
+            pipe.delete(self._key(f"job:{job.id}"))
+            pipe.lpush(self._key("dead"), _dump(job))
+            pipe.ltrim(self._key("dead"), 0, 999)
+            await pipe.execute()
+            return False
+        ready_at = int((time.time() + backoff_seconds(job.attempts)) * 1000)
+        pipe = redis.pipeline(transaction=True)
+        pipe.set(self._key(f"job:{job.id}"), _dump(job))
+        pipe.zadd(self._key("delayed"), {job.id: ready_at})
+        await pipe.execute()
+        return True
+
+    async def cancel(self, job_id: str) -> None:
+        pipe = get_redis().pipeline(transaction=True)
+        pipe.set(self._key(f"cancel:{job_id}"), 1, ex=86400)
+        pipe.zrem(self._key("ready"), job_id)
+        pipe.zrem(self._key("delayed"), job_id)
+        _, in_ready, in_delayed = await pipe.execute()
+        if in_ready or in_delayed:
+            await get_redis().delete(self._key(f"job:{job_id}"))
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        return bool(await get_redis().exists(self._key(f"cancel:{job_id}")))
+
+    async def is_leased(self, job_id: str) -> bool:
+        return await get_redis().zscore(self._key("leases"), job_id) is not None
+
+    async def get(self, job_id: str) -> Job | None:
+        raw = await get_redis().get(self._key(f"job:{job_id}"))
+        return Job.model_validate_json(raw) if raw else None
+
+
+def _dump(job: Job) -> str:
+    """Encode a job with its sort score for the Lua scripts.
+
+    ``attempts`` and ``last_error`` come last: the claim script rewrites
+    that tail when it reclaims the job from a dead worker.
+    """
+    data = job.model_dump(exclude={"attempts", "last_error"})
+    return json.dumps(
+        {**data, "score": job.score, "attempts": job.attempts, "last_error": job.last_error}
+    )
+
+
+# ---------------------------------------------------------------------------
+# In-process stand-in
+# ---------------------------------------------------------------------------
+
+
+class MemoryJobQueue(JobQueue):
+    """Single-process queue with the Redis queue's semantics, for tests and dev."""
+
+    def __init__(self) -> None:
+        self._ready: list[tuple[int, str]] = []  # heap of (score, job id)
+        self._delayed: dict[str, float] = {}  # job id -> ready at
+        self._leases: dict[str, float] = {}  # job id -> lease expiry
+        self._jobs: dict[str, Job] = {}
+        self._running: dict[str, int] = {}
+        self._cancelled: set[str] = set()
+        self.dead: list[Job] = []
+
+    async def enqueue(self, job: Job) -> None:
+        self._jobs[job.id] = job
+        heapq.heappush(self._ready, (int(job.score), job.id))
+
+    async def claim(self) -> Job | None:
+        now = time.time()
+        for job_id, at in list(self._delayed.items()):
+            if at <= now:
+                del self._delayed[job_id]
+                heapq.heappush(self._ready, (int(self._jobs[job_id].score), job_id))
+        for job_id, expiry in list(self._leases.items()):
+            if expiry <= now:
+                del self._leases[job_id]
+                job = self._jobs[job_id]
+                self._running[job.user_id] -= 1
+                job.attempts += 1
+                job.last_error = "lease expired"
+                if job.attempts >= job.max_attempts:
+                    del self._jobs[job_id]
+                    self.dead.append(job)
+                else:
+                    heapq.heappush(self._ready, (int(job.score), job_id))
+
+        limit = get_settings().job_user_concurrency
+        skipped = []
+        claimed = None
+        while self._ready:
+            entry = heapq.heappop(self._ready)
+            job = self._jobs.get(entry[1])
+            if job is None:
+                continue
+            if self._running.get(job.user_id, 0) >= limit:
+                skipped.append(entry)
+                continue
+            self._running[job.user_id] = self._running.get(job.user_id, 0) + 1
+            self._leases[job.id] = now + get_settings().job_lease_seconds
+            claimed = job.model_copy()
+            break
+        for entry in skipped:
+            heapq.heappush(self._ready, entry)
+        return claimed
+
+    async def heartbeat(self, job: Job) -> None:
+        if job.id in self._leases:
+            self._leases[job.id] = time.time() + get_settings().job_lease_seconds
+
+    def _release_lease(self, job: Job) -> bool:
+        if self._leases.pop(job.id, None) is None:
+            return False
+        self._running[job.user_id] -= 1
+        return True
+
+    async def ack(self, job: Job) -> None:
+        self._release_lease(job)
+        self._jobs.pop(job.id, None)
+        self._cancelled.discard(job.id)
+
+    async def fail(self, job: Job, error: str) -> bool:
+        if not self._release_lease(job):
+            return False
+        job.attempts += 1
+        job.last_error = error
+        if job.attempts >= job.max_attempts:
+            self._jobs.pop(job.id, None)
+            self.dead.append(job)
+            return False
+        self._jobs[job.id] = job
+        self._delayed[job.id] = time.time() + backoff_seconds(job.attempts)
+        return True
+
+    async def cancel(self, job_id: str) -> None:
+        self._cancelled.add(job_id)
+        if job_id not in self._leases:
+            self._jobs.pop(job_id, None)
+            self._delayed.pop(job_id, None)
+
+    async def is_cancelled(self, job_id: str) -> bool:
+        return job_id in self._cancelled
+
+    async def is_leased(self, job_id: str) -> bool:
+        return job_id in self._leases
+
+    async def get(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        return job.model_copy() if job is not None else None
+
+
+_queue: JobQueue | None = None
+
+
+def get_job_queue() -> JobQueue:
+    """Return the process-wide queue selected by ``Settings.job_queue_backend``."""
+    global _queue
+    if _queue is None:
+        backend = get_settings().job_queue_backend
+        if backend == "redis":
+            _queue = RedisJobQueue()
+        elif backend == "memory":
+            _queue = MemoryJobQueue()
+        else:
+            raise ValueError(f"Unknown job_queue_backend: {backend}")
+    return _queue
@@ -0,0 +1,198 @@
+"""Job worker pool.
+
+Runs queued jobs outside the API processes:
+
+    python -m jobs.worker --processes 4 --concurrency 4
+
+Each process claims jobs up to its concurrency, renews their leases while they
+run, and stops a job when it is cancelled. Failed jobs are retried with
+backoff until ``job_max_attempts``, then moved to the dead-letter list; a
+job whose worker died (its lease expired) counts that as a failed attempt.
+Process ``i`` serves its metrics on ``metrics_worker_port + i``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import multiprocessing
+import os
+import signal
+import time
+
+from config import get_settings
+from jobs.handlers import HANDLERS, JobHandler
+from jobs.queue import Job, JobQueue, get_job_queue
+from services.quotes import quote_refresher
+from telemetry.metrics import JOB_SECONDS, serve_metrics
+from telemetry.tracing import resume
+from utils import logger
+
+IDLE_POLL_SECONDS = 0.5
+
+
+async def _traced(handler: JobHandler, job: Job) -> None:
+    # Runs as its own task, so the session bound here stays with this job
+    with resume(job.trace, "job.run", kind=job.kind, attempt=job.attempts + 1):
+        await handler(job)
+
+
+async def _execute(queue: JobQueue, job: Job) -> None:
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        await queue.fail(job, f"unknown job kind: {job.kind}")
+        return
+
+    from api.websocket import ws_manager
+
+    start = time.perf_counter()
+    task = asyncio.create_task(_traced(handler, job))
+    interval = get_settings().job_lease_seconds / 3
+    cancelled = False
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=interval)
+        if done:
+            break
+        if await queue.is_cancelled(job.id):
+            cancelled = True
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+            break
+        await queue.heartbeat(job)
+
+    if cancelled or task.cancelled():
+        JOB_SECONDS.observe(time.perf_counter() - start, job.kind, "cancelled")
+        await queue.ack(job)  # the cancel endpoint has already reported the status
+        await logger.ainfo("job_cancelled", job_id=job.id, kind=job.kind)
+    elif task.exception() is not None:
+        JOB_SECONDS.observe(time.perf_counter() - start, job.kind, "error")
+        error = f"{type(task.exception()).__name__}: {task.exception()}"
+        retrying = await queue.fail(job, error)
+        await logger.aerror(
+            "job_failed", job_id=job.id, kind=job.kind, error=error, retrying=retrying
+        )
+        if not retrying:
+            await ws_manager.send_error(job.id, f"Job failed: {error}")
+    else:
+        JOB_SECONDS.observe(time.perf_counter() - start, job.kind, "ok")
+        await queue.ack(job)
+        await logger.ainfo("job_done", job_id=job.id, kind=job.kind, attempts=job.attempts + 1)
+
+
+async def _consume(queue: JobQueue, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            job = await queue.claim()
+        except Exception as e:
+            await logger.awarning("job_claim_failed", error=str(e))
+            job = None
+        if job is None:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(stop.wait(), IDLE_POLL_SECONDS)
+            continue
+        await logger.ainfo("job_started", job_id=job.id, kind=job.kind, attempt=job.attempts + 1)
+        try:
+            await _execute(queue, job)
+        except Exception as e:
+            # Queue unreachable mid-job; the lease expires and another worker retries it
+            await logger.aerror("job_execute_failed", job_id=job.id, error=str(e))
+
+
+async def run_worker(
+    queue: JobQueue | None = None,
+    concurrency: int | None = None,
+    stop: asyncio.Event | None = None,
+) -> None:
+    """Run ``concurrency`` consumers (and the quote refresher) until ``stop`` is set.
+
+    On stop, consumers finish the jobs they are running before returning.
+    """
+    queue = queue or get_job_queue()
+    stop = stop or asyncio.Event()
+    settings = get_settings()
+    concurrency = concurrency or settings.job_worker_concurrency
+    tasks = [_consume(queue, stop) for _ in range(concurrency)]
+    if settings.quote_refresh_enabled:
+        # Every worker runs the loop; a Redis lock lets one refresh per interval
+        tasks.append(quote_refresher.run(stop))
+    await asyncio.gather(*tasks)
+
+
+async def _serve(concurrency: int, index: int) -> None:
+    from api.websocket import ws_manager
+    from rag.embeddings import embedding_service
+    from services.persistence import session_writer
+    from tools.http import http_client
+    from utils import close_redis, engine
+    from vault.monte_carlo import monte_carlo_engine
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    metrics_server = None
+    settings = get_settings()
+    if settings.metrics_enabled and settings.metrics_worker_port:
+        port = settings.metrics_worker_port + index
+        try:
+            metrics_server = await serve_metrics(port)
+        except OSError as e:
+            await logger.awarning("metrics_server_failed", port=port, error=str(e))
+    await logger.ainfo("worker_started", concurrency=concurrency)
+    try:
+        await run_worker(concurrency=concurrency, stop=stop)
+    finally:
+        if metrics_server is not None:
+            metrics_server.close()
+        await embedding_service.close()
+        await monte_carlo_engine.close()
+        await http_client.close()
+        await session_writer.close()
+        await ws_manager.close()
+        await close_redis()
+        await engine.dispose()
+        await logger.ainfo("worker_stopped")
+
+
+def _process_main(concurrency: int, index: int) -> None:
+    asyncio.run(_serve(concurrency, index))
+
+
+def main() -> None:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Run Slingshot job workers.")
+    parser.add_argument("--processes", type=int, default=settings.job_worker_processes)
+    parser.add_argument("--concurrency", type=int, default=settings.job_worker_concurrency)
+    args = parser.parse_args()
+
+    if settings.job_queue_backend != "redis":
+        parser.error("separate worker processes need JOB_QUEUE_BACKEND=redis")
+    try:
+        settings.check_ws_backends()
+    except ValueError as e:
+        parser.error(str(e))
+
+    ctx = multiprocessing.get_context("spawn")
+    procs = [
+        ctx.Process(target=_process_main, args=(args.concurrency, i), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for proc in procs:
+        proc.start()
+
+    def forward(signum, _frame) -> None:
+        for proc in procs:
+            if proc.is_alive() and proc.pid is not None:
+                with contextlib.suppress(ProcessLookupError):
+                    os.kill(proc.pid, signum)
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for proc in procs:
+        proc.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,470 @@
+"""Gateway for every LLM call made by the agents.
+
+Planner, critic and reporter nodes call ``llm_gateway.complete`` instead
+of a provider. A request is answered, in order, from:
+
+  - the exact cache: a hash of provider, model, system prompt, prompt and
+    sampling params, in an LRU with TTL in front of Redis;
+  - the semantic cache (opt-in, ``llm_semantic_cache_enabled``): for short
+    prompts, a cached completion of a prompt with the same system prompt
+    and params whose embedding is at least ``llm_semantic_threshold``
+    cosine-similar (in-process only);
+  - an identical request already in flight, which is awaited instead of
+    sent again;
+  - the provider, under its concurrency cap and tokens-per-minute budget.
+
+``llm_gateway.stream`` yields a completion as the provider generates it,
+for text shown while it is written (reports). Streams go through the same
+exact cache and provider limits but are never coalesced.
+
+Errors are never cached. ``DEFAULT_LLM_PROVIDER=stub`` runs everything
+offline and deterministically.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Awaitable, Callable, Sequence
+
+import numpy as np
+
+from config import get_settings
+from llm.providers import (
+    PROVIDERS,
+    LLMError,
+    LLMProvider,
+    LLMRequest,
+    LLMResponse,
+    estimate_tokens,
+)
+from telemetry.metrics import LLM_CACHE_LOOKUPS, LLM_SECONDS, LLM_TOKENS
+from telemetry.tracing import start_span
+from utils import get_redis, logger
+
+REDIS_PREFIX = "slingshot:llm:"
+
+Embedder = Callable[[Sequence[str]], Awaitable[np.ndarray]]
+
+
+def make_prompt_key(request: LLMRequest) -> str:
+    """Exact cache key: a hash of every field of the request."""
+    return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+
+def _namespace(request: LLMRequest) -> str:
+    """Everything but the prompt: only prompts within one namespace may match semantically."""
+    return make_prompt_key(request.model_copy(update={"prompt": ""}))
+
+
+async def _embed_with_service(texts: Sequence[str]) -> np.ndarray:
+    from rag.embeddings import embedding_service
+
+    return await embedding_service.embed(texts)
+
+
+# ---------------------------------------------------------------------------
+# Prompt cache
+# ---------------------------------------------------------------------------
+
+
+class PromptCache:
+    """Exact (LRU + Redis) and semantic (in-process) cache of completions."""
+
+    def __init__(
+        self,
+        max_entries: int | None = None,
+        use_redis: bool = True,
+        embed: Embedder | None = None,
+    ) -> None:
+        settings = get_settings()
+        self.max_entries = max_entries or settings.llm_cache_max_entries
+        self.ttl = settings.llm_cache_ttl_seconds
+        self.use_redis = use_redis
+        self.semantic = settings.llm_semantic_cache_enabled
+        self.threshold = settings.llm_semantic_threshold
+        self.semantic_max_chars = settings.llm_semantic_max_chars
+        self._embed = embed or _embed_with_service
+        # key -> (expires_at monotonic, response)
+        self._local: OrderedDict[str, tuple[float, LLMResponse]] = OrderedDict()
+        # namespace -> key -> unit-length prompt embedding
+        self._vectors: dict[str, dict[str, np.ndarray]] = {}
+        self._namespace_of: dict[str, str] = {}
+
+    # -- Exact -------------------------------------------------------------
+
+    def _get_local(self, key: str) -> LLMResponse | None:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            self._forget(key)
+            return None
+        self._local.move_to_end(key)
+        return response
+
+    def _set_local(self, key: str, response: LLMResponse, ttl: float) -> None:
+        self._local[key] = (time.monotonic() + ttl, response)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._forget(next(iter(self._local)))
+
+    def _forget(self, key: str) -> None:
+        self._local.pop(key, None)
+        namespace = self._namespace_of.pop(key, None)
+        if namespace is not None:
+            vectors = self._vectors.get(namespace, {})
+            vectors.pop(key, None)
+            if not vectors:
+                self._vectors.pop(namespace, None)
+
+    async def get(self, key: str) -> LLMResponse | None:
+        """Look a key up in the LRU, then Redis (promoting remote hits)."""
+        response = self._get_local(key)
+        if response is not None or not self.use_redis:
+            return response
+        try:
+            pipe = get_redis().pipeline()
+            pipe.get(REDIS_PREFIX + key)
+            pipe.pttl(REDIS_PREFIX + key)
+            raw, pttl = await pipe.execute()
+        except Exception as exc:
+            await logger.awarning("llm_cache_redis_error", op="get", error=str(exc))
+            return None
+        if raw is None or pttl is None or pttl <= 0:
+            return None
+        response = LLMResponse.model_validate_json(raw)
+        self._set_local(key, response, pttl / 1000)
+        return response
+
+    async def put(self, key: str, response: LLMResponse) -> None:
+        self._set_local(key, response, self.ttl)
+        if not self.use_redis:
+            return
+        try:
+            await get_redis().set(REDIS_PREFIX + key, response.model_dump_json(), ex=self.ttl)
+        except Exception as exc:
+            await logger.awarning("llm_cache_redis_error", op="set", error=str(exc))
+
+    # -- Semantic ----------------------------------------------------------
+
+    async def embedding(self, request: LLMRequest) -> np.ndarray | None:
+        """Unit-length embedding of the prompt, or None if it is not eligible."""
+        if not self.semantic or len(request.prompt) > self.semantic_max_chars:
+            return None
+        try:
+            vector = np.asarray((await self._embed([request.prompt]))[0], dtype=np.float32)
+        except Exception as exc:
+            # No embedding model here: run with the exact cache only
+            self.semantic = False
+            await logger.awarning("llm_semantic_cache_disabled", error=str(exc))
+            return None
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else None
+
+    def nearest(self, request: LLMRequest, vector: np.ndarray) -> str | None:
+        """Key of the most similar cached prompt in the request's namespace, if close enough."""
+        vectors = self._vectors.get(_namespace(request))
+        if not vectors:
+            return None
+        keys = list(vectors)
+        scores = np.stack([vectors[k] for k in keys]) @ vector
+        best = int(np.argmax(scores))
+        return keys[best] if scores[best] >= self.threshold else None
+
+    def index(self, key: str, request: LLMRequest, vector: np.ndarray) -> None:
+        if key not in self._local:
+            return
+        namespace = _namespace(request)
+        self._vectors.setdefault(namespace, {})[key] = vector
+        self._namespace_of[key] = namespace
+
+
+# ---------------------------------------------------------------------------
+# Per-provider limits
+# ---------------------------------------------------------------------------
+
+
+class TokenBudget:
+    """Token bucket of ``tokens_per_minute``, charged an estimate up front and settled after."""
+
+    def __init__(self, tokens_per_minute: int) -> None:
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: int) -> float:
+        """Wait until ``tokens`` (at most the whole budget) are available; return those taken."""
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:  # first come, first served
+            self._refill()
+            while self._tokens < tokens:
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= tokens
+        return tokens
+
+    def settle(self, charged: float, actual: int) -> None:
+        """Refund or charge the difference between what ``acquire`` took and actual usage."""
+        self._refill()
+        self._tokens = min(self.capacity, self._tokens + charged - actual)
+
+
+class _ProviderSlot:
+    def __init__(self, provider: LLMProvider, concurrency: int, tokens_per_minute: int) -> None:
+        self.provider = provider
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.budget = TokenBudget(tokens_per_minute) if tokens_per_minute > 0 else None
+
+
+# ---------------------------------------------------------------------------
+# Gateway
+# ---------------------------------------------------------------------------
+
+
+class LLMGateway:
+    """Cached, coalesced and rate-limited access to the configured providers."""
+
+    def __init__(self, cache: PromptCache | None = None) -> None:
+        self.cache = cache or PromptCache()
+        self._slots: dict[str, _ProviderSlot] = {}
+        self._inflight: dict[str, asyncio.Task[LLMResponse]] = {}
+
+    def _slot(self, name: str) -> _ProviderSlot:
+        slot = self._slots.get(name)
+        if slot is None:
+            provider_cls = PROVIDERS.get(name)
+            if provider_cls is None:
+                raise LLMError(f"Unknown LLM provider: {name}")
+            settings = get_settings()
+            slot = _ProviderSlot(
+                provider_cls(),
+                settings.llm_max_concurrency.get(name, settings.llm_default_max_concurrency),
+                settings.llm_tokens_per_minute.get(name, 0),
+            )
+            self._slots[name] = slot
+        return slot
+
+    async def complete(
+        self,
+        prompt: str,
+        *,
+        system: str = "",
+        provider: str | None = None,
+        model: str | None = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1024,
+        stop: list[str] | None = None,
+        cache: bool = True,
+    ) -> LLMResponse:
+        """Complete ``prompt``, from the cache when possible.
+
+        ``cache=False`` skips both cache tiers (the call is still coalesced
+        with identical in-flight requests). Raises ``LLMError``.
+        """
+        request = self._request(prompt, system, provider, model, temperature, max_tokens, stop)
+        slot = self._slot(request.provider)
+        key = make_prompt_key(request)
+        use_cache = cache and get_settings().llm_cache_enabled
+
+        vector = None
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                LLM_CACHE_LOOKUPS.inc(request.provider, "exact")
+                return cached.model_copy(update={"cached": "exact"})
+            vector = await self.cache.embedding(request)
+            if vector is not None and (match := self.cache.nearest(request, vector)):
+                cached = await self.cache.get(match)
+                if cached is not None:
+                    LLM_CACHE_LOOKUPS.inc(request.provider, "semantic")
+                    return cached.model_copy(update={"cached": "semantic"})
+
+        task = self._inflight.get(key)
+        if task is None:
+            LLM_CACHE_LOOKUPS.inc(request.provider, "miss")
+            task = asyncio.create_task(self._call(slot, key, request, use_cache, vector))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            LLM_CACHE_LOOKUPS.inc(request.provider, "coalesced")
+        # Shielded: one caller giving up does not cancel the call others await
+        return (await asyncio.shield(task)).model_copy()
+
+    async def stream(
+        self,
+        prompt: str,
+        *,
+        system: str = "",
+        provider: str | None = None,
+        model: str | None = None,
+        temperature: float = 0.0,
+        max_tokens: int = 1024,
+        stop: list[str] | None = None,
+        cache: bool = True,
+    ) -> AsyncIterator[str]:
+        """Yield the completion of ``prompt`` as it is generated.
+
+        An exact cache hit is yielded in one piece; a finished stream is
+        cached like ``complete``. Token usage is estimated from the text.
+        ``llm_timeout_seconds`` bounds the wait for each chunk. Raises
+        ``LLMError``.
+        """
+        request = self._request(prompt, system, provider, model, temperature, max_tokens, stop)
+        slot = self._slot(request.provider)
+        key = make_prompt_key(request)
+        use_cache = cache and get_settings().llm_cache_enabled
+        if use_cache:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                LLM_CACHE_LOOKUPS.inc(request.provider, "exact")
+                yield cached.text
+                return
+        LLM_CACHE_LOOKUPS.inc(request.provider, "miss")
+
+        estimate = estimate_tokens(request.system + request.prompt) + request.max_tokens
+        timeout = get_settings().llm_timeout_seconds
+        # Not entered as the current span: the caller runs between chunks
+        span = start_span("llm.stream", provider=request.provider, model=request.model)
+        outcome = "error"
+        start = time.perf_counter()
+        parts: list[str] = []
+        async with slot.semaphore:
+            charged = 0.0
+            if slot.budget is not None:
+                charged = await slot.budget.acquire(estimate)
+            chunks = slot.provider.stream(request)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(anext(chunks), timeout)
+                    except StopAsyncIteration:
+                        break
+                    parts.append(chunk)
+                    yield chunk
+                outcome = "ok"
+            except TimeoutError:
+                outcome = "timeout"
+                raise LLMError(f"{request.provider} timed out") from None
+            except LLMError:
+                raise
+            except Exception as exc:
+                raise LLMError(f"{request.provider}: {exc}") from exc
+            finally:
+                await chunks.aclose()
+                text = "".join(parts)
+                input_tokens = estimate_tokens(request.system + request.prompt)
+                output_tokens = estimate_tokens(text) if parts else 0
+                if slot.budget is not None:
+                    # What was generated before a failure was still billed
+                    used = input_tokens + output_tokens if parts else 0
+                    slot.budget.settle(charged, used)
+                LLM_SECONDS.observe(
+                    time.perf_counter() - start, request.provider, request.model, outcome
+                )
+                span.set(input_tokens=input_tokens, output_tokens=output_tokens)
+                span.finish(error=None if outcome == "ok" else outcome)
+
+        LLM_TOKENS.inc(request.provider, "input", amount=input_tokens)
+        LLM_TOKENS.inc(request.provider, "output", amount=output_tokens)
+        if use_cache:
+            await self.cache.put(
+                key,
+                LLMResponse(
+                    text=text,
+                    provider=request.provider,
+                    model=request.model,
+                    input_tokens=input_tokens,
+                    output_tokens=output_tokens,
+                    latency_ms=int((time.perf_counter() - start) * 1000),
+                ),
+            )
+
+    @staticmethod
+    def _request(
+        prompt: str,
+        system: str,
+        provider: str | None,
+        model: str | None,
+        temperature: float,
+        max_tokens: int,
+        stop: list[str] | None,
+    ) -> LLMRequest:
+        settings = get_settings()
+        return LLMRequest(
+            provider=provider or settings.default_llm_provider,
+            model=model or settings.default_llm_model,
+            prompt=prompt,
+            system=system,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stop=stop or [],
+        )
+
+    async def _call(
+        self,
+        slot: _ProviderSlot,
+        key: str,
+        request: LLMRequest,
+        use_cache: bool,
+        vector: np.ndarray | None,
+    ) -> LLMResponse:
+        estimate = estimate_tokens(request.system + request.prompt) + request.max_tokens
+        outcome = "error"
+        start = time.perf_counter()
+        try:
+            with start_span("llm.call", provider=request.provider, model=request.model) as span:
+                async with slot.semaphore:
+                    charged = 0.0
+                    if slot.budget is not None:
+                        charged = await slot.budget.acquire(estimate)
+                    response = await self._send(slot, request, charged)
+                span.set(input_tokens=response.input_tokens, output_tokens=response.output_tokens)
+            outcome = "ok"
+        except TimeoutError:
+            outcome = "timeout"
+            raise LLMError(f"{request.provider} timed out") from None
+        finally:
+            LLM_SECONDS.observe(
+                time.perf_counter() - start, request.provider, request.model, outcome
+            )
+
+        LLM_TOKENS.inc(request.provider, "input", amount=response.input_tokens)
+        LLM_TOKENS.inc(request.provider, "output", amount=response.output_tokens)
+        if use_cache:
+            await self.cache.put(key, response)
+            if vector is not None:
+                self.cache.index(key, request, vector)
+        return response
+
+    @staticmethod
+    async def _send(slot: _ProviderSlot, request: LLMRequest, charged: float) -> LLMResponse:
+        start = time.perf_counter()
+        used = 0
+        try:
+            response = await asyncio.wait_for(
+                slot.provider.complete(request), get_settings().llm_timeout_seconds
+            )
+            used = response.input_tokens + response.output_tokens
+        except (LLMError, TimeoutError):
+            raise
+        except Exception as exc:
+            raise LLMError(f"{request.provider}: {exc}") from exc
+        finally:
+            if slot.budget is not None:
+                slot.budget.settle(charged, used)  # a failed call is refunded
+        latency_ms = int((time.perf_counter() - start) * 1000)
+        return response.model_copy(update={"latency_ms": latency_ms, "cached": None})
+
+
+llm_gateway = LLMGateway()
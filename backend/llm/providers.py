@@ -0,0 +1,246 @@
+"""LLM providers behind the gateway: Gemini over REST and a deterministic stub."""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+from pydantic import BaseModel, Field
+
+from config import get_settings
+
+
+class LLMError(Exception):
+    """A provider failed to produce a completion."""
+
+
+class LLMRequest(BaseModel):
+    """One completion request; every field is part of the cache key."""
+
+    provider: str
+    model: str
+    prompt: str
+    system: str = ""
+    temperature: float = Field(default=0.0, ge=0.0, le=2.0)
+    max_tokens: int = Field(default=1024, gt=0)
+    stop: list[str] = Field(default_factory=list)
+
+
+class LLMResponse(BaseModel):
+    """A completion and its token usage."""
+
+    text: str
+    provider: str
+    model: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    latency_ms: int = 0
+    cached: str | None = None  # exact | semantic, when served from the cache
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting."""
+    return max(1, len(text) // 4)
+
+
+class LLMProvider(ABC):
+    """A completion backend, selected by ``name``."""
+
+    name: str = ""
+
+    @abstractmethod
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        """Return the completion for ``request``; raise ``LLMError`` on failure."""
+        ...
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        """Yield the completion's text as it is generated; raise ``LLMError`` on failure.
+
+        Providers without a streaming API yield the whole completion at once.
+        """
+        yield (await self.complete(request)).text
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini ``generateContent`` over the shared HTTP transport."""
+
+    name = "gemini"
+    URL = "https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent"
+    STREAM_URL = (
+        "https://generativelanguage.googleapis.com/v1beta/models/{model}:streamGenerateContent"
+    )
+
+    @staticmethod
+    def _api_key() -> str:
+        key = get_settings().google_api_key
+        if not key:
+            raise LLMError("GOOGLE_API_KEY is not set")
+        return key
+
+    @staticmethod
+    def _body(request: LLMRequest) -> dict:
+        config: dict = {"temperature": request.temperature, "maxOutputTokens": request.max_tokens}
+        if request.stop:
+            config["stopSequences"] = request.stop
+        body: dict = {
+            "contents": [{"role": "user", "parts": [{"text": request.prompt}]}],
+            "generationConfig": config,
+        }
+        if request.system:
+            body["systemInstruction"] = {"parts": [{"text": request.system}]}
+        return body
+
+    @staticmethod
+    def _text(data: dict) -> str:
+        candidates = data.get("candidates") or []
+        if not candidates:
+            reason = (data.get("promptFeedback") or {}).get("blockReason", "no candidates")
+            raise LLMError(f"gemini returned no completion: {reason}")
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        from tools.http import http_client
+
+        response = await http_client.request(
+            "POST",
+            self.URL.format(model=request.model),
+            headers={"x-goog-api-key": self._api_key()},
+            json=self._body(request),
+            timeout=get_settings().llm_timeout_seconds,
+        )
+        if response.status_code >= 400:
+            raise LLMError(f"gemini returned {response.status_code}: {response.text[:200]}")
+        data = response.json()
+        text = self._text(data)
+        usage = data.get("usageMetadata") or {}
+        return LLMResponse(
+            text=text,
+            provider=self.name,
+            model=request.model,
+            input_tokens=usage.get("promptTokenCount") or estimate_tokens(request.prompt),
+            output_tokens=usage.get("candidatesTokenCount") or estimate_tokens(text),
+        )
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        """``streamGenerateContent`` as server-sent events, one text chunk per event."""
+        from tools.http import http_client
+
+        async with http_client.stream(
+            "POST",
+            self.STREAM_URL.format(model=request.model),
+            params={"alt": "sse"},
+            headers={"x-goog-api-key": self._api_key()},
+            json=self._body(request),
+            timeout=get_settings().llm_timeout_seconds,
+        ) as response:
+            if response.status_code >= 400:
+                body = (await response.aread()).decode(errors="replace")
+                raise LLMError(f"gemini returned {response.status_code}: {body[:200]}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = json.loads(line[5:])
+                if data.get("candidates") is None and "usageMetadata" in data:
+                    continue  # a trailing usage-only event
+                if text := self._text(data):
+                    yield text
+
+
+# Words the stub draws its completions from
+_STUB_WORDS = (
+    "revenue margin growth demand credit capex guidance valuation earnings risk "
+    "sector order book pricing volume outlook exposure balance sheet cash flow"
+).split()
+# Tool names listed in planner prompts ("- name: description") and critic prompts
+_STUB_PLANNER_TOOLS = re.compile(r"^- ([\w.-]+):", re.MULTILINE)
+_STUB_CRITIC_TOOLS = re.compile(r"^Tools used: (.+)$", re.MULTILINE)
+
+
+class StubProvider(LLMProvider):
+    """Deterministic offline provider for tests and benchmarks.
+
+    The completion depends only on the request: the same request always
+    returns the same text after ``llm_stub_latency_ms``. Requests whose
+    system prompt asks for a research plan (``"tasks"``) or a review
+    (``"confidence"``) get well-formed JSON of that shape, so the research
+    graph's branching, reflection and early stop run offline. Anything
+    else gets ``llm_stub_output_tokens`` words (capped at ``max_tokens``).
+    """
+
+    name = "stub"
+
+    async def complete(self, request: LLMRequest) -> LLMResponse:
+        settings = get_settings()
+        if settings.llm_stub_latency_ms:
+            await asyncio.sleep(settings.llm_stub_latency_ms / 1000)
+        text = "".join(self._chunks(request))
+        return LLMResponse(
+            text=text,
+            provider=self.name,
+            model=request.model,
+            input_tokens=estimate_tokens(request.system + request.prompt),
+            output_tokens=estimate_tokens(text),
+        )
+
+    async def stream(self, request: LLMRequest) -> AsyncIterator[str]:
+        """The same text as ``complete``, a word at a time, the latency spread over it."""
+        chunks = self._chunks(request)
+        delay = get_settings().llm_stub_latency_ms / 1000 / len(chunks)
+        for chunk in chunks:
+            if delay:
+                await asyncio.sleep(delay)
+            yield chunk
+
+    @classmethod
+    def _chunks(cls, request: LLMRequest) -> list[str]:
+        """A JSON reply in one chunk, or a tag for the request and then one chunk per word."""
+        digest = hashlib.sha256(request.model_dump_json().encode()).digest()
+        rng = random.Random(digest)
+        if '"tasks"' in request.system:
+            return [json.dumps(cls._plan(request, rng))]
+        if '"confidence"' in request.system:
+            return [json.dumps(cls._review(request, rng))]
+        count = min(request.max_tokens, get_settings().llm_stub_output_tokens)
+        words = [rng.choice(_STUB_WORDS) for _ in range(count)]
+        return [f"[stub {digest.hex()[:12]}]"] + [f" {word}" for word in words]
+
+    @staticmethod
+    def _plan(request: LLMRequest, rng: random.Random) -> dict:
+        """Two independent tasks sharing the listed tools, and a third building on both."""
+        tools = _STUB_PLANNER_TOOLS.findall(request.prompt)
+        calls: list[list[dict]] = [[], []]
+        for i, name in enumerate(tools):
+            calls[i % 2].append({"tool_name": name, "params": {}})
+        topics = rng.sample(_STUB_WORDS, 3)
+        return {
+            "tasks": [
+                {"task": f"Research {topics[0]}", "tools": calls[0], "depends_on": []},
+                {"task": f"Research {topics[1]}", "tools": calls[1], "depends_on": []},
+                {"task": f"Weigh {topics[2]} against both", "tools": [], "depends_on": [0, 1]},
+            ],
+            "rationale": "stub plan",
+        }
+
+    @staticmethod
+    def _review(request: LLMRequest, rng: random.Random) -> dict:
+        """A confidence either side of the usual threshold, flagging one of the tools used."""
+        match = _STUB_CRITIC_TOOLS.search(request.prompt)
+        used = [t.strip() for t in match.group(1).split(",")] if match else []
+        used = [t for t in used if t and t != "none"]
+        return {
+            "confidence": round(rng.uniform(0.5, 1.0), 2),
+            "feedback": f"Check the {rng.choice(_STUB_WORDS)} assumptions.",
+            "flagged_tools": [rng.choice(used)] if used else [],
+        }
+
+
+PROVIDERS: dict[str, type[LLMProvider]] = {
+    GeminiProvider.name: GeminiProvider,
+    StubProvider.name: StubProvider,
+}
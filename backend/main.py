@@ -2,14 +2,14 @@
 
 from __future__ import annotations
 
+import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 from config import get_settings
-from utils import engine, logger
-from models import Base
+from utils import check_schema_version, close_redis, engine, logger, warm_pool
 
 
 @asynccontextmanager
@@ -17,15 +17,40 @@ async def lifespan(app: FastAPI):
     """Application lifespan: startup and shutdown logic."""
     settings = get_settings()
     await logger.ainfo("startup", app=settings.app_name, debug=settings.debug)
+    settings.check_ws_backends()
 
-    # Create tables (in dev; use Alembic migrations in production)
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    # Schema is owned by Alembic; startup only checks the revision
+    await check_schema_version()
+    await warm_pool()
     await logger.ainfo("database_ready")
 
+    # Jobs run in `python -m jobs.worker`; the in-memory queue has no other
+    # process to share with, so it is consumed here instead
+    worker_stop = asyncio.Event()
+    worker = None
+    if settings.job_queue_backend == "memory":
+        from jobs.worker import run_worker
+
+        worker = asyncio.create_task(run_worker(stop=worker_stop))
+
     yield
 
     # Shutdown
+    worker_stop.set()
+    if worker is not None:
+        await worker
+    from api.websocket import ws_manager
+    from rag.embeddings import embedding_service
+    from services.persistence import session_writer
+    from tools.http import http_client
+    from vault.monte_carlo import monte_carlo_engine
+
+    await embedding_service.close()
+    await monte_carlo_engine.close()
+    await http_client.close()
+    await session_writer.close()
+    await ws_manager.close()
+    await close_redis()
     await engine.dispose()
     await logger.ainfo("shutdown")
 
@@ -50,6 +75,11 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
+    if settings.metrics_enabled:
+        from telemetry.middleware import TelemetryMiddleware
+
+        app.add_middleware(TelemetryMiddleware)
+
     # Register routers
     from api.research import router as research_router
     from api.macro import router as macro_router
@@ -67,6 +97,12 @@ def create_app() -> FastAPI:
     async def health():
         return {"status": "ok", "service": settings.app_name}
 
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        from telemetry.metrics import CONTENT_TYPE, registry
+
+        return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
     return app
 
 
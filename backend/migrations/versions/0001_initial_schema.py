@@ -0,0 +1,136 @@
+"""Initial schema (as previously created by Base.metadata.create_all).
+
+Databases that were bootstrapped by create_all already have these tables;
+mark them with ``alembic stamp 0001`` instead of running this revision.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects.postgresql import JSONB, UUID
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _created_at() -> sa.Column:
+    return sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now())
+
+
+def upgrade() -> None:
+    op.create_table(
+        "research_sessions",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", sa.String(), nullable=True),
+        sa.Column("query", sa.Text(), nullable=False),
+        sa.Column("ticker", sa.String(20), nullable=True),
+        sa.Column("status", sa.String(30), nullable=False),
+        _created_at(),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_table(
+        "thought_steps",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "session_id", UUID(as_uuid=True), sa.ForeignKey("research_sessions.id"), nullable=False
+        ),
+        sa.Column("step_number", sa.Integer(), nullable=False),
+        sa.Column("step_type", sa.String(30), nullable=False),
+        sa.Column("title", sa.String(200), nullable=False),
+        sa.Column("content", sa.Text(), nullable=True),
+        sa.Column("confidence", sa.Float(), nullable=True),
+        _created_at(),
+    )
+    op.create_table(
+        "tool_executions",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "thought_step_id", UUID(as_uuid=True), sa.ForeignKey("thought_steps.id"), nullable=False
+        ),
+        sa.Column("tool_name", sa.String(50), nullable=False),
+        sa.Column("input_params", JSONB(), nullable=True),
+        sa.Column("output", JSONB(), nullable=True),
+        sa.Column("execution_time_ms", sa.Integer(), nullable=True),
+        _created_at(),
+    )
+    op.create_table(
+        "citations",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "session_id", UUID(as_uuid=True), sa.ForeignKey("research_sessions.id"), nullable=False
+        ),
+        sa.Column("citation_key", sa.String(20), nullable=False),
+        sa.Column("source_type", sa.String(30), nullable=False),
+        sa.Column("source_name", sa.String(200), nullable=False),
+        sa.Column("source_url", sa.Text(), nullable=True),
+        sa.Column("content_snippet", sa.Text(), nullable=True),
+        sa.Column("page_number", sa.Integer(), nullable=True),
+        _created_at(),
+    )
+    op.create_table(
+        "reports",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "session_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("research_sessions.id"),
+            nullable=False,
+            unique=True,
+        ),
+        sa.Column("executive_summary", sa.Text(), nullable=True),
+        sa.Column("full_report", sa.Text(), nullable=True),
+        sa.Column("report_metadata", JSONB(), nullable=True),
+        _created_at(),
+    )
+    op.create_table(
+        "portfolios",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("user_id", sa.String(), nullable=False),
+        sa.Column("name", sa.String(100), nullable=False),
+        sa.Column("is_private", sa.Integer(), nullable=True),
+        _created_at(),
+    )
+    op.create_table(
+        "holdings",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "portfolio_id", UUID(as_uuid=True), sa.ForeignKey("portfolios.id"), nullable=False
+        ),
+        sa.Column("ticker", sa.String(20), nullable=False),
+        sa.Column("quantity", sa.Float(), nullable=False),
+        sa.Column("avg_buy_price", sa.Float(), nullable=False),
+        sa.Column("current_price", sa.Float(), nullable=True),
+        sa.Column("sector", sa.String(50), nullable=True),
+    )
+    op.create_table(
+        "stress_tests",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "portfolio_id", UUID(as_uuid=True), sa.ForeignKey("portfolios.id"), nullable=False
+        ),
+        sa.Column("scenario_name", sa.String(100), nullable=False),
+        sa.Column("parameters", JSONB(), nullable=True),
+        sa.Column("results", JSONB(), nullable=True),
+        _created_at(),
+    )
+
+
+def downgrade() -> None:
+    for table in (
+        "stress_tests",
+        "holdings",
+        "portfolios",
+        "reports",
+        "citations",
+        "tool_executions",
+        "thought_steps",
+        "research_sessions",
+    ):
+        op.drop_table(table)
@@ -0,0 +1,167 @@
+"""Composite indexes and monthly range partitions for session data.
+
+Adds the secondary indexes the read paths need (session history by user,
+per-ticker lookups, steps by session, tool runs by step, citations by
+session) and converts ``thought_steps`` and ``tool_executions`` into tables
+range-partitioned by month on ``created_at``.
+
+Partitioned tables need the partition key in their primary key, so both now
+use ``(id, created_at)``. Postgres cannot point a foreign key at a
+partitioned table unless it includes the partition key, so the
+``tool_executions.thought_step_id`` constraint is dropped. The ORM still joins
+on it, and rows are written together by the session writer. Existing rows are
+copied into the new partitions. Future partitions are created, and old ones
+dropped, by ``services.partitions``.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+from alembic import context, op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+_COLUMNS = {
+    "thought_steps": """
+        id UUID NOT NULL,
+        session_id UUID NOT NULL REFERENCES research_sessions (id),
+        step_number INTEGER NOT NULL,
+        step_type VARCHAR(30) NOT NULL,
+        title VARCHAR(200) NOT NULL,
+        content TEXT,
+        confidence DOUBLE PRECISION,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    """,
+    "tool_executions": """
+        id UUID NOT NULL,
+        thought_step_id UUID NOT NULL,
+        tool_name VARCHAR(50) NOT NULL,
+        input_params JSONB,
+        output JSONB,
+        execution_time_ms INTEGER,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    """,
+}
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _months_to_cover(table: str) -> list[date]:
+    """Every month from the oldest existing row through MONTHS_AHEAD from now."""
+    oldest = None
+    if not context.is_offline_mode():  # --sql cannot look at the data
+        oldest = op.get_bind().exec_driver_sql(f"SELECT min(created_at) FROM {table}").scalar()
+    today = date.today().replace(day=1)
+    month = oldest.date().replace(day=1) if oldest is not None else today
+    months = []
+    while month <= _add_months(today, MONTHS_AHEAD):
+        months.append(month)
+        month = _add_months(month, 1)
+    return months
+
+
+def _partition(table: str) -> None:
+    months = _months_to_cover(table)
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_legacy")
+    op.execute(
+        f"ALTER TABLE {table}_legacy RENAME CONSTRAINT {table}_pkey TO {table}_legacy_pkey"
+    )
+    op.execute(
+        f"CREATE TABLE {table} ({_COLUMNS[table]}, PRIMARY KEY (id, created_at)) "
+        "PARTITION BY RANGE (created_at)"
+    )
+    for month in months:
+        op.execute(
+            f"CREATE TABLE {table}_y{month:%Y}m{month:%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_add_months(month, 1):%Y-%m-%d}')"
+        )
+    # Catches rows outside the pre-created range until maintenance catches up
+    op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+    op.execute(
+        f"INSERT INTO {table} SELECT * FROM {table}_legacy WHERE created_at IS NOT NULL"
+    )
+    op.execute(
+        f"INSERT INTO {table} SELECT {_select_with_now(table)} FROM {table}_legacy "
+        "WHERE created_at IS NULL"
+    )
+    op.execute(f"DROP TABLE {table}_legacy")
+
+
+def _select_with_now(table: str) -> str:
+    cols = [line.split()[0] for line in _COLUMNS[table].strip().splitlines()]
+    return ", ".join("now()" if c == "created_at" else c for c in cols)
+
+
+def _unpartition(table: str) -> None:
+    op.execute(f"ALTER TABLE {table} RENAME TO {table}_partitioned")
+    op.execute(
+        f"ALTER TABLE {table}_partitioned RENAME CONSTRAINT {table}_pkey "
+        f"TO {table}_partitioned_pkey"
+    )
+    op.execute(f"CREATE TABLE {table} ({_COLUMNS[table]}, PRIMARY KEY (id))")
+    op.execute(f"INSERT INTO {table} SELECT * FROM {table}_partitioned")
+    op.execute(f"DROP TABLE {table}_partitioned CASCADE")
+
+
+def upgrade() -> None:
+    op.drop_constraint("tool_executions_thought_step_id_fkey", "tool_executions")
+    _partition("thought_steps")
+    _partition("tool_executions")
+
+    # Indexes on a partitioned parent are created on every partition
+    op.create_index(
+        "ix_thought_steps_session_step", "thought_steps", ["session_id", "step_number"]
+    )
+    op.create_index("ix_tool_executions_thought_step", "tool_executions", ["thought_step_id"])
+    op.create_index("ix_citations_session", "citations", ["session_id", "citation_key"])
+    op.create_index(
+        "ix_research_sessions_user_created", "research_sessions", ["user_id", "created_at"]
+    )
+    op.create_index(
+        "ix_research_sessions_ticker_created", "research_sessions", ["ticker", "created_at"]
+    )
+    op.create_index("ix_research_sessions_created", "research_sessions", ["created_at"])
+    op.create_index("ix_portfolios_user", "portfolios", ["user_id"])
+    op.create_index("ix_holdings_portfolio", "holdings", ["portfolio_id"])
+    op.create_index("ix_holdings_ticker", "holdings", ["ticker"])
+    op.create_index(
+        "ix_stress_tests_portfolio_created", "stress_tests", ["portfolio_id", "created_at"]
+    )
+
+
+def downgrade() -> None:
+    for name, table in (
+        ("ix_stress_tests_portfolio_created", "stress_tests"),
+        ("ix_holdings_ticker", "holdings"),
+        ("ix_holdings_portfolio", "holdings"),
+        ("ix_portfolios_user", "portfolios"),
+        ("ix_research_sessions_created", "research_sessions"),
+        ("ix_research_sessions_ticker_created", "research_sessions"),
+        ("ix_research_sessions_user_created", "research_sessions"),
+        ("ix_citations_session", "citations"),
+    ):
+        op.drop_index(name, table_name=table)
+
+    # Dropping the partitioned tables drops their indexes too
+    _unpartition("tool_executions")
+    _unpartition("thought_steps")
+    op.create_foreign_key(
+        "tool_executions_thought_step_id_fkey",
+        "tool_executions",
+        "thought_steps",
+        ["thought_step_id"],
+        ["id"],
+    )
@@ -0,0 +1,29 @@
+"""Timestamp of the last quote stored on a holding.
+
+``holdings.current_price`` is now refreshed by ``services.quotes``;
+``price_updated_at`` records when, so views can show how fresh it is.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+
+from __future__ import annotations
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "holdings", sa.Column("price_updated_at", sa.DateTime(timezone=True), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("holdings", "price_updated_at")
@@ -14,6 +14,7 @@ from sqlalchemy import (
     Enum,
     Float,
     ForeignKey,
+    Index,
     Integer,
     String,
     Text,
@@ -36,6 +37,11 @@ class Base(DeclarativeBase):
 
 class ResearchSession(Base):
     __tablename__ = "research_sessions"
+    __table_args__ = (
+        Index("ix_research_sessions_user_created", "user_id", "created_at"),
+        Index("ix_research_sessions_ticker_created", "ticker", "created_at"),
+        Index("ix_research_sessions_created", "created_at"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     user_id = Column(String, nullable=True)
@@ -50,13 +56,21 @@ class ResearchSession(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships
-    thought_steps = relationship("ThoughtStep", back_populates="session", cascade="all, delete")
+    thought_steps = relationship(
+        "ThoughtStep",
+        back_populates="session",
+        cascade="all, delete",
+        order_by="ThoughtStep.step_number",
+    )
     citations = relationship("Citation", back_populates="session", cascade="all, delete")
     report = relationship("Report", back_populates="session", uselist=False, cascade="all, delete")
 
 
 class ThoughtStep(Base):
+    # Range-partitioned by month on created_at (see migrations/0002). The
+    # database primary key is (id, created_at); id alone is unique.
     __tablename__ = "thought_steps"
+    __table_args__ = (Index("ix_thought_steps_session_step", "session_id", "step_number"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("research_sessions.id"), nullable=False)
@@ -72,15 +86,21 @@ class ThoughtStep(Base):
     # Relationships
     session = relationship("ResearchSession", back_populates="thought_steps")
     tool_executions = relationship(
-        "ToolExecution", back_populates="thought_step", cascade="all, delete"
+        "ToolExecution",
+        back_populates="thought_step",
+        cascade="all, delete",
+        primaryjoin="ThoughtStep.id == foreign(ToolExecution.thought_step_id)",
     )
 
 
 class ToolExecution(Base):
+    # Partitioned like thought_steps. Postgres cannot reference a partitioned
+    # table by id alone, so thought_step_id is a logical (unenforced) key.
     __tablename__ = "tool_executions"
+    __table_args__ = (Index("ix_tool_executions_thought_step", "thought_step_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
-    thought_step_id = Column(UUID(as_uuid=True), ForeignKey("thought_steps.id"), nullable=False)
+    thought_step_id = Column(UUID(as_uuid=True), nullable=False)
     tool_name = Column(String(50), nullable=False)
     input_params = Column(JSONB, nullable=True)
     output = Column(JSONB, nullable=True)
@@ -88,11 +108,16 @@ class ToolExecution(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
-    thought_step = relationship("ThoughtStep", back_populates="tool_executions")
+    thought_step = relationship(
+        "ThoughtStep",
+        back_populates="tool_executions",
+        primaryjoin="ThoughtStep.id == foreign(ToolExecution.thought_step_id)",
+    )
 
 
 class Citation(Base):
     __tablename__ = "citations"
+    __table_args__ = (Index("ix_citations_session", "session_id", "citation_key"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     session_id = Column(UUID(as_uuid=True), ForeignKey("research_sessions.id"), nullable=False)
@@ -126,6 +151,7 @@ class Report(Base):
 
 class Portfolio(Base):
     __tablename__ = "portfolios"
+    __table_args__ = (Index("ix_portfolios_user", "user_id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     user_id = Column(String, nullable=False)
@@ -140,13 +166,18 @@ class Portfolio(Base):
 
 class Holding(Base):
     __tablename__ = "holdings"
+    __table_args__ = (
+        Index("ix_holdings_portfolio", "portfolio_id"),
+        Index("ix_holdings_ticker", "ticker"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     portfolio_id = Column(UUID(as_uuid=True), ForeignKey("portfolios.id"), nullable=False)
     ticker = Column(String(20), nullable=False)
     quantity = Column(Float, nullable=False)
     avg_buy_price = Column(Float, nullable=False)
-    current_price = Column(Float, nullable=True)
+    current_price = Column(Float, nullable=True)  # refreshed by services.quotes
+    price_updated_at = Column(DateTime(timezone=True), nullable=True)
     sector = Column(String(50), nullable=True)
 
     # Relationships
@@ -155,6 +186,7 @@ class Holding(Base):
 
 class StressTest(Base):
     __tablename__ = "stress_tests"
+    __table_args__ = (Index("ix_stress_tests_portfolio_created", "portfolio_id", "created_at"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     portfolio_id = Column(UUID(as_uuid=True), ForeignKey("portfolios.id"), nullable=False)
@@ -201,17 +233,34 @@ class PortfolioUploadRequest(BaseModel):
 class HoldingInput(BaseModel):
     """Single holding input."""
 
-    ticker: str
-    quantity: float
-    avg_buy_price: float
-    sector: str | None = None
+    ticker: str = Field(..., min_length=1, max_length=20)
+    quantity: float = Field(..., gt=0)
+    avg_buy_price: float = Field(..., ge=0)
+    sector: str | None = Field(default=None, max_length=50)
 
 
 class StressTestRequest(BaseModel):
-    """Request to run a stress test."""
+    """Request to run a stress test.
+
+    ``scenario_name`` is a built-in scenario, "all", or the name of a custom
+    scenario described by ``parameters``. ``scenarios`` adds more built-in
+    scenarios to the same run.
+    """
 
     scenario_name: str
     parameters: dict[str, Any] = Field(default_factory=dict)
+    scenarios: list[str] = Field(default_factory=list)
+
+
+class MonteCarloRequest(BaseModel):
+    """Request to run a Monte Carlo VaR simulation; unset values use the server defaults."""
+
+    paths: int | None = Field(default=None, ge=100)
+    horizon_days: int | None = Field(default=None, ge=1, le=252)
+    confidence_levels: list[float] = Field(default_factory=lambda: [0.95, 0.99], min_length=1)
+    distribution: str = Field(default="normal", pattern="^(normal|t)$")
+    df: float = Field(default=5.0, gt=2, description="Degrees of freedom for distribution='t'")
+    seed: int | None = Field(default=None, ge=0, description="Fix to reproduce a run")
 
 
 # Fix forward reference
@@ -277,6 +326,67 @@ class MacroAnalysisResponse(BaseModel):
     citations: list[CitationResponse] = Field(default_factory=list)
 
 
+class HoldingRowError(BaseModel):
+    """A portfolio file row that could not be imported."""
+
+    row: int  # 1-based row number in the uploaded file
+    field: str | None = None
+    message: str
+
+
+class PortfolioUploadResponse(BaseModel):
+    """Result of a portfolio file upload."""
+
+    portfolio_id: str | None = None
+    name: str
+    rows_read: int
+    holdings_count: int
+    error_count: int = 0
+    errors: list[HoldingRowError] = Field(default_factory=list)
+
+
+class HoldingResponse(BaseModel):
+    """A holding with its last stored quote."""
+
+    ticker: str
+    quantity: float
+    avg_buy_price: float
+    current_price: float | None = None
+    price_updated_at: datetime | None = None
+    sector: str | None = None
+
+
+class PortfolioResponse(BaseModel):
+    """A portfolio with its holdings valued at the stored quotes."""
+
+    id: str
+    name: str
+    holdings: list[HoldingResponse] = Field(default_factory=list)
+    total_invested: float = 0.0
+    total_value: float = 0.0  # at current price where known, else at cost
+
+
+class StressTestResponse(BaseModel):
+    """Stress test results for a portfolio."""
+
+    stress_test_id: str
+    portfolio_id: str
+    scenario_name: str
+    portfolio_value: float
+    results: list[dict[str, Any]] = Field(default_factory=list)
+
+
+class MonteCarloResponse(BaseModel):
+    """A Monte Carlo simulation; ``results`` is set once it has completed."""
+
+    stress_test_id: str
+    portfolio_id: str
+    status: str  # queued | running | complete | error
+    parameters: dict[str, Any] = Field(default_factory=dict)
+    results: dict[str, Any] | None = None
+    error: str | None = None
+
+
 # --- WebSocket Event Schemas ---
 
 
@@ -296,13 +406,28 @@ class WSStatusEvent(BaseModel):
     status: str
 
 
-class WSReportEvent(BaseModel):
-    """WebSocket event when report is ready."""
+class WSReportDeltaEvent(BaseModel):
+    """WebSocket event carrying the next chunk of a report section."""
+
+    event: str = "report_delta"
+    session_id: str
+    section: str  # executive_summary | full_report
+    index: int  # chunk number across the report, from 0
+    text: str
+
+
+class WSReportSectionDigest(BaseModel):
+    bytes: int  # UTF-8 length of the section
+    sha256: str
+
+
+class WSReportCompleteEvent(BaseModel):
+    """WebSocket event after the last report chunk, to verify the reassembled text."""
 
-    event: str = "report_ready"
+    event: str = "report_complete"
     session_id: str
-    executive_summary: str
-    full_report: str
+    chunks: int
+    sections: dict[str, WSReportSectionDigest]
 
 
 class WSErrorEvent(BaseModel):
@@ -0,0 +1,299 @@
+"""Batched embedding service for the RAG pipeline.
+
+Concurrent ``embed`` calls (retrieval queries, ingestion batches) are
+gathered into micro-batches: a batch goes to the model when it reaches
+``embedding_batch_size`` texts or when ``embedding_batch_window_ms`` has
+passed since its first text. The sentence-transformers model runs in a pool
+of worker processes, so throughput scales with cores and the event loop is
+never blocked on inference.
+
+Every vector is kept in an on-disk, memory-mapped float32 cache keyed by a
+hash of the text. Repeated texts are answered from the cache without
+reaching the model, including after a restart and across processes that
+share the cache directory.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+from collections.abc import Sequence
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from config import get_settings
+from utils import logger
+
+# ---------------------------------------------------------------------------
+# On-disk cache
+# ---------------------------------------------------------------------------
+
+
+class EmbeddingCache:
+    """Append-only, memory-mapped float32 vectors keyed by text hash.
+
+    ``keys.bin`` holds 16-byte hashes and row ``i`` of ``vectors.f32`` is the
+    vector for key ``i``. A vector is written before its key, so any reader
+    that sees a key can read its vector. Appends hold an exclusive lock on
+    ``lock``, so several processes can share one cache directory.
+
+    Methods block on file I/O; the service calls them from worker threads,
+    which share the in-memory index under a thread lock.
+    """
+
+    KEY_BYTES = 16
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._keys_file = self.path / "keys.bin"
+        self._vectors_file = self.path / "vectors.f32"
+        self._meta_file = self.path / "meta.json"
+        self._index: dict[bytes, int] = {}
+        self._mmap: np.memmap | None = None
+        self._lock = threading.Lock()
+        self.dim: int | None = None
+        self._sync()
+
+    @classmethod
+    def key(cls, text: str) -> bytes:
+        return hashlib.blake2b(text.encode(), digest_size=cls.KEY_BYTES).digest()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _sync(self) -> None:
+        """Pick up keys appended by other processes since the last sync."""
+        if self.dim is None:
+            if not self._meta_file.exists():
+                return
+            self.dim = json.loads(self._meta_file.read_text())["dim"]
+        if not self._keys_file.exists():
+            return
+        with self._keys_file.open("rb") as f:
+            f.seek(len(self._index) * self.KEY_BYTES)
+            tail = f.read()
+        start = len(self._index)
+        for i in range(len(tail) // self.KEY_BYTES):
+            self._index[tail[i * self.KEY_BYTES : (i + 1) * self.KEY_BYTES]] = start + i
+
+    def _vectors(self) -> np.memmap:
+        rows = len(self._index)
+        if self._mmap is None or self._mmap.shape[0] < rows:
+            self._mmap = np.memmap(
+                self._vectors_file, dtype=np.float32, mode="r", shape=(rows, self.dim)
+            )
+        return self._mmap
+
+    def lookup(self, keys: Sequence[bytes]) -> dict[bytes, np.ndarray]:
+        """Return cached vectors (copies) for the keys that are present."""
+        with self._lock:
+            if any(k not in self._index for k in keys):
+                self._sync()
+            rows = {k: self._index[k] for k in keys if k in self._index}
+            if not rows:
+                return {}
+            block = self._vectors()[list(rows.values())]  # fancy indexing copies
+        return dict(zip(rows, block))
+
+    def put_many(self, keys: Sequence[bytes], vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        with self._lock, (self.path / "lock").open("wb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if self.dim is None:
+                self._sync()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._meta_file.write_text(json.dumps({"dim": self.dim}))
+            self._sync()
+            first: dict[bytes, int] = {}
+            for i, k in enumerate(keys):
+                if k not in self._index:
+                    first.setdefault(k, i)  # first of any duplicates
+            fresh = list(first.values())
+            if not fresh:
+                return
+            start = len(self._index)
+            # Row position comes from the key count, so a torn write (vector
+            # written, key not) is simply overwritten by the next append
+            with self._vectors_file.open("r+b" if self._vectors_file.exists() else "wb") as f:
+                f.seek(start * self.dim * 4)
+                f.write(vectors[fresh].tobytes())
+            with self._keys_file.open("ab") as f:
+                f.write(b"".join(keys[i] for i in fresh))
+            for n, i in enumerate(fresh):
+                self._index[keys[i]] = start + n
+
+
+# ---------------------------------------------------------------------------
+# Model worker processes
+# ---------------------------------------------------------------------------
+
+_model: Any = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(threads)  # one share of the cores per process
+    _model = SentenceTransformer(model_name)
+
+
+def _encode(texts: list[str]) -> np.ndarray:
+    vectors = _model.encode(
+        texts,
+        batch_size=len(texts),
+        normalize_embeddings=True,
+        convert_to_numpy=True,
+        show_progress_bar=False,
+    )
+    return vectors.astype(np.float32, copy=False)
+
+
+# ---------------------------------------------------------------------------
+# Service
+# ---------------------------------------------------------------------------
+
+_Pending = tuple[bytes, str, asyncio.Future]
+
+
+class EmbeddingService:
+    """Micro-batching front end to a process pool running the embedding model."""
+
+    def __init__(
+        self,
+        model_name: str | None = None,
+        batch_size: int | None = None,
+        window_ms: float | None = None,
+        workers: int | None = None,
+        cache_dir: str | Path | None = None,
+    ) -> None:
+        settings = get_settings()
+        self.model_name = model_name or settings.embedding_model
+        self.batch_size = batch_size or settings.embedding_batch_size
+        self.window = (
+            settings.embedding_batch_window_ms if window_ms is None else window_ms
+        ) / 1000
+        self.workers = workers or settings.embedding_workers or os.cpu_count() or 1
+        self._cache_dir = Path(cache_dir or settings.embedding_cache_dir)
+        self._cache: EmbeddingCache | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending: list[_Pending] = []
+        self._inflight: dict[bytes, asyncio.Future] = {}
+        self._wake: asyncio.Event | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._batcher: asyncio.Task | None = None
+        self._batches: set[asyncio.Task] = set()
+
+    @property
+    def cache(self) -> EmbeddingCache:
+        if self._cache is None:
+            slug = self.model_name.replace("/", "--")
+            self._cache = EmbeddingCache(self._cache_dir / slug)
+        return self._cache
+
+    async def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts as an ``(n, dim)`` float32 array of L2-normalized rows."""
+        keys = [self.cache.key(text) for text in texts]
+        vectors = await asyncio.to_thread(self.cache.lookup, keys)
+
+        waiting: dict[bytes, asyncio.Future] = {}
+        for key, text in zip(keys, texts):
+            if key in vectors or key in waiting:
+                continue
+            future = self._inflight.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self._inflight[key] = future
+                self._pending.append((key, text, future))
+            waiting[key] = future
+        if waiting:
+            self._start()
+            self._wake.set()
+            # Shielded: a cancelled caller must not fail a batch others share
+            results = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()))
+            vectors.update(zip(waiting, results))
+
+        if not keys:
+            return np.empty((0, self.cache.dim or 0), dtype=np.float32)
+        return np.stack([vectors[key] for key in keys])
+
+    def _start(self) -> None:
+        if self._batcher is None or self._batcher.done():
+            self._wake = asyncio.Event()
+            self._slots = asyncio.Semaphore(self.workers)
+            self._batcher = asyncio.create_task(self._batch_loop())
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wake.wait()
+            deadline = loop.time() + self.window
+            while len(self._pending) < self.batch_size and (left := deadline - loop.time()) > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), left)
+                except TimeoutError:
+                    break
+            batch = self._pending[: self.batch_size]
+            del self._pending[: self.batch_size]
+            if not self._pending:
+                self._wake.clear()
+            if not batch:
+                continue
+            await self._slots.acquire()  # at most one batch per worker process
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: list[_Pending]) -> None:
+        keys = [key for key, _, _ in batch]
+        try:
+            vectors = await self._encode([text for _, text, _ in batch])
+            await asyncio.to_thread(self.cache.put_many, keys, vectors)
+            for (_, _, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+        except Exception as e:
+            await logger.aerror("embedding_batch_failed", size=len(batch), error=str(e))
+            for _, _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            for key in keys:
+                self._inflight.pop(key, None)
+            self._slots.release()
+
+    async def _encode(self, texts: list[str]) -> np.ndarray:
+        if self._pool is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, threads),
+            )
+        return await asyncio.get_running_loop().run_in_executor(self._pool, _encode, texts)
+
+    async def close(self) -> None:
+        if self._batcher is not None:
+            self._batcher.cancel()
+            self._batcher = None
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown)
+            self._pool = None
+
+
+embedding_service = EmbeddingService()
@@ -0,0 +1,283 @@
+"""Hybrid retrieval for analyst context: BM25 plus vector search.
+
+Dense search misses exact tokens such as tickers, scheme names and figures
+like "NIM 4.1%", and keyword search misses paraphrases. Each query runs
+both. An in-memory BM25 index over chunk text sits next to the vector
+index, the two candidate lists are merged with reciprocal rank fusion, and
+the fused block is re-ranked with one vectorized cosine pass against the
+query embedding.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+import time
+from collections import Counter
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+
+from agents.state import Citation
+from config import get_settings
+from rag.vectorstore import Chunk, VectorStore, vector_store
+from utils import logger
+
+# Numbers keep their decimals and percent sign ("4.1%"); words keep "&" ("m&m")
+_TOKEN = re.compile(r"\d+(?:[.,]\d+)*%?|[a-z][a-z0-9&]*")
+
+
+def tokenize(text: str) -> list[str]:
+    return _TOKEN.findall(text.lower())
+
+
+# ---------------------------------------------------------------------------
+# BM25 Index
+# ---------------------------------------------------------------------------
+
+
+class KeywordIndex:
+    """Okapi BM25 inverted index over chunk text.
+
+    Chunks live in numbered slots; postings map each term to ``{slot: tf}``.
+    Query scoring accumulates into one array over all slots per query term.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._slots: dict[str, int] = {}  # chunk id -> slot
+        self._ids: list[str | None] = []  # slot -> chunk id
+        self._terms: list[tuple[str, ...]] = []  # slot -> distinct terms, for removal
+        self._lengths = np.zeros(1024, dtype=np.float32)
+        self._total_length = 0.0
+        self._free: list[int] = []
+        self._postings: dict[str, dict[int, int]] = {}
+        self._by_ticker: dict[str, set[int]] = {}
+        self._by_source: dict[str, set[int]] = {}
+        self._meta: list[tuple[str | None, str | None]] = []  # slot -> (ticker, source type)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def on_upsert(
+        self, ids: list[str], texts: list[str], metadatas: list[dict[str, Any]]
+    ) -> None:
+        self.on_delete([cid for cid in ids if cid in self._slots])
+        for cid, text, meta in zip(ids, texts, metadatas):
+            slot = self._free.pop() if self._free else len(self._ids)
+            if slot == len(self._ids):
+                self._ids.append(None)
+                self._terms.append(())
+                self._meta.append((None, None))
+                if slot >= len(self._lengths):
+                    self._lengths = np.concatenate([self._lengths, np.zeros_like(self._lengths)])
+            tokens = tokenize(text)
+            counts = Counter(tokens)
+            for term, tf in counts.items():
+                self._postings.setdefault(term, {})[slot] = tf
+            ticker, source = meta.get("ticker"), meta.get("source_type")
+            if ticker:
+                self._by_ticker.setdefault(ticker, set()).add(slot)
+            if source:
+                self._by_source.setdefault(source, set()).add(slot)
+            self._slots[cid] = slot
+            self._ids[slot] = cid
+            self._terms[slot] = tuple(counts)
+            self._meta[slot] = (ticker, source)
+            self._lengths[slot] = len(tokens)
+            self._total_length += len(tokens)
+
+    def on_delete(self, ids: list[str]) -> None:
+        for cid in ids:
+            slot = self._slots.pop(cid, None)
+            if slot is None:
+                continue
+            for term in self._terms[slot]:
+                postings = self._postings[term]
+                del postings[slot]
+                if not postings:
+                    del self._postings[term]
+            ticker, source = self._meta[slot]
+            if ticker:
+                self._by_ticker[ticker].discard(slot)
+            if source:
+                self._by_source[source].discard(slot)
+            self._total_length -= float(self._lengths[slot])
+            self._lengths[slot] = 0
+            self._ids[slot] = None
+            self._terms[slot] = ()
+            self._meta[slot] = (None, None)
+            self._free.append(slot)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        ticker: str | None = None,
+        source_types: Iterable[str] | None = None,
+    ) -> list[tuple[str, float]]:
+        """Return up to ``k`` ``(chunk id, BM25 score)`` pairs, best first."""
+        n = len(self._slots)
+        terms = set(tokenize(query))
+        if not n or not terms:
+            return []
+        avgdl = self._total_length / n
+        scores = np.zeros(len(self._ids), dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * self._lengths[: len(self._ids)] / avgdl)
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            slots = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+            scores[slots] += idf * tf * (self.k1 + 1) / (tf + norms[slots])
+
+        if ticker or source_types:
+            allowed = np.ones(len(scores), dtype=bool)
+            if ticker:
+                allowed &= self._mask(self._by_ticker.get(ticker.upper(), set()))
+            if source_types:
+                allowed &= self._mask(
+                    set().union(*(self._by_source.get(s, set()) for s in source_types))
+                )
+            scores[~allowed] = 0
+
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits])]
+        return [(self._ids[slot], float(scores[slot])) for slot in hits]
+
+    def _mask(self, slots: set[int]) -> np.ndarray:
+        mask = np.zeros(len(self._ids), dtype=bool)
+        if slots:
+            mask[np.fromiter(slots, dtype=np.int64, count=len(slots))] = True
+        return mask
+
+
+# ---------------------------------------------------------------------------
+# Hybrid Retriever
+# ---------------------------------------------------------------------------
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Iterable[str]], k: int) -> dict[str, float]:
+    """Fuse ranked id lists: each id scores ``sum(1 / (k + rank))`` over the lists."""
+    fused: dict[str, float] = {}
+    for ranked in rankings:
+        for rank, cid in enumerate(ranked, start=1):
+            fused[cid] = fused.get(cid, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+class HybridRetriever:
+    """BM25 and vector candidates, fused by rank and re-ranked by cosine."""
+
+    def __init__(self, store: VectorStore = vector_store) -> None:
+        self.store = store
+        self._keywords: KeywordIndex | None = None
+        self._loading: asyncio.Task | None = None
+        self._checked_at = 0.0
+        store.subscribe(self)
+
+    # Changes made through this process's store go straight into the index
+    def on_upsert(
+        self, ids: list[str], texts: list[str], metadatas: list[dict[str, Any]]
+    ) -> None:
+        if self._keywords is not None:
+            self._keywords.on_upsert(ids, texts, metadatas)
+
+    def on_delete(self, ids: list[str]) -> None:
+        if self._keywords is not None:
+            self._keywords.on_delete(ids)
+
+    def _build(self) -> KeywordIndex:
+        index = KeywordIndex()
+        for ids, texts, metadatas in self.store.scan():
+            index.on_upsert(ids, texts, metadatas)
+        return index
+
+    async def _load(self) -> None:
+        started = time.perf_counter()
+        self._keywords = await asyncio.to_thread(self._build)
+        await logger.ainfo(
+            "keyword_index_loaded",
+            chunks=len(self._keywords),
+            ms=int((time.perf_counter() - started) * 1000),
+        )
+
+    async def _ensure_index(self) -> KeywordIndex:
+        """Load the index on first use; rebuild it if other processes changed the store."""
+        if self._keywords is None or (
+            time.monotonic() - self._checked_at > get_settings().rag_keyword_sync_seconds
+            and await asyncio.to_thread(self.store.collection.count) != len(self._keywords)
+        ):
+            if self._loading is None or self._loading.done():
+                self._loading = asyncio.create_task(self._load())
+            if self._keywords is None:
+                await asyncio.shield(self._loading)
+        self._checked_at = time.monotonic()
+        return self._keywords
+
+    async def query(
+        self,
+        query: str,
+        k: int = 8,
+        ticker: str | None = None,
+        source_types: Iterable[str] | None = None,
+    ) -> list[Chunk]:
+        """Return the ``k`` best chunks with their final hybrid scores."""
+        settings = get_settings()
+        source_types = list(source_types) if source_types else None
+        keywords = await self._ensure_index()
+        vector = (await self.store.embedder.embed([query]))[0]
+        dense = await self.store.query_vector(
+            vector, settings.rag_candidates, ticker, source_types
+        )
+        sparse = keywords.search(query, settings.rag_candidates, ticker, source_types)
+
+        fused = reciprocal_rank_fusion(
+            ([c.id for c in dense], [cid for cid, _ in sparse]), settings.rag_rrf_k
+        )
+        if not fused:
+            return []
+
+        found = await asyncio.to_thread(
+            self.store.collection.get,
+            ids=list(fused),
+            include=["embeddings", "documents", "metadatas"],
+        )
+        if not found["ids"]:
+            return []
+        block = np.asarray(found["embeddings"], dtype=np.float32)
+        cosine = block @ vector / (np.linalg.norm(block, axis=1) * np.linalg.norm(vector) + 1e-12)
+        rrf = np.array([fused[cid] for cid in found["ids"]], dtype=np.float32)
+        weight = settings.rag_rerank_weight
+        scores = weight * cosine + (1 - weight) * rrf / rrf.max()
+
+        top = np.argsort(-scores)[:k]
+        return [
+            Chunk(
+                id=found["ids"][i],
+                text=found["documents"][i],
+                metadata=found["metadatas"][i],
+                score=float(scores[i]),
+            )
+            for i in top
+        ]
+
+    async def search(
+        self,
+        query: str,
+        k: int = 8,
+        ticker: str | None = None,
+        source_types: Iterable[str] | None = None,
+    ) -> list[Citation]:
+        """Retrieve the ``k`` most relevant chunks as citations."""
+        return [chunk.to_citation() for chunk in await self.query(query, k, ticker, source_types)]
+
+
+retriever = HybridRetriever()
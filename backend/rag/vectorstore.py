@@ -0,0 +1,315 @@
+"""Persistent vector index over document chunks (ChromaDB).
+
+Documents are split into overlapping chunks. Each chunk is stored under a
+hash of its document and text, so re-ingesting a document embeds only the
+chunks that changed and deletes the ones that disappeared; unchanged chunks
+are never re-embedded. Retrieval is filtered by ticker and source type in
+the index itself and returns ``Citation`` objects.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from collections.abc import Iterable, Iterator, Sequence
+from typing import Any, Protocol
+
+from pydantic import BaseModel
+
+from agents.state import Citation
+from config import get_settings
+from rag.embeddings import EmbeddingService, embedding_service
+from utils import logger
+
+
+class Document(BaseModel):
+    """A source text to index, e.g. one page of an investor presentation."""
+
+    text: str
+    source_type: str  # screener, pdf, news, web
+    source_name: str
+    ticker: str | None = None
+    url: str | None = None
+    page_number: int | None = None
+
+    @property
+    def doc_id(self) -> str:
+        """Stable identity of the document across re-ingestion."""
+        key = "\x00".join(
+            str(part or "")
+            for part in (self.ticker, self.source_type, self.source_name, self.page_number)
+        )
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+class Chunk(BaseModel):
+    """One indexed chunk; ``id`` is the hash of its document and text."""
+
+    id: str
+    text: str
+    metadata: dict[str, Any]
+    score: float = 0.0
+
+    def to_citation(self) -> Citation:
+        return Citation(
+            source_type=self.metadata["source_type"],
+            source_name=self.metadata["source_name"],
+            url=self.metadata.get("url"),
+            content_snippet=self.text,
+            page_number=self.metadata.get("page_number"),
+        )
+
+
+class ChunkListener(Protocol):
+    """Receives index changes, e.g. to keep a keyword index in step."""
+
+    def on_upsert(
+        self, ids: list[str], texts: list[str], metadatas: list[dict[str, Any]]
+    ) -> None: ...
+
+    def on_delete(self, ids: list[str]) -> None: ...
+
+
+class IngestStats(BaseModel):
+    added: int = 0
+    unchanged: int = 0
+    deleted: int = 0
+
+
+# ---------------------------------------------------------------------------
+# Chunking
+# ---------------------------------------------------------------------------
+
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+def _split(text: str, limit: int, level: int = 0) -> list[str]:
+    """Split on the coarsest separator that brings every piece under ``limit``."""
+    if len(text) <= limit:
+        return [text]
+    if level == len(_SEPARATORS):
+        return [text[i : i + limit] for i in range(0, len(text), limit)]
+    sep = _SEPARATORS[level]
+    parts = text.split(sep)
+    pieces = []
+    for i, part in enumerate(parts):
+        if i < len(parts) - 1:
+            part += sep
+        pieces.extend(_split(part, limit, level + 1))
+    return pieces
+
+
+def chunk_text(text: str, size: int | None = None, overlap: int | None = None) -> list[str]:
+    """Split text into chunks of at most ``size`` characters.
+
+    Splits prefer paragraph, then line, then sentence boundaries. Each chunk
+    starts with up to ``overlap`` characters from the end of the previous one.
+    """
+    settings = get_settings()
+    size = size or settings.rag_chunk_size
+    overlap = min(settings.rag_chunk_overlap if overlap is None else overlap, size // 2)
+    text = text.strip()
+    if len(text) <= size:
+        return [text] if text else []
+
+    chunks = []
+    current = ""
+    for piece in _split(text, size - overlap):
+        if current and len(current) + len(piece) > size:
+            chunks.append(current.strip())
+            tail = current[-overlap:] if overlap else ""
+            space = tail.find(" ")
+            current = tail[space + 1 :] if space >= 0 else tail  # start on a word
+        current += piece
+    if current.strip():
+        chunks.append(current.strip())
+    return chunks
+
+
+def _chunk_id(doc_id: str, text: str) -> str:
+    return hashlib.sha256(f"{doc_id}\x00{text}".encode()).hexdigest()[:32]
+
+
+def _metadata(doc: Document) -> dict[str, Any]:
+    meta = {
+        "doc_id": doc.doc_id,
+        "source_type": doc.source_type,
+        "source_name": doc.source_name,
+        "ticker": doc.ticker.upper() if doc.ticker else None,
+        "url": doc.url,
+        "page_number": doc.page_number,
+    }
+    return {k: v for k, v in meta.items() if v is not None}  # Chroma rejects None
+
+
+def _where(ticker: str | None, source_types: Iterable[str] | None) -> dict[str, Any] | None:
+    clauses: list[dict[str, Any]] = []
+    if ticker:
+        clauses.append({"ticker": ticker.upper()})
+    if source_types:
+        clauses.append({"source_type": {"$in": list(source_types)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+# ---------------------------------------------------------------------------
+# Vector Store
+# ---------------------------------------------------------------------------
+
+
+class VectorStore:
+    """Chunk index persisted under ``Settings.chroma_persist_dir``."""
+
+    def __init__(
+        self,
+        persist_dir: str | None = None,
+        collection: str | None = None,
+        embedder: EmbeddingService = embedding_service,
+    ) -> None:
+        settings = get_settings()
+        self.persist_dir = persist_dir or settings.chroma_persist_dir
+        self.collection_name = collection or settings.chroma_collection
+        self.embedder = embedder
+        self._collection: Any = None
+        self._listeners: list[ChunkListener] = []
+
+    def subscribe(self, listener: ChunkListener) -> None:
+        """Notify ``listener`` of chunks upserted or deleted by this process."""
+        self._listeners.append(listener)
+
+    @property
+    def collection(self) -> Any:
+        if self._collection is None:
+            import chromadb
+
+            client = chromadb.PersistentClient(path=self.persist_dir)
+            self._collection = client.get_or_create_collection(
+                self.collection_name,
+                embedding_function=None,  # vectors always come from self.embedder
+                metadata={"hnsw:space": "cosine"},
+            )
+        return self._collection
+
+    def scan(self, page: int = 5000) -> Iterator[tuple[list[str], list[str], list[dict[str, Any]]]]:
+        """Yield every stored chunk as ``(ids, texts, metadatas)`` pages (blocking)."""
+        offset = 0
+        while True:
+            found = self.collection.get(
+                include=["documents", "metadatas"], limit=page, offset=offset
+            )
+            if not found["ids"]:
+                return
+            yield found["ids"], found["documents"], found["metadatas"]
+            offset += len(found["ids"])
+
+    def _existing_ids(self, doc_ids: Sequence[str]) -> set[str]:
+        existing: set[str] = set()
+        for i in range(0, len(doc_ids), 500):
+            found = self.collection.get(where={"doc_id": {"$in": list(doc_ids[i : i + 500])}})
+            existing.update(found["ids"])
+        return existing
+
+    async def ingest(self, documents: Iterable[Document]) -> IngestStats:
+        """Index documents, embedding only chunks that are not stored yet.
+
+        Chunks previously stored for these documents that no longer appear in
+        them are deleted.
+        """
+        chunks: dict[str, tuple[str, dict[str, Any]]] = {}
+        doc_ids: list[str] = []
+        for doc in documents:
+            meta = _metadata(doc)
+            doc_ids.append(meta["doc_id"])
+            for text in chunk_text(doc.text):
+                chunks[_chunk_id(meta["doc_id"], text)] = (text, meta)
+        if not doc_ids:
+            return IngestStats()
+
+        existing = await asyncio.to_thread(self._existing_ids, list(dict.fromkeys(doc_ids)))
+        new_ids = [cid for cid in chunks if cid not in existing]
+        stale = list(existing.difference(chunks))
+
+        batch = self.embedder.batch_size * 8
+        for i in range(0, len(new_ids), batch):
+            ids = new_ids[i : i + batch]
+            texts = [chunks[cid][0] for cid in ids]
+            vectors = await self.embedder.embed(texts)
+            await asyncio.to_thread(
+                self.collection.upsert,
+                ids=ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=[chunks[cid][1] for cid in ids],
+            )
+            for listener in self._listeners:
+                listener.on_upsert(ids, texts, [chunks[cid][1] for cid in ids])
+        if stale:
+            await self._delete(stale)
+
+        stats = IngestStats(
+            added=len(new_ids), unchanged=len(chunks) - len(new_ids), deleted=len(stale)
+        )
+        await logger.ainfo("rag_ingested", documents=len(doc_ids), **stats.model_dump())
+        return stats
+
+    async def _delete(self, ids: list[str]) -> None:
+        await asyncio.to_thread(self.collection.delete, ids=ids)
+        for listener in self._listeners:
+            listener.on_delete(ids)
+
+    async def delete_documents(self, documents: Iterable[Document]) -> None:
+        doc_ids = list({doc.doc_id for doc in documents})
+        if doc_ids:
+            ids = await asyncio.to_thread(self._existing_ids, doc_ids)
+            if ids:
+                await self._delete(list(ids))
+
+    async def query(
+        self,
+        query: str,
+        k: int = 8,
+        ticker: str | None = None,
+        source_types: Iterable[str] | None = None,
+    ) -> list[Chunk]:
+        """Return the ``k`` nearest chunks, best first, with cosine similarity scores."""
+        vectors = await self.embedder.embed([query])
+        return await self.query_vector(vectors[0], k, ticker, source_types)
+
+    async def query_vector(
+        self,
+        vector: Sequence[float],
+        k: int = 8,
+        ticker: str | None = None,
+        source_types: Iterable[str] | None = None,
+    ) -> list[Chunk]:
+        """Like ``query`` for an already embedded query."""
+        result = await asyncio.to_thread(
+            self.collection.query,
+            query_embeddings=[vector],
+            n_results=k,
+            where=_where(ticker, source_types),
+            include=["documents", "metadatas", "distances"],
+        )
+        return [
+            Chunk(id=cid, text=text, metadata=meta, score=1.0 - distance)
+            for cid, text, meta, distance in zip(
+                result["ids"][0],
+                result["documents"][0],
+                result["metadatas"][0],
+                result["distances"][0],
+            )
+        ]
+
+    async def search(
+        self,
+        query: str,
+        k: int = 8,
+        ticker: str | None = None,
+        source_types: Iterable[str] | None = None,
+    ) -> list[Citation]:
+        """Retrieve the ``k`` most relevant chunks as citations."""
+        return [chunk.to_citation() for chunk in await self.query(query, k, ticker, source_types)]
+
+
+vector_store = VectorStore()
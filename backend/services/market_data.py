@@ -0,0 +1,403 @@
+"""Local store of daily OHLCV bars per NSE/BSE ticker.
+
+Each ticker is a directory with one raw little-endian file per column
+(``date``, ``open``, ``high``, ``low``, ``close``, ``volume``), so reads are
+memory-mapped and a date-range slice is a view into the page cache rather
+than a copy. Bars are kept in date order; the row count is the length of
+the ``date`` column, which is always written last, so an append that dies
+half-way is invisible to readers and overwritten by the next one. Writers
+of a ticker hold an exclusive lock; readers never lock.
+
+Bulk loads (full history from a CSV, or a day's bhavcopy across all
+tickers) and single-bar appends both go through ``MarketDataStore``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import fcntl
+import os
+import re
+import shutil
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from config import get_settings
+from services.symbols import clean_ticker
+from utils import logger
+
+EXCHANGES = ("NSE", "BSE")
+COLUMNS = {
+    "date": np.dtype("<M8[D]"),
+    "open": np.dtype("<f8"),
+    "high": np.dtype("<f8"),
+    "low": np.dtype("<f8"),
+    "close": np.dtype("<f8"),
+    "volume": np.dtype("<i8"),
+}
+_VALUE_COLUMNS = tuple(c for c in COLUMNS if c != "date")
+
+# CSV header spellings (Yahoo / broker downloads and NSE bhavcopy)
+_CSV_ALIASES = {
+    "date": ("date", "timestamp", "tradedate", "traddt"),
+    "open": ("open", "openprice", "opnpric"),
+    "high": ("high", "highprice", "hghpric"),
+    "low": ("low", "lowprice", "lwpric"),
+    "close": ("close", "closeprice", "clspric", "adjclose"),
+    "volume": ("volume", "tottrdqty", "ttltradgvol", "totaltradedquantity", "qty"),
+    "symbol": ("symbol", "tckrsymb", "ticker"),
+    "series": ("series", "sctysrs"),
+}
+_ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_DATE_FORMATS = ("%Y-%m-%d", "%d-%b-%Y", "%d-%m-%Y", "%d/%m/%Y", "%Y%m%d")
+
+
+@dataclass
+class PriceHistory:
+    """Daily bars for one ticker; arrays are read-only views of the store."""
+
+    ticker: str
+    date: np.ndarray  # datetime64[D], ascending
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.date)
+
+    def between(
+        self, start: date | str | None = None, end: date | str | None = None
+    ) -> PriceHistory:
+        """Bars with ``start <= date <= end`` (either bound optional), without copying."""
+        lo = 0 if start is None else int(np.searchsorted(self.date, np.datetime64(start, "D")))
+        hi = (
+            len(self.date)
+            if end is None
+            else int(np.searchsorted(self.date, np.datetime64(end, "D"), side="right"))
+        )
+        return PriceHistory(self.ticker, *(getattr(self, c)[lo:hi] for c in COLUMNS))
+
+    @property
+    def last_close(self) -> float | None:
+        return float(self.close[-1]) if len(self.close) else None
+
+
+def _parse_date(value: str) -> np.datetime64:
+    value = value.strip()
+    for fmt in _DATE_FORMATS:
+        try:
+            return np.datetime64(datetime.strptime(value, fmt).date(), "D")
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised date: {value!r}")
+
+
+def _csv_columns(headers: Sequence[str]) -> dict[str, int]:
+    keys = ["".join(ch for ch in h.lower() if ch.isalnum()) for h in headers]
+    return {
+        field: keys.index(alias)
+        for field, aliases in _CSV_ALIASES.items()
+        for alias in reversed(aliases)  # first alias wins
+        if alias in keys
+    }
+
+
+def _csv_value(cells: Sequence[str], index: int) -> str:
+    """A cell with thousands separators removed ("1,234.50" -> "1234.50")."""
+    return cells[index].replace(",", "").strip()
+
+
+def _parse_dates(values: list[str]) -> np.ndarray:
+    # NumPy reads any digit run as a year ("20240105" is year 20240105), so
+    # only strict YYYY-MM-DD takes the vectorized path
+    if all(_ISO_DATE.fullmatch(v) for v in values):
+        return np.array(values, dtype=COLUMNS["date"])
+    return np.array([_parse_date(v) for v in values], dtype=COLUMNS["date"])
+
+
+def _csv_bars(raw: dict[str, list[str]], lines: list[int], file: str | Path) -> dict:
+    """Typed columns for raw CSV cells; rows that do not parse are logged and dropped."""
+    try:
+        return {
+            "date": _parse_dates(raw["date"]),
+            **{c: np.array(raw[c], dtype=np.float64) for c in _VALUE_COLUMNS},
+        }
+    except ValueError:
+        pass
+    # Some cell is bad: find it row by row, then convert what is left
+    keep = []
+    for i, line in enumerate(lines):
+        try:
+            _parse_date(raw["date"][i])
+            for c in _VALUE_COLUMNS:
+                float(raw[c][i])
+        except ValueError as e:
+            logger.warning("market_data_row_skipped", file=str(file), line=line, error=str(e))
+        else:
+            keep.append(i)
+    raw = {c: [v[i] for i in keep] for c, v in raw.items()}
+    return _csv_bars(raw, [lines[i] for i in keep], file)
+
+
+Bars = Iterable[dict[str, Any]] | dict[str, Sequence[Any]]
+
+
+def _bars_array(bars: Bars) -> dict[str, np.ndarray]:
+    """Columns for bars (a dict per bar, or a dict of columns), sorted by date.
+
+    When a date repeats, the last bar for it wins (later rows are corrections).
+    """
+    if isinstance(bars, dict):
+        bars = {c: np.asarray(bars[c], dtype=dtype) for c, dtype in COLUMNS.items()}
+    else:
+        rows = list(bars)
+        bars = {c: np.array([r[c] for r in rows], dtype=dtype) for c, dtype in COLUMNS.items()}
+    order = np.argsort(bars["date"], kind="stable")
+    bars = {c: a[order] for c, a in bars.items()}
+    keep = np.ones(len(order), dtype=bool)
+    keep[:-1] = bars["date"][1:] != bars["date"][:-1]
+    return {c: a[keep] for c, a in bars.items()}
+
+
+class MarketDataStore:
+    """Memory-mapped daily OHLCV history under ``Settings.market_data_dir``."""
+
+    def __init__(self, root: str | Path | None = None) -> None:
+        self.root = Path(root or get_settings().market_data_dir)
+        # key -> ((inode, size) of the date column, history); remapped when it changes
+        self._maps: dict[str, tuple[tuple[int, int], PriceHistory]] = {}
+
+    @staticmethod
+    def key(ticker: str, exchange: str = "NSE") -> str:
+        exchange = exchange.upper()
+        if exchange not in EXCHANGES:
+            raise ValueError(f"Unknown exchange: {exchange}")
+        symbol = clean_ticker(ticker)
+        if not symbol or "/" in symbol or symbol.startswith("."):
+            raise ValueError(f"Invalid ticker: {ticker!r}")
+        return f"{exchange}/{symbol}"
+
+    def _dir(self, key: str) -> Path:
+        return self.root / key
+
+    @contextmanager
+    def _locked(self, key: str) -> Iterator[Path]:
+        path = self._dir(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with (path.parent / f".{path.name}.lock").open("wb") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield path
+
+    @staticmethod
+    def _rows(path: Path) -> int:
+        try:
+            return (path / "date").stat().st_size // COLUMNS["date"].itemsize
+        except FileNotFoundError:
+            return 0
+
+    def tickers(self, exchange: str = "NSE") -> list[str]:
+        base = self.root / exchange.upper()
+        if not base.is_dir():
+            return []
+        return sorted(p.name for p in base.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+    def history(self, ticker: str, exchange: str = "NSE") -> PriceHistory | None:
+        """The full history of a ticker as memory-mapped arrays, or None if unknown."""
+        key = self.key(ticker, exchange)
+        path = self._dir(key)
+        try:
+            stat = (path / "date").stat()
+        except FileNotFoundError:
+            stat = None
+        rows = stat.st_size // COLUMNS["date"].itemsize if stat else 0
+        if rows == 0:
+            self._maps.pop(key, None)
+            return None
+        version = (stat.st_ino, stat.st_size)
+        cached = self._maps.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        columns = {
+            c: np.memmap(path / c, dtype=dtype, mode="r", shape=(rows,))
+            for c, dtype in COLUMNS.items()
+        }
+        history = PriceHistory(key.split("/", 1)[1], **columns)
+        self._maps[key] = (version, history)
+        return history
+
+    def window(
+        self,
+        ticker: str,
+        start: date | str | None = None,
+        end: date | str | None = None,
+        exchange: str = "NSE",
+    ) -> PriceHistory | None:
+        history = self.history(ticker, exchange)
+        return history.between(start, end) if history is not None else None
+
+    def latest_close(self, tickers: Sequence[str], exchange: str = "NSE") -> np.ndarray:
+        """Last close per ticker, NaN where the store has no bars."""
+        out = np.full(len(tickers), np.nan)
+        for i, ticker in enumerate(tickers):
+            try:
+                history = self.history(ticker, exchange)
+            except ValueError:
+                continue
+            if history is not None:
+                out[i] = history.last_close
+        return out
+
+    def write(self, ticker: str, bars: Bars, exchange: str = "NSE") -> int:
+        """Replace a ticker's history with ``bars``. Returns the number of bars stored."""
+        key = self.key(ticker, exchange)
+        columns = _bars_array(bars)
+        with self._locked(key) as path:
+            staging = path.with_name(f".{path.name}.new")
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir()
+            for c in COLUMNS:
+                columns[c].tofile(staging / c)
+            # Open maps of the old files stay valid: the inodes live until unmapped
+            retired = path.with_name(f".{path.name}.old")
+            if path.exists():
+                os.replace(path, retired)
+            os.replace(staging, path)
+            shutil.rmtree(retired, ignore_errors=True)
+        self._maps.pop(key, None)
+        return len(columns["date"])
+
+    def append(self, ticker: str, bars: Bars, exchange: str = "NSE") -> int:
+        """Add bars after the last stored date; a bar for the last date replaces it.
+
+        Bars dated before the last stored bar are ignored (use ``write`` to
+        rewrite history). Returns the number of bars written.
+        """
+        key = self.key(ticker, exchange)
+        columns = _bars_array(bars)
+        if not len(columns["date"]):
+            return 0
+        with self._locked(key) as path:
+            path.mkdir(exist_ok=True)
+            rows = self._rows(path)
+            start = rows
+            if rows:
+                with (path / "date").open("rb") as f:
+                    f.seek((rows - 1) * COLUMNS["date"].itemsize)
+                    last = np.frombuffer(f.read(), dtype=COLUMNS["date"])[0]
+                keep = columns["date"] >= last
+                columns = {c: a[keep] for c, a in columns.items()}
+                if not len(columns["date"]):
+                    return 0
+                if columns["date"][0] == last:
+                    start = rows - 1  # today's bar again: overwrite it in place
+            # Values first, dates last: a reader only sees rows whose date is written
+            for c in (*_VALUE_COLUMNS, "date"):
+                mode = "r+b" if (path / c).exists() else "wb"
+                with (path / c).open(mode) as f:
+                    f.seek(start * COLUMNS[c].itemsize)
+                    f.write(columns[c].tobytes())
+                    f.truncate()
+        return len(columns["date"])
+
+    def load_csv(self, ticker: str, file: str | Path, exchange: str = "NSE") -> int:
+        """Bulk-load a ticker's full history from a Date/Open/High/Low/Close/Volume CSV.
+
+        Rows that are truncated or do not parse are logged and skipped.
+        """
+        with Path(file).open(newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            cols = _csv_columns(next(reader, []))
+            missing = [c for c in COLUMNS if c not in cols and c != "volume"]
+            if missing:
+                raise ValueError(f"{file}: missing columns {', '.join(missing)}")
+            width = max(cols[c] for c in COLUMNS if c in cols) + 1
+            # Gather raw columns and convert each in one vectorized call
+            raw: dict[str, list[str]] = {c: [] for c in COLUMNS}
+            lines: list[int] = []
+            for cells in reader:
+                if not any(cell.strip() for cell in cells):
+                    continue
+                if len(cells) < width:
+                    logger.warning(
+                        "market_data_row_skipped",
+                        file=str(file),
+                        line=reader.line_num,
+                        error="truncated row",
+                    )
+                    continue
+                close = _csv_value(cells, cols["close"])
+                if close in ("", "null", "NaN"):  # holidays / suspended days in some exports
+                    continue
+                for c in COLUMNS:
+                    raw[c].append(_csv_value(cells, cols[c]) if c in cols else "0")
+                lines.append(reader.line_num)
+        return self.write(ticker, _csv_bars(raw, lines, file), exchange)
+
+    def load_bhavcopy(
+        self, file: str | Path, exchange: str = "NSE", series: Sequence[str] = ("EQ", "BE")
+    ) -> int:
+        """Append one trading day's bars for every ticker in an exchange bhavcopy CSV.
+
+        Returns the number of tickers updated.
+        """
+        updated = 0
+        with Path(file).open(newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            cols = _csv_columns(next(reader, []))
+            missing = [c for c in ("symbol", *COLUMNS) if c not in cols]
+            if missing:
+                raise ValueError(f"{file}: missing columns {', '.join(missing)}")
+            for cells in reader:
+                if not cells:
+                    continue
+                try:
+                    if "series" in cols and cells[cols["series"]].strip() not in series:
+                        continue
+                    bar = {
+                        "date": _parse_date(cells[cols["date"]]),
+                        **{
+                            c: float(_csv_value(cells, cols[c]))
+                            for c in _VALUE_COLUMNS
+                            if c != "volume"
+                        },
+                        "volume": int(float(_csv_value(cells, cols["volume"]))),
+                    }
+                    updated += bool(self.append(cells[cols["symbol"]], [bar], exchange))
+                except (ValueError, IndexError) as e:
+                    logger.warning("bhavcopy_row_skipped", file=str(file), error=str(e))
+        return updated
+
+
+market_data = MarketDataStore()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load daily OHLCV bars into the local store.")
+    parser.add_argument("--exchange", default="NSE", choices=EXCHANGES)
+    commands = parser.add_subparsers(dest="command", required=True)
+    history = commands.add_parser("history", help="full history, one <TICKER>.csv per ticker")
+    history.add_argument("files", nargs="+", type=Path)
+    bhavcopy = commands.add_parser("bhavcopy", help="append a day's bars from bhavcopy CSVs")
+    bhavcopy.add_argument("files", nargs="+", type=Path)
+    args = parser.parse_args()
+
+    for file in args.files:
+        if args.command == "history":
+            rows = market_data.load_csv(file.stem, file, args.exchange)
+            logger.info("market_data_loaded", ticker=file.stem, bars=rows)
+        else:
+            tickers = market_data.load_bhavcopy(file, args.exchange)
+            logger.info("market_data_appended", file=str(file), tickers=tickers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Monthly partition maintenance for the partitioned session tables.
+
+Creates partitions a few months ahead of time, and detaches and drops
+partitions older than the retention window. Run it daily from cron or a
+scheduler:
+
+    python -m services.partitions
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from config import get_settings
+from utils import engine, logger
+
+PARTITIONED_TABLES = ("thought_steps", "tool_executions")
+
+_PARTITION_NAME = re.compile(r"_y(\d{4})m(\d{2})$")
+
+
+def _add_months(month: date, n: int) -> date:
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+async def _partitions_of(conn: AsyncConnection, table: str) -> list[str]:
+    result = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :table"
+        ),
+        {"table": table},
+    )
+    return [row[0] for row in result]
+
+
+async def ensure_partitions(conn: AsyncConnection, months_ahead: int = 3) -> list[str]:
+    """Create any missing monthly partitions from this month to ``months_ahead``."""
+    created = []
+    this_month = date.today().replace(day=1)
+    for table in PARTITIONED_TABLES:
+        existing = set(await _partitions_of(conn, table))
+        for n in range(months_ahead + 1):
+            month = _add_months(this_month, n)
+            name = f"{table}_y{month:%Y}m{month:%m}"
+            if name in existing:
+                continue
+            await conn.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF {table} "
+                    f"FOR VALUES FROM ('{month:%Y-%m-%d}') "
+                    f"TO ('{_add_months(month, 1):%Y-%m-%d}')"
+                )
+            )
+            created.append(name)
+    return created
+
+
+async def drop_expired_partitions(conn: AsyncConnection, retention_months: int) -> list[str]:
+    """Detach and drop partitions that end before the retention cutoff."""
+    dropped = []
+    cutoff = _add_months(date.today().replace(day=1), -retention_months)
+    for table in PARTITIONED_TABLES:
+        for name in await _partitions_of(conn, table):
+            match = _PARTITION_NAME.search(name)
+            if match is None:
+                continue  # the DEFAULT partition
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            if _add_months(month, 1) > cutoff:
+                continue
+            await conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            await conn.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+async def run_partition_maintenance() -> None:
+    """Create upcoming partitions and enforce ``partition_retention_months``."""
+    settings = get_settings()
+    async with engine.begin() as conn:
+        created = await ensure_partitions(conn, settings.partition_months_ahead)
+        dropped = await drop_expired_partitions(conn, settings.partition_retention_months)
+    await logger.ainfo("partition_maintenance", created=created, dropped=dropped)
+
+
+async def _main() -> None:
+    try:
+        await run_partition_maintenance()
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,287 @@
+"""Write-behind persistence for per-session agent rows.
+
+Thought steps, tool executions and citations are produced many times per
+session. Instead of a transaction per row, they are buffered per session and
+flushed as multi-row INSERTs when a buffer reaches ``persist_flush_rows``,
+every ``persist_flush_interval_seconds``, and when the session completes.
+Thought steps are pushed to the WebSocket stream as soon as they are
+recorded, so clients never wait on the database.
+
+The session's ``research_sessions`` row must exist before its first flush.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.websocket import ws_manager
+from config import get_settings
+from models import Citation, Report, ThoughtStep, ToolExecution
+from services import session_reads
+from telemetry.tracing import start_span
+from utils import async_session_factory, logger
+
+
+@dataclass
+class _SessionBuffer:
+    thought_steps: list[dict[str, Any]] = field(default_factory=list)
+    tool_executions: list[dict[str, Any]] = field(default_factory=list)
+    citations: list[dict[str, Any]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.thought_steps) + len(self.tool_executions) + len(self.citations)
+
+
+class SessionWriter:
+    """Buffers session rows in memory and bulk-inserts them."""
+
+    def __init__(
+        self, flush_rows: int | None = None, flush_interval: float | None = None
+    ) -> None:
+        settings = get_settings()
+        self.flush_rows = flush_rows or settings.persist_flush_rows
+        self.flush_interval = flush_interval or settings.persist_flush_interval_seconds
+        self._buffers: dict[str, _SessionBuffer] = {}
+        # Sessions whose rows are being written, resolved when the write ends.
+        # One write per session at a time, so its steps always land before its
+        # tool rows; writes for different sessions run concurrently.
+        self._writing: dict[str, asyncio.Future[None]] = {}
+        self._flusher: asyncio.Task | None = None
+
+    # -- Recording -------------------------------------------------------
+
+    async def record_thought_step(
+        self,
+        session_id: str,
+        step_number: int,
+        step_type: str,
+        title: str,
+        content: str = "",
+        confidence: float | None = None,
+    ) -> UUID:
+        """Stream a thought step now and queue it for persistence.
+
+        Returns the row id so tool executions can reference it before flush.
+        """
+        step_id = uuid4()
+        self._buffer(session_id).thought_steps.append(
+            {
+                "id": step_id,
+                "session_id": UUID(session_id),
+                "step_number": step_number,
+                "step_type": step_type,
+                "title": title,
+                "content": content,
+                "confidence": confidence,
+                "created_at": datetime.now(timezone.utc),
+            }
+        )
+        await ws_manager.send_thought_step(
+            session_id, step_number, step_type, title, content, confidence
+        )
+        await self._maybe_flush(session_id)
+        return step_id
+
+    async def record_tool_execution(
+        self,
+        session_id: str,
+        thought_step_id: UUID,
+        tool_name: str,
+        input_params: dict[str, Any] | None = None,
+        output: dict[str, Any] | None = None,
+        execution_time_ms: int | None = None,
+    ) -> None:
+        """Queue a tool execution belonging to a recorded thought step."""
+        self._buffer(session_id).tool_executions.append(
+            {
+                "id": uuid4(),
+                "thought_step_id": thought_step_id,
+                "tool_name": tool_name,
+                "input_params": input_params,
+                "output": output,
+                "execution_time_ms": execution_time_ms,
+                "created_at": datetime.now(timezone.utc),
+            }
+        )
+        await self._maybe_flush(session_id)
+
+    async def record_citation(
+        self,
+        session_id: str,
+        citation_key: str,
+        source_type: str,
+        source_name: str,
+        source_url: str | None = None,
+        content_snippet: str | None = None,
+        page_number: int | None = None,
+    ) -> None:
+        """Queue a citation for a session."""
+        self._buffer(session_id).citations.append(
+            {
+                "id": uuid4(),
+                "session_id": UUID(session_id),
+                "citation_key": citation_key,
+                "source_type": source_type,
+                "source_name": source_name,
+                "source_url": source_url,
+                "content_snippet": content_snippet,
+                "page_number": page_number,
+                "created_at": datetime.now(timezone.utc),
+            }
+        )
+        await self._maybe_flush(session_id)
+
+    async def complete_session(self, session_id: str) -> None:
+        """Flush everything left for a finished session."""
+        await self.flush(session_id)
+
+    async def reset_session(self, session_id: str) -> None:
+        """Drop a session's buffered and stored rows, so a retried job starts clean."""
+        sid = UUID(session_id)
+        # Claimed, so a flush already holding this session's rows lands first
+        ids = await self._claim(session_id)
+        try:
+            self._buffers.pop(session_id, None)
+            async with async_session_factory() as db:
+                steps = select(ThoughtStep.id).where(ThoughtStep.session_id == sid)
+                await db.execute(
+                    delete(ToolExecution).where(ToolExecution.thought_step_id.in_(steps))
+                )
+                await db.execute(delete(ThoughtStep).where(ThoughtStep.session_id == sid))
+                await db.execute(delete(Citation).where(Citation.session_id == sid))
+                await db.execute(delete(Report).where(Report.session_id == sid))
+                await db.commit()
+        finally:
+            self._release(ids)
+        # A cached "complete" body would otherwise outlive the rows it was built from
+        await session_reads.invalidate(session_id)
+
+    # -- Flushing --------------------------------------------------------
+
+    def _buffer(self, session_id: str) -> _SessionBuffer:
+        if self._flusher is None or self._flusher.done():
+            # A fresh context: the flusher outlives the session that started it
+            self._flusher = asyncio.create_task(
+                self._flush_periodically(), context=contextvars.Context()
+            )
+        return self._buffers.setdefault(session_id, _SessionBuffer())
+
+    async def _maybe_flush(self, session_id: str) -> None:
+        buf = self._buffers.get(session_id)
+        if buf is not None and len(buf) >= self.flush_rows:
+            await self.flush(session_id)
+
+    async def _claim(self, session_id: str | None) -> list[str]:
+        """Wait out writes in flight for a session (or all), then mark them as in flight.
+
+        ``None`` claims every session with buffered rows.
+        """
+        while True:
+            ids = [session_id] if session_id is not None else list(self._buffers)
+            busy = {self._writing[sid] for sid in ids if sid in self._writing}
+            if not busy:
+                break
+            await asyncio.wait(busy)
+        loop = asyncio.get_running_loop()
+        for sid in ids:
+            self._writing[sid] = loop.create_future()
+        return ids
+
+    def _release(self, ids: list[str]) -> None:
+        for sid in ids:
+            self._writing.pop(sid).set_result(None)
+
+    async def flush(self, session_id: str | None = None) -> None:
+        """Write buffered rows for one session (or all) in a single transaction.
+
+        Each session's rows go in under their own savepoint. Rows the
+        database rejects (say, for a session deleted meanwhile) are dropped
+        for that session alone; if the transaction itself fails, every
+        session's rows are requeued.
+        """
+        ids = await self._claim(session_id)
+        try:
+            pending = {sid: self._buffers.pop(sid) for sid in ids if sid in self._buffers}
+            if not pending:
+                return
+
+            rows = sum(len(b) for b in pending.values())
+            rejected: dict[str, str] = {}
+            try:
+                with start_span("persist.flush", sessions=len(pending), rows=rows):
+                    async with async_session_factory() as db:
+                        for sid, buf in pending.items():
+                            try:
+                                async with db.begin_nested():
+                                    await self._insert(db, buf)
+                            except (IntegrityError, DataError) as exc:
+                                rejected[sid] = str(exc.orig)
+                        await db.commit()
+            except Exception as exc:
+                await logger.aerror("session_flush_failed", sessions=list(pending), error=str(exc))
+                self._requeue({sid: b for sid, b in pending.items() if sid not in rejected})
+                return
+            finally:
+                for sid, error in rejected.items():
+                    await logger.aerror(
+                        "session_rows_rejected", session_id=sid, rows=len(pending[sid]), error=error
+                    )
+        finally:
+            # After any requeue, so the session's next write starts with these rows
+            self._release(ids)
+
+        written = [b for sid, b in pending.items() if sid not in rejected]
+        await logger.adebug(
+            "session_rows_flushed",
+            sessions=len(written),
+            thought_steps=sum(len(b.thought_steps) for b in written),
+            tool_executions=sum(len(b.tool_executions) for b in written),
+            citations=sum(len(b.citations) for b in written),
+        )
+
+    @staticmethod
+    async def _insert(db: AsyncSession, buf: _SessionBuffer) -> None:
+        # executemany on an INSERT is sent as batched multi-row VALUES
+        if buf.thought_steps:
+            await db.execute(insert(ThoughtStep), buf.thought_steps)
+        if buf.tool_executions:
+            await db.execute(insert(ToolExecution), buf.tool_executions)
+        if buf.citations:
+            await db.execute(insert(Citation), buf.citations)
+
+    def _requeue(self, pending: dict[str, _SessionBuffer]) -> None:
+        """Put failed rows back in front of anything recorded meanwhile."""
+        for sid, buf in pending.items():
+            if len(buf) > self.flush_rows * 10:
+                # The database has been refusing this session for a while
+                logger.error("session_rows_dropped", session_id=sid, rows=len(buf))
+                continue
+            newer = self._buffers.setdefault(sid, _SessionBuffer())
+            newer.thought_steps[:0] = buf.thought_steps
+            newer.tool_executions[:0] = buf.tool_executions
+            newer.citations[:0] = buf.citations
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def close(self) -> None:
+        """Stop the background flusher and write out everything buffered."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await self.flush()
+
+
+# Global writer shared by all agent pipelines in this process
+session_writer = SessionWriter()
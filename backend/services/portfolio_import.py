@@ -0,0 +1,359 @@
+"""Streaming import of portfolio holdings from CSV and XLSX files.
+
+Uploads are read in chunks and parsed row by row, so memory stays flat for
+large broker exports. Rows are validated into ``HoldingInput`` in batches,
+tickers are normalized against the symbol master, repeated tickers (several
+lots) are merged, and all holdings are written with one bulk insert. A bad
+row does not fail the upload: it is reported with its row number.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import csv
+import re
+from collections.abc import AsyncIterator
+from itertools import islice
+from pathlib import Path
+from typing import Any
+from uuid import UUID, uuid4
+
+from fastapi import UploadFile
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import get_settings
+from models import Holding, HoldingInput, HoldingRowError, Portfolio
+from services.symbols import SymbolMaster, symbol_master
+
+MAX_REPORTED_ERRORS = 100
+HEADER_SCAN_ROWS = 20  # broker exports often start with a few lines of preamble
+
+# Header spellings per field, best first ("Symbol" wins over "Company Name")
+_HEADER_ALIASES = {
+    "ticker": (
+        "ticker",
+        "symbol",
+        "tradingsymbol",
+        "scrip",
+        "scripname",
+        "stock",
+        "stockname",
+        "instrument",
+        "isin",
+        "security",
+        "companyname",
+        "company",
+        "name",
+    ),
+    "quantity": (
+        "quantity",
+        "qty",
+        "shares",
+        "units",
+        "totalquantity",
+        "holdingqty",
+        "quantityavailable",
+        "netqty",
+    ),
+    "avg_buy_price": (
+        "avgbuyprice",
+        "avgprice",
+        "averageprice",
+        "avgcost",
+        "averagecost",
+        "averagebuyprice",
+        "buyprice",
+        "costprice",
+        "avgrate",
+        "buyavg",
+    ),
+    "sector": ("sector", "industry"),
+}
+_REQUIRED = ("ticker", "quantity", "avg_buy_price")
+_NUMBER_NOISE = re.compile(r"[,\s₹]|^rs\.?", re.IGNORECASE)
+
+_HOLDINGS = TypeAdapter(list[HoldingInput])
+
+
+class ImportFileError(Exception):
+    """The file as a whole cannot be imported."""
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class HoldingsImport(BaseModel):
+    holdings: list[HoldingInput] = Field(default_factory=list)
+    rows_read: int = 0
+    error_count: int = 0
+    errors: list[HoldingRowError] = Field(default_factory=list)
+
+
+# ---------------------------------------------------------------------------
+# Row readers
+# ---------------------------------------------------------------------------
+
+
+def _sniff_dialect(sample: str) -> type[csv.Dialect]:
+    """Excel CSV with the separator and quote character guessed from ``sample``.
+
+    The rest of the sniffer's guess is not trusted: a quoted line break can
+    make it turn off doubled quotes, which garbles every quoted field.
+    """
+    try:
+        sniffed = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+    except csv.Error:
+        return csv.excel
+    return type(
+        "SniffedDialect",
+        (csv.excel,),
+        {
+            "delimiter": sniffed.delimiter,
+            "quotechar": sniffed.quotechar,
+            "skipinitialspace": sniffed.skipinitialspace,
+        },
+    )
+
+
+async def _csv_rows(file: UploadFile) -> AsyncIterator[tuple[int, list[Any]]]:
+    """Yield ``(line number, cells)`` per record, reading the upload in chunks."""
+    settings = get_settings()
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    dialect: type[csv.Dialect] | None = None
+    carry: list[str] = []  # lines of a record that continues into the next chunk
+    partial = ""  # unterminated last line of the previous chunk
+    line_no = 0
+    size = 0
+
+    def records(lines: list[str], final: bool) -> list[tuple[int, list[str]]]:
+        nonlocal carry, line_no
+        # Cut after the last line that ends outside a quoted field; doubled
+        # quotes inside a field leave the parity unchanged
+        lines = carry + lines
+        quote = (dialect or csv.excel).quotechar
+        open_quote = False
+        cut = 0
+        for i, line in enumerate(lines):
+            if line.count(quote) % 2:
+                open_quote = not open_quote
+            if not open_quote:
+                cut = i + 1
+        if final:
+            cut = len(lines)
+        complete, carry = lines[:cut], lines[cut:]
+        out = []
+        reader = csv.reader(complete, dialect)
+        start = line_no
+        for cells in reader:
+            out.append((start + 1, cells))
+            start = line_no + reader.line_num
+        line_no += len(complete)
+        return out
+
+    while chunk := await file.read(settings.portfolio_upload_chunk_bytes):
+        size += len(chunk)
+        if size > settings.portfolio_upload_max_bytes:
+            raise ImportFileError(413, "File is too large")
+        text = partial + decoder.decode(chunk)
+        if dialect is None:
+            dialect = _sniff_dialect(text[:8192])
+        lines = text.splitlines(keepends=True)
+        # Hold back an unterminated line, and a bare "\r" whose "\n" may follow
+        partial = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        for row in records(lines, final=False):
+            yield row
+
+    tail = partial + decoder.decode(b"", final=True)
+    for row in records(tail.splitlines(keepends=True), final=True):
+        yield row
+
+
+async def _xlsx_rows(file: UploadFile) -> AsyncIterator[tuple[int, list[Any]]]:
+    """Yield ``(row number, cells)`` from the first sheet in read-only (streaming) mode."""
+    import openpyxl
+
+    settings = get_settings()
+    if file.size is not None and file.size > settings.portfolio_upload_max_bytes:
+        raise ImportFileError(413, "File is too large")
+    try:
+        workbook = await asyncio.to_thread(
+            openpyxl.load_workbook, file.file, read_only=True, data_only=True
+        )
+    except Exception as e:  # not a zip, or not a workbook
+        raise ImportFileError(400, f"Could not read XLSX file: {e}") from e
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        row_no = 0
+        while batch := await asyncio.to_thread(list, islice(rows, 1000)):
+            for cells in batch:
+                row_no += 1
+                yield row_no, list(cells)
+    finally:
+        workbook.close()
+
+
+def _row_reader(file: UploadFile) -> AsyncIterator[tuple[int, list[Any]]]:
+    suffix = Path(file.filename or "").suffix.lower()
+    if suffix in (".csv", ".txt") or file.content_type in ("text/csv", "application/csv"):
+        return _csv_rows(file)
+    if suffix in (".xlsx", ".xlsm"):
+        return _xlsx_rows(file)
+    raise ImportFileError(415, "Upload a CSV or XLSX file")
+
+
+# ---------------------------------------------------------------------------
+# Parsing & validation
+# ---------------------------------------------------------------------------
+
+
+def _header_key(cell: Any) -> str:
+    return re.sub(r"[^a-z]", "", str(cell).lower()) if cell is not None else ""
+
+
+def _match_header(cells: list[Any]) -> dict[str, int] | None:
+    """Map fields to column indexes if ``cells`` is the header row."""
+    keys = [_header_key(cell) for cell in cells]
+    columns = {}
+    for field, aliases in _HEADER_ALIASES.items():
+        ranked = [(aliases.index(key), i) for i, key in enumerate(keys) if key in aliases]
+        if ranked:
+            columns[field] = min(ranked)[1]
+    if all(field in columns for field in _REQUIRED):
+        return columns
+    return None
+
+
+def _clean_number(value: Any) -> Any:
+    if isinstance(value, str):
+        value = _NUMBER_NOISE.sub("", value.strip())  # "₹1,20,000.50" -> "120000.50"
+        return value or None
+    return value
+
+
+def _clean_text(value: Any) -> Any:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+class _HoldingsParser:
+    """Accumulates validated, normalized and merged holdings batch by batch."""
+
+    def __init__(self, symbols: SymbolMaster) -> None:
+        self.symbols = symbols
+        self.result = HoldingsImport()
+        # ticker -> [quantity, cost, sector]
+        self._positions: dict[str, list[Any]] = {}
+
+    def error(self, row: int, field: str | None, message: str) -> None:
+        self.result.error_count += 1
+        if len(self.result.errors) < MAX_REPORTED_ERRORS:
+            self.result.errors.append(HoldingRowError(row=row, field=field, message=message))
+
+    def add_batch(self, batch: list[tuple[int, dict[str, Any]]]) -> None:
+        raw = [
+            {
+                "ticker": _clean_text(values.get("ticker")),
+                "quantity": _clean_number(values.get("quantity")),
+                "avg_buy_price": _clean_number(values.get("avg_buy_price")),
+                "sector": _clean_text(values.get("sector")),
+            }
+            for _, values in batch
+        ]
+        rows = [row for row, _ in batch]
+        try:
+            holdings = _HOLDINGS.validate_python(raw)
+        except ValidationError as e:
+            # One validation pass for the batch; re-validate only the clean rows
+            bad: set[int] = set()
+            for err in e.errors():
+                index = err["loc"][0]
+                if index not in bad:
+                    field = str(err["loc"][1]) if len(err["loc"]) > 1 else None
+                    self.error(rows[index], field, err["msg"])
+                    bad.add(index)
+            keep = [i for i in range(len(raw)) if i not in bad]
+            rows = [rows[i] for i in keep]
+            holdings = _HOLDINGS.validate_python([raw[i] for i in keep])
+
+        for row, holding in zip(rows, holdings):
+            symbol = self.symbols.resolve(holding.ticker)
+            if symbol is None:
+                self.error(row, "ticker", f"Unknown ticker: {holding.ticker}")
+                continue
+            position = self._positions.setdefault(symbol.symbol, [0.0, 0.0, None])
+            position[0] += holding.quantity
+            position[1] += holding.quantity * holding.avg_buy_price
+            position[2] = position[2] or holding.sector or symbol.sector
+
+    def finish(self) -> HoldingsImport:
+        self.result.errors.sort(key=lambda e: e.row)
+        self.result.holdings = [
+            HoldingInput(
+                ticker=ticker, quantity=quantity, avg_buy_price=cost / quantity, sector=sector
+            )
+            for ticker, (quantity, cost, sector) in self._positions.items()
+        ]
+        return self.result
+
+
+async def parse_holdings(
+    file: UploadFile, symbols: SymbolMaster = symbol_master
+) -> HoldingsImport:
+    """Stream a CSV/XLSX upload into validated holdings and per-row errors.
+
+    Raises ``ImportFileError`` when the file as a whole is unusable.
+    """
+    settings = get_settings()
+    parser = _HoldingsParser(symbols)
+    header: dict[str, int] | None = None
+    batch: list[tuple[int, dict[str, Any]]] = []
+
+    async for row_no, cells in _row_reader(file):
+        if not any(cell not in (None, "") for cell in cells):
+            continue
+        if header is None:
+            header = _match_header(cells)
+            if header is None and row_no >= HEADER_SCAN_ROWS:
+                break
+            continue
+        parser.result.rows_read += 1
+        if parser.result.rows_read > settings.portfolio_upload_max_rows:
+            raise ImportFileError(
+                413, f"File has more than {settings.portfolio_upload_max_rows} rows"
+            )
+        batch.append(
+            (row_no, {field: cells[i] if i < len(cells) else None for field, i in header.items()})
+        )
+        if len(batch) >= settings.portfolio_validate_batch_rows:
+            parser.add_batch(batch)
+            batch = []
+
+    if header is None:
+        raise ImportFileError(
+            400, "No header row with ticker, quantity and average price columns found"
+        )
+    if batch:
+        parser.add_batch(batch)
+    return parser.finish()
+
+
+async def save_portfolio(
+    db: AsyncSession, user_id: str, name: str, holdings: list[HoldingInput]
+) -> UUID:
+    """Create the portfolio and bulk-insert its holdings in one transaction."""
+    portfolio_id = uuid4()
+    db.add(Portfolio(id=portfolio_id, user_id=user_id, name=name))
+    await db.flush()
+    if holdings:
+        await db.execute(
+            insert(Holding),
+            [{"id": uuid4(), "portfolio_id": portfolio_id, **h.model_dump()} for h in holdings],
+        )
+    await db.commit()
+    return portfolio_id
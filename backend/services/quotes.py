@@ -0,0 +1,154 @@
+"""Periodic refresh of ``Holding.current_price`` from live quotes.
+
+Many portfolios hold the same stocks, so quotes are fetched per distinct
+ticker rather than per holding. Each refresh takes the distinct tickers
+across all portfolios and fetches them in batches of
+``quote_batch_size`` symbols per upstream request, over the pooled
+keep-alive client of ``tools.http`` and behind a per-host rate limit
+shared by all workers. Each batch is written back with a single set-based
+``UPDATE holdings ... FROM (VALUES ...)``. A Redis lock lets only one
+worker refresh per interval, and portfolio views read the stored prices.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import time
+from urllib.parse import urlsplit
+
+import httpx
+from sqlalchemy import Float, String, column, func, select, update, values
+
+from config import get_settings
+from models import Holding
+from tools.http import http_client
+from utils import RateLimiter, RedisRateLimiter, async_session_factory, get_redis, logger
+
+LOCK_KEY = "slingshot:quotes:refresh"
+
+
+def quote_symbol(ticker: str) -> str:
+    """Upstream symbol for a stored ticker: NSE symbols get ".NS", BSE scrip codes ".BO"."""
+    return f"{ticker}.BO" if ticker.isdigit() else f"{ticker}.NS"
+
+
+def parse_quotes(payload: dict) -> dict[str, float]:
+    """Map upstream symbol -> last price from a v7 ``quoteResponse`` body."""
+    prices = {}
+    for quote in (payload.get("quoteResponse") or {}).get("result") or []:
+        price = quote.get("regularMarketPrice")
+        if quote.get("symbol") and isinstance(price, (int, float)) and price > 0:
+            prices[quote["symbol"]] = float(price)
+    return prices
+
+
+class QuoteRefresher:
+    """Fetches quotes for every held ticker and stores them on the holdings."""
+
+    def __init__(self) -> None:
+        settings = get_settings()
+        self.url = settings.quote_api_url
+        self.host = urlsplit(self.url).netloc
+        self.batch_size = settings.quote_batch_size
+        self.interval = settings.quote_refresh_seconds
+        self.max_connections = settings.http_max_connections_per_host
+        rate = settings.quote_host_requests_per_second
+        self._limiter = RedisRateLimiter(max_calls=rate, period=1.0, prefix="slingshot:quotes:")
+        self._local_limiter = RateLimiter(max_calls=rate, period=1.0)
+
+    async def _throttle(self) -> None:
+        try:
+            await self._limiter.acquire(self.host)
+        except Exception:
+            # Redis unavailable: limit this process only
+            await self._local_limiter.acquire(self.host)
+
+    async def fetch(self, tickers: list[str]) -> dict[str, float]:
+        """Last price per ticker for one batch; tickers without a quote are left out."""
+        symbols = {quote_symbol(t): t for t in tickers}
+        await self._throttle()
+        # Quotes change every request: no revalidation
+        response = await http_client.get(
+            self.url, params={"symbols": ",".join(symbols)}, revalidate=False
+        )
+        response.raise_for_status()
+        return {
+            symbols[symbol]: price
+            for symbol, price in parse_quotes(response.json()).items()
+            if symbol in symbols
+        }
+
+    async def _store(self, prices: dict[str, float]) -> int:
+        """Write one batch of prices in a single set-based UPDATE."""
+        if not prices:
+            return 0
+        rows = values(column("ticker", String), column("price", Float), name="quotes").data(
+            list(prices.items())
+        )
+        stmt = (
+            update(Holding)
+            .where(Holding.ticker == rows.c.ticker)
+            .values(current_price=rows.c.price, price_updated_at=func.now())
+            .execution_options(synchronize_session=False)  # no RETURNING of every row
+        )
+        async with async_session_factory() as db:
+            result = await db.execute(stmt)
+            await db.commit()
+        return result.rowcount
+
+    async def _refresh_batch(self, tickers: list[str], slots: asyncio.Semaphore) -> tuple[int, int]:
+        async with slots:
+            try:
+                prices = await self.fetch(tickers)
+            except (httpx.HTTPError, ValueError) as e:
+                await logger.awarning("quote_batch_failed", size=len(tickers), error=str(e))
+                return 0, 0
+        return len(prices), await self._store(prices)
+
+    async def refresh(self) -> dict[str, int]:
+        """Fetch and store quotes for every distinct held ticker."""
+        start = time.perf_counter()
+        async with async_session_factory() as db:
+            tickers = list((await db.execute(select(Holding.ticker).distinct())).scalars())
+        batches = [
+            tickers[i : i + self.batch_size] for i in range(0, len(tickers), self.batch_size)
+        ]
+        slots = asyncio.Semaphore(self.max_connections)
+        results = await asyncio.gather(*(self._refresh_batch(b, slots) for b in batches))
+        stats = {
+            "tickers": len(tickers),
+            "quoted": sum(q for q, _ in results),
+            "holdings_updated": sum(u for _, u in results),
+        }
+        await logger.ainfo(
+            "quotes_refreshed",
+            **stats,
+            batches=len(batches),
+            elapsed_ms=round((time.perf_counter() - start) * 1000, 2),
+        )
+        return stats
+
+    async def _claim_interval(self) -> bool:
+        """True if no other worker has refreshed within the current interval."""
+        try:
+            return bool(
+                await get_redis().set(LOCK_KEY, 1, nx=True, ex=max(1, int(self.interval)))
+            )
+        except Exception as e:
+            await logger.awarning("quote_lock_failed", error=str(e))
+            return True  # single-process deployments run without Redis
+
+    async def run(self, stop: asyncio.Event) -> None:
+        """Refresh every ``quote_refresh_seconds`` until ``stop`` is set."""
+        while not stop.is_set():
+            try:
+                if await self._claim_interval():
+                    await self.refresh()
+            except Exception as e:
+                await logger.aerror("quote_refresh_failed", error=str(e))
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(stop.wait(), self.interval)
+
+
+quote_refresher = QuoteRefresher()
@@ -0,0 +1,150 @@
+"""Incremental delivery and persistence of a session's report.
+
+The report writer calls ``ReportStream.write`` with text as it is
+generated (a token, a sentence, a section). Text is sent to clients as
+``report_delta`` events of at most ``report_delta_chars``, numbered by
+``index`` across the whole report, so the first words show up while the
+rest is still being written. Sent text is appended to the session's
+``reports`` row every ``report_persist_chars``, so the REST endpoints
+serve a partial report and the stream never holds a whole report in
+memory. ``finish`` saves the rest and sends ``report_complete`` with the
+length and SHA-256 of each section; a client whose reassembled text does
+not match refetches ``GET /api/v1/research/{session_id}/report``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from typing import Any
+from uuid import UUID
+
+from sqlalchemy import func, update
+from sqlalchemy.dialects.postgresql import insert
+
+from api.websocket import ws_manager
+from config import get_settings
+from models import Report
+from utils import async_session_factory, logger
+
+SECTIONS = ("executive_summary", "full_report")
+
+
+class ReportStream:
+    """One session's report, streamed to clients and appended to its row as it grows."""
+
+    def __init__(self, session_id: str) -> None:
+        settings = get_settings()
+        self.session_id = session_id
+        self.delta_chars = settings.report_delta_chars
+        self.delta_interval = settings.report_delta_interval_seconds
+        self.persist_chars = settings.report_persist_chars
+        self.chunks = 0
+        self._section: str | None = None
+        self._pending: list[str] = []  # written, not yet sent
+        self._pending_chars = 0
+        self._last_sent = time.monotonic()
+        self._unsaved: dict[str, list[str]] = {s: [] for s in SECTIONS}  # sent, not yet saved
+        self._unsaved_chars = 0
+        self._saved = False  # the row has been (re)written by this stream
+        self._digests = {s: hashlib.sha256() for s in SECTIONS}
+        self._bytes = dict.fromkeys(SECTIONS, 0)
+        self._finished = False
+
+    async def write(self, section: str, text: str) -> None:
+        """Append generated text to ``section`` (executive_summary or full_report)."""
+        if section not in SECTIONS:
+            raise ValueError(f"Unknown report section: {section}")
+        if self._finished:
+            raise RuntimeError("Report stream already finished")
+        if not text:
+            return
+        if section != self._section:
+            await self._send_pending()  # a delta never spans two sections
+            self._section = section
+        self._pending.append(text)
+        self._pending_chars += len(text)
+        if (
+            self._pending_chars >= self.delta_chars
+            or time.monotonic() - self._last_sent >= self.delta_interval
+        ):
+            await self._send_pending()
+        if self._unsaved_chars >= self.persist_chars:
+            await self._save()
+
+    async def finish(self, metadata: dict[str, Any] | None = None) -> dict[str, Any]:
+        """Send and save what is left, then send ``report_complete``.
+
+        ``metadata`` is stored as the report's ``report_metadata``, with the
+        stream digest under "stream". Returns the digest.
+        """
+        await self._send_pending()
+        self._finished = True
+        digest = {
+            "chunks": self.chunks,
+            "sections": {
+                s: {"bytes": self._bytes[s], "sha256": self._digests[s].hexdigest()}
+                for s in SECTIONS
+            },
+        }
+        # Saved before announcing, so a client that refetches gets the whole text
+        await self._save({**(metadata or {}), "stream": digest}, strict=True)
+        await ws_manager.send_report_complete(self.session_id, **digest)
+        return digest
+
+    async def _send_pending(self) -> None:
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_chars = 0
+        section = self._section
+        for start in range(0, len(text), self.delta_chars):
+            chunk = text[start : start + self.delta_chars]
+            await ws_manager.send_report_delta(self.session_id, section, self.chunks, chunk)
+            self.chunks += 1
+        encoded = text.encode()
+        self._digests[section].update(encoded)
+        self._bytes[section] += len(encoded)
+        self._unsaved[section].append(text)
+        self._unsaved_chars += len(text)
+        self._last_sent = time.monotonic()
+
+    async def _save(self, metadata: dict[str, Any] | None = None, strict: bool = False) -> None:
+        """Append unsaved text to the row; the first save replaces what a failed attempt left."""
+        appended = {s: "".join(parts) for s, parts in self._unsaved.items()}
+        sid = UUID(self.session_id)
+        try:
+            async with async_session_factory() as db:
+                if not self._saved:
+                    stmt = insert(Report).values(session_id=sid, **appended)
+                    await db.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[Report.session_id],
+                            set_={s: stmt.excluded[s] for s in SECTIONS},
+                        )
+                    )
+                    values: dict[str, Any] = {}
+                else:
+                    values = {
+                        s: func.coalesce(getattr(Report, s), "") + text
+                        for s, text in appended.items()
+                        if text
+                    }
+                if metadata is not None:
+                    values["report_metadata"] = metadata
+                if values:
+                    await db.execute(
+                        update(Report).where(Report.session_id == sid).values(**values)
+                    )
+                await db.commit()
+        except Exception as exc:
+            if strict:
+                raise
+            # Keep the text; the next save retries it
+            await logger.awarning("report_save_failed", session_id=self.session_id, error=str(exc))
+            return
+        self._saved = True
+        for parts in self._unsaved.values():
+            parts.clear()
+        self._unsaved_chars = 0
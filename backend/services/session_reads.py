@@ -0,0 +1,148 @@
+"""Read path for research sessions.
+
+A session is loaded with its thought steps, their tool executions, its
+citations and its report in a fixed number of queries (one per relationship
+level, never per row), then mapped straight onto ``ResearchResponse``.
+Completed sessions never change, so their encoded JSON is cached in a small
+in-process LRU in front of Redis and served without touching the database.
+"""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
+
+from config import get_settings
+from models import (
+    CitationResponse,
+    ResearchResponse,
+    ResearchSession,
+    ThoughtStep,
+    ThoughtStepResponse,
+    ToolExecutionResponse,
+)
+from utils import get_redis, logger
+
+REDIS_PREFIX = "slingshot:session:"
+
+# session_id -> encoded ResearchResponse, completed sessions only
+_local: OrderedDict[str, bytes] = OrderedDict()
+
+
+def _remember(session_id: str, body: bytes) -> None:
+    _local[session_id] = body
+    _local.move_to_end(session_id)
+    while len(_local) > get_settings().session_cache_max_entries:
+        _local.popitem(last=False)
+
+
+async def _cached(session_id: str) -> bytes | None:
+    body = _local.get(session_id)
+    if body is not None:
+        _local.move_to_end(session_id)
+        return body
+    try:
+        body = await get_redis().get(REDIS_PREFIX + session_id)
+    except Exception as exc:
+        await logger.awarning("session_cache_redis_error", op="get", error=str(exc))
+        return None
+    if body is not None:
+        _remember(session_id, body)
+    return body
+
+
+async def _store(session_id: str, body: bytes) -> None:
+    _remember(session_id, body)
+    try:
+        await get_redis().set(
+            REDIS_PREFIX + session_id, body, ex=get_settings().session_cache_ttl_seconds
+        )
+    except Exception as exc:
+        await logger.awarning("session_cache_redis_error", op="set", error=str(exc))
+
+
+async def load_research_session(db: AsyncSession, session_id: str) -> ResearchSession | None:
+    """Load a session and its whole graph eagerly (four queries in total)."""
+    try:
+        sid = UUID(session_id)
+    except ValueError:
+        return None
+    stmt = (
+        select(ResearchSession)
+        .where(ResearchSession.id == sid)
+        .options(
+            joinedload(ResearchSession.report),
+            selectinload(ResearchSession.thought_steps).selectinload(
+                ThoughtStep.tool_executions
+            ),
+            selectinload(ResearchSession.citations),
+        )
+    )
+    return (await db.execute(stmt)).unique().scalar_one_or_none()
+
+
+def to_research_response(session: ResearchSession) -> ResearchResponse:
+    """Map a fully loaded session onto the API schema."""
+    report = session.report
+    return ResearchResponse(
+        session_id=str(session.id),
+        query=session.query,
+        ticker=session.ticker,
+        status=session.status,
+        thought_steps=[
+            ThoughtStepResponse(
+                step_number=step.step_number,
+                step_type=step.step_type,
+                title=step.title,
+                content=step.content,
+                confidence=step.confidence,
+                tool_executions=[
+                    ToolExecutionResponse(
+                        tool_name=te.tool_name, execution_time_ms=te.execution_time_ms
+                    )
+                    for te in step.tool_executions
+                ],
+            )
+            for step in session.thought_steps
+        ],
+        citations=[
+            CitationResponse(
+                citation_key=c.citation_key,
+                source_type=c.source_type,
+                source_name=c.source_name,
+                source_url=c.source_url,
+                content_snippet=c.content_snippet,
+                page_number=c.page_number,
+            )
+            for c in session.citations
+        ],
+        executive_summary=report.executive_summary if report else None,
+        full_report=report.full_report if report else None,
+    )
+
+
+async def get_research_json(db: AsyncSession, session_id: str) -> bytes | None:
+    """Return the encoded ResearchResponse for a session, or None if unknown."""
+    body = await _cached(session_id)
+    if body is not None:
+        return body
+    session = await load_research_session(db, session_id)
+    if session is None:
+        return None
+    body = to_research_response(session).model_dump_json().encode()
+    if session.status == "complete":
+        await _store(session_id, body)
+    return body
+
+
+async def invalidate(session_id: str) -> None:
+    """Drop a cached session whose rows are being rewritten (a retried job, a cancel)."""
+    _local.pop(session_id, None)
+    try:
+        await get_redis().delete(REDIS_PREFIX + session_id)
+    except Exception as exc:
+        await logger.awarning("session_cache_redis_error", op="delete", error=str(exc))
@@ -0,0 +1,109 @@
+"""Symbol master: canonical NSE symbols for tickers as users and brokers write them."""
+
+from __future__ import annotations
+
+import csv
+import re
+from pathlib import Path
+
+from pydantic import BaseModel
+
+from config import get_settings
+from utils import logger
+
+_EXCHANGE_PREFIX = re.compile(r"^(?:NSE|BSE)\s*[:\-\s]\s*")
+_EXCHANGE_SUFFIX = re.compile(r"(?:\.(?:NS|NSE|BO|BSE)|-(?:EQ|BE|BZ|SM))$")
+_SYMBOL = re.compile(r"^[A-Z0-9&\-]{1,20}$")
+_NAME_NOISE = re.compile(r"\b(?:LIMITED|LTD|THE)\b|[^A-Z0-9&]")
+
+# Accepted spellings of the master file's columns (NSE EQUITY_L.csv uses the first)
+_COLUMNS = {
+    "symbol": ("SYMBOL", "TICKER", "NSE SYMBOL"),
+    "name": ("NAME OF COMPANY", "COMPANY NAME", "NAME"),
+    "isin": ("ISIN NUMBER", "ISIN"),
+    "bse_code": ("BSE CODE", "SCRIP CODE", "SECURITY CODE"),
+    "sector": ("SECTOR", "INDUSTRY"),
+}
+
+
+def clean_ticker(raw: str) -> str:
+    """Strip exchange prefixes/suffixes: "NSE:INFY", "INFY.NS", "INFY-EQ" -> "INFY"."""
+    ticker = raw.strip().upper()
+    ticker = _EXCHANGE_PREFIX.sub("", ticker)
+    return _EXCHANGE_SUFFIX.sub("", ticker).strip()
+
+
+def _name_key(name: str) -> str:
+    return _NAME_NOISE.sub("", name.upper())
+
+
+class Symbol(BaseModel):
+    symbol: str
+    name: str | None = None
+    isin: str | None = None
+    bse_code: str | None = None
+    sector: str | None = None
+
+
+class SymbolMaster:
+    """Resolves symbols, ISINs, BSE scrip codes and company names to a ``Symbol``.
+
+    Loaded from ``Settings.symbol_master_path``. Without a master file only
+    the syntactic clean-up applies, and any well-formed symbol is accepted.
+    """
+
+    def __init__(self, path: str | Path | None = None) -> None:
+        self.path = Path(path or get_settings().symbol_master_path)
+        self._by_code: dict[str, Symbol] | None = None  # symbol, ISIN, BSE code
+        self._by_name: dict[str, Symbol] = {}
+
+    def _load(self) -> dict[str, Symbol]:
+        index: dict[str, Symbol] = {}
+        if not self.path.exists():
+            logger.warning("symbol_master_missing", path=str(self.path))
+            return index
+        with self.path.open(newline="", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            headers = reader.fieldnames or []
+            columns = {
+                field: next((h for h in headers if h.strip().upper() in names), None)
+                for field, names in _COLUMNS.items()
+            }
+            if columns["symbol"] is None:
+                logger.warning("symbol_master_invalid", path=str(self.path))
+                return index
+            for row in reader:
+                values = {
+                    field: (row.get(col) or "").strip() or None
+                    for field, col in columns.items()
+                    if col is not None
+                }
+                if not values.get("symbol"):
+                    continue
+                values["symbol"] = values["symbol"].upper()
+                symbol = Symbol(**values)
+                index[symbol.symbol] = symbol
+                for alias in (symbol.isin, symbol.bse_code):
+                    if alias:
+                        index.setdefault(alias.upper(), symbol)
+                if symbol.name:
+                    self._by_name.setdefault(_name_key(symbol.name), symbol)
+        return index
+
+    @property
+    def loaded(self) -> bool:
+        if self._by_code is None:
+            self._by_code = self._load()
+        return bool(self._by_code)
+
+    def resolve(self, raw: str) -> Symbol | None:
+        """Return the canonical symbol for ``raw``, or None if it is not recognised."""
+        ticker = clean_ticker(raw)
+        if not ticker:
+            return None
+        if not self.loaded:
+            return Symbol(symbol=ticker) if _SYMBOL.match(ticker) else None
+        return self._by_code.get(ticker) or self._by_name.get(_name_key(ticker))
+
+
+symbol_master = SymbolMaster()
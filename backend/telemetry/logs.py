@@ -0,0 +1,176 @@
+"""structlog configuration: JSON or console lines written by a background thread.
+
+Log calls on the event loop only run the processor chain and append the
+rendered line to an in-memory queue; a daemon thread writes queued lines
+to stdout in batches. In production (``debug`` off) lines are JSON,
+rendered with orjson when it is installed, and events below INFO are
+filtered out before any processing. The async methods (``ainfo`` and so
+on) run inline instead of hopping to a thread pool, since nothing in the
+chain blocks. Events listed in ``log_sample_rates`` (WebSocket pings and
+the like) are kept with the given probability and carry ``sample_rate``.
+"""
+
+from __future__ import annotations
+
+import atexit
+import importlib.util
+import json
+import logging
+import random
+import sys
+import threading
+from collections import deque
+from typing import IO, Any
+
+import structlog
+
+from config import Settings
+from telemetry.metrics import LOG_LINES_DROPPED
+
+# Longest the writer waits before writing a partial batch, in seconds
+FLUSH_INTERVAL = 0.2
+
+
+class QueueLogger:
+    """structlog logger that hands rendered lines to a ``LogWriter``."""
+
+    def __init__(self, writer: LogWriter) -> None:
+        self._writer = writer
+
+    def msg(self, message: str | bytes) -> None:
+        self._writer.put(message)
+
+    debug = info = warning = warn = error = critical = exception = fatal = failure = log = msg
+
+
+class LogWriter:
+    """Bounded queue of rendered lines drained by one daemon thread.
+
+    When the queue is full (the stream cannot keep up) new lines are
+    dropped and counted rather than blocking the caller.
+    """
+
+    def __init__(self, stream: IO[bytes], max_lines: int) -> None:
+        self.stream = stream
+        self.max_lines = max_lines
+        self._lines: deque[str | bytes] = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def put(self, line: str | bytes) -> None:
+        if len(self._lines) >= self.max_lines:
+            LOG_LINES_DROPPED.inc()
+            return
+        self._lines.append(line)
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            self._drain()
+        self._drain()
+
+    def _drain(self) -> None:
+        batch = []
+        while self._lines:
+            line = self._lines.popleft()
+            batch.append(line.encode() if isinstance(line, str) else line)
+        if not batch:
+            return
+        batch.append(b"")
+        try:
+            self.stream.write(b"\n".join(batch))
+            self.stream.flush()
+        except (OSError, ValueError):
+            pass  # stdout closed or broken; nothing useful left to do with logs
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Write out queued lines and stop the thread."""
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+
+class EventSampler:
+    """Processor that keeps each listed event with its configured probability."""
+
+    def __init__(self, rates: dict[str, float]) -> None:
+        self.rates = rates
+
+    def __call__(self, logger: Any, method: str, event_dict: dict[str, Any]) -> dict[str, Any]:
+        rate = self.rates.get(event_dict.get("event"))
+        if rate is not None:
+            if random.random() >= rate:
+                raise structlog.DropEvent
+            event_dict["sample_rate"] = rate
+        return event_dict
+
+
+def _json_renderer() -> structlog.processors.JSONRenderer:
+    if importlib.util.find_spec("orjson") is not None:
+        import orjson
+
+        return structlog.processors.JSONRenderer(
+            serializer=orjson.dumps, option=orjson.OPT_NON_STR_KEYS
+        )
+    return structlog.processors.JSONRenderer(serializer=json.dumps, default=str)
+
+
+def _inline_async(cls: type) -> type:
+    """``cls`` with its async log methods calling the sync ones in place."""
+
+    def inline(name: str) -> Any:
+        sync = getattr(cls, name)
+
+        async def method(self: Any, *args: Any, **kw: Any) -> Any:
+            return sync(self, *args, **kw)
+
+        method.__name__ = f"a{name}"
+        return method
+
+    names = ("debug", "info", "warning", "warn", "error", "critical", "fatal", "exception")
+    methods = {f"a{name}": inline(name) for name in (*names, "msg", "log")}
+    return type(cls.__name__, (cls,), methods)
+
+
+_writer: LogWriter | None = None
+
+
+def configure_logging(settings: Settings) -> None:
+    """Set up structlog for this process from ``settings``."""
+    global _writer
+    fmt = settings.log_format
+    if fmt == "auto":
+        fmt = "console" if settings.debug else "json"
+    if fmt not in ("json", "console"):
+        raise ValueError(f"Unknown log format: {settings.log_format}")
+
+    processors: list[Any] = []
+    if settings.log_sample_rates:
+        # First, so a dropped event costs one dict lookup and a random draw
+        processors.append(EventSampler(settings.log_sample_rates))
+    processors += [
+        structlog.contextvars.merge_contextvars,
+        structlog.processors.add_log_level,
+        structlog.processors.TimeStamper(fmt="iso"),
+    ]
+    if fmt == "json":
+        processors += [structlog.processors.format_exc_info, _json_renderer()]
+    else:
+        processors.append(structlog.dev.ConsoleRenderer())
+
+    if _writer is None:
+        _writer = LogWriter(sys.stdout.buffer, settings.log_queue_size)
+        atexit.register(_writer.close)
+    level = logging.DEBUG if settings.debug else logging.INFO
+    structlog.configure(
+        processors=processors,
+        wrapper_class=_inline_async(structlog.make_filtering_bound_logger(level)),
+        context_class=dict,
+        logger_factory=lambda *args: QueueLogger(_writer),
+        cache_logger_on_first_use=True,
+    )
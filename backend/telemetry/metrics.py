@@ -0,0 +1,317 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Each process keeps its own counters and histograms. The API serves them on
+``/metrics``; job workers, which run the tools, serve theirs on
+``metrics_worker_port`` plus the worker's index. An observation is a dict
+lookup, a bisect over the bucket bounds and three additions, so it is
+cheap enough for every query and WebSocket frame.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import re
+import time
+from bisect import bisect_left
+from typing import Any
+
+import structlog
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import get_settings
+
+# Latency buckets in seconds, 1ms .. 30s
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+logger = structlog.get_logger()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.max_series = get_settings().metrics_max_series
+        self._series: dict[tuple[str, ...], Any] = {}
+        self._overflowed = False
+        registry.register(self)
+
+    def _get(self, values: tuple[str, ...]) -> Any:
+        series = self._series.get(values)
+        if series is None:
+            if len(self._series) >= self.max_series:
+                # Unbounded label values (raw paths, ids) would grow memory forever
+                if not self._overflowed:
+                    self._overflowed = True
+                    logger.warning("metric_series_limit", metric=self.name)
+                return None
+            series = self._series[values] = self._new()
+        return series
+
+    def _new(self) -> Any:
+        raise NotImplementedError
+
+    def render(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new(self) -> list[float]:
+        return [0.0]
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        series = self._get(labels)
+        if series is not None:
+            series[0] += amount
+
+    def render(self) -> list[str]:
+        return [
+            f"{self.name}_total{_labels(self.label_names, values)} {_number(series[0])}"
+            for values, series in self._series.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labels)
+
+    def _new(self) -> list[float]:
+        # Per-bucket counts (the last is +Inf), then sum, then count
+        return [0] * (len(self.buckets) + 1) + [0.0, 0]
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._get(labels)
+        if series is None:
+            return
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def time(self, *labels: str) -> _Timer:
+        """Context manager that observes the elapsed seconds of its block."""
+        return _Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = []
+        bounds = [_number(b) for b in self.buckets] + ["+Inf"]
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                labels = _labels(self.label_names, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.label_names, values)
+            lines.append(f"{self.name}_sum{labels} {_number(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple[str, ...]) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> _Timer:
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Registry:
+    """All metrics of this process, in registration order."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (0.0.4)."""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ---------------------------------------------------------------------------
+# Application metrics
+# ---------------------------------------------------------------------------
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "slingshot_http_request_duration_seconds",
+    "API request latency by route template.",
+    ("method", "route", "status"),
+)
+TOOL_SECONDS = Histogram(
+    "slingshot_tool_duration_seconds",
+    "Tool call latency, including cache hits.",
+    ("tool", "outcome"),
+)
+DB_QUERY_SECONDS = Histogram(
+    "slingshot_db_query_duration_seconds",
+    "Database statement latency by operation and first table.",
+    ("operation", "table"),
+)
+WS_SEND_SECONDS = Histogram(
+    "slingshot_ws_send_duration_seconds",
+    "Time to hand one WebSocket frame to the socket.",
+    ("frame",),
+)
+JOB_SECONDS = Histogram(
+    "slingshot_job_duration_seconds",
+    "Job run time on the workers.",
+    ("kind", "outcome"),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+WS_FRAMES_DROPPED = Counter(
+    "slingshot_ws_frames_dropped",
+    "Frames dropped or coalesced away for slow WebSocket clients.",
+)
+LLM_SECONDS = Histogram(
+    "slingshot_llm_duration_seconds",
+    "LLM provider call latency, excluding cache hits.",
+    ("provider", "model", "outcome"),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0),
+)
+LLM_TOKENS = Counter(
+    "slingshot_llm_tokens",
+    "Tokens sent to and generated by LLM providers.",
+    ("provider", "direction"),
+)
+LLM_CACHE_LOOKUPS = Counter(
+    "slingshot_llm_cache_lookups",
+    "LLM requests by how they were served: exact, semantic, coalesced or miss.",
+    ("provider", "result"),
+)
+LOG_LINES_DROPPED = Counter(
+    "slingshot_log_lines_dropped",
+    "Log lines dropped because the log writer fell behind.",
+)
+
+# ---------------------------------------------------------------------------
+# Instrumentation helpers
+# ---------------------------------------------------------------------------
+
+_OPERATION = re.compile(r"^\s*(\w+)")
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE)\s+"?([a-z_]\w*)', re.IGNORECASE)
+
+
+def _statement_labels(statement: str) -> tuple[str, str]:
+    """("SELECT", "holdings") for a statement: its verb and the first table it names."""
+    operation = _OPERATION.match(statement)
+    table = _TABLE.search(statement, 0, 2000)
+    return (
+        operation.group(1).upper() if operation else "OTHER",
+        table.group(1).lower() if table else "",
+    )
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Time every statement the engine runs into ``DB_QUERY_SECONDS`` (and a span)."""
+    from telemetry.tracing import start_span
+
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany) -> None:
+        operation, table = _statement_labels(statement)
+        span = start_span("db.query", operation=operation, table=table)
+        conn.info.setdefault("query_timers", []).append(
+            (time.perf_counter(), operation, table, span)
+        )
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany) -> None:
+        timers = conn.info.get("query_timers")
+        if not timers:
+            return
+        start, operation, table, span = timers.pop()
+        DB_QUERY_SECONDS.observe(time.perf_counter() - start, operation, table)
+        span.finish()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context) -> None:
+        timers = context.connection.info.get("query_timers") if context.connection else None
+        if timers:
+            _, _, _, span = timers.pop()
+            span.finish(error=str(context.original_exception))
+
+
+async def serve_metrics(port: int) -> asyncio.Server:
+    """Serve ``registry.render()`` over plain HTTP on ``port`` (for worker processes)."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await reader.readuntil(b"\r\n\r\n")
+            body = registry.render().encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: "
+                + CONTENT_TYPE.encode()
+                + b"\r\nContent-Length: "
+                + str(len(body)).encode()
+                + b"\r\nConnection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host="0.0.0.0", port=port)
@@ -0,0 +1,47 @@
+"""ASGI middleware that times API requests and opens their root span."""
+
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from telemetry.metrics import HTTP_REQUEST_SECONDS
+from telemetry.tracing import start_span
+
+
+class TelemetryMiddleware:
+    """Observes ``HTTP_REQUEST_SECONDS`` per route template and traces each request.
+
+    Written as plain ASGI rather than ``BaseHTTPMiddleware`` so the request
+    runs in the middleware's own context: spans and the session id bound by
+    the endpoint reach the tasks and jobs it starts.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        with start_span("http.request", method=scope["method"]) as span:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # The router records the matched route in the scope; raw paths
+                # carry ids and would make a series per request
+                route = getattr(scope.get("route"), "path", "unmatched")
+                span.set(route=route, status=status)
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start, scope["method"], route, str(status)
+                )
@@ -0,0 +1,140 @@
+"""Spans and the session id, carried through contextvars.
+
+A trace starts at an API request (or a background loop) and follows the
+work: into the job a request enqueues, the tool fan-out of that job and
+the database writes that persist its results. Whether a trace is sampled
+is decided once, at its root, with probability ``trace_sample_rate``;
+every span below inherits the decision. Sampled spans are written to the
+log as ``span`` events when they finish; unsampled ones cost a few
+attribute assignments.
+
+``bind_session`` puts the session id in a contextvar and in structlog's
+context, so every log line and span of a session carries it. ``inject``
+and ``resume`` carry a trace across the job queue.
+"""
+
+from __future__ import annotations
+
+import random
+import secrets
+import time
+from contextvars import ContextVar, Token
+from typing import Any
+
+import structlog
+
+from config import get_settings
+
+session_id_var: ContextVar[str | None] = ContextVar("session_id", default=None)
+_current_span: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+logger = structlog.get_logger()
+
+
+class Span:
+    """One timed operation within a trace."""
+
+    __slots__ = (
+        "name",
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "sampled",
+        "attrs",
+        "start",
+        "_token",
+        "_finished",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: str | None,
+        sampled: bool,
+        attrs: dict[str, Any],
+    ) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self._token: Token | None = None
+        self._finished = False
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def finish(self, error: str | None = None) -> None:
+        if self._finished:
+            return
+        self._finished = True
+        if not self.sampled:
+            return
+        logger.info(
+            "span",
+            span=self.name,
+            trace_id=self.trace_id,
+            span_id=self.span_id,
+            parent_id=self.parent_id,
+            duration_ms=round((time.perf_counter() - self.start) * 1000, 3),
+            error=error,
+            **self.attrs,
+        )
+
+    def __enter__(self) -> Span:
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type: Any, exc: BaseException | None, tb: Any) -> None:
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        self.finish(error=f"{exc_type.__name__}: {exc}" if exc_type is not None else None)
+
+
+def start_span(name: str, **attrs: Any) -> Span:
+    """A child of the current span, or a new root (sampled or not).
+
+    Use as a context manager to make it the current span for its block;
+    otherwise call ``finish()`` on it.
+    """
+    parent = _current_span.get()
+    if parent is not None:
+        return Span(name, parent.trace_id, parent.span_id, parent.sampled, attrs)
+    sampled = random.random() < get_settings().trace_sample_rate
+    return Span(name, secrets.token_hex(16), None, sampled, attrs)
+
+
+def current_span() -> Span | None:
+    return _current_span.get()
+
+
+def bind_session(session_id: str) -> None:
+    """Tag this context's spans and log lines with ``session_id``."""
+    session_id_var.set(session_id)
+    structlog.contextvars.bind_contextvars(session_id=session_id)
+
+
+def inject() -> dict[str, Any] | None:
+    """The current trace as a dict that can travel with a job."""
+    span = _current_span.get()
+    if span is None:
+        return None
+    return {
+        "trace_id": span.trace_id,
+        "span_id": span.span_id,
+        "sampled": span.sampled,
+        "session_id": session_id_var.get(),
+    }
+
+
+def resume(trace: dict[str, Any] | None, name: str, **attrs: Any) -> Span:
+    """A span continuing a trace from ``inject()``, or a new root if there is none."""
+    if trace and trace.get("session_id"):
+        bind_session(trace["session_id"])
+    if not trace:
+        return start_span(name, **attrs)
+    return Span(name, trace["trace_id"], trace.get("span_id"), bool(trace.get("sampled")), attrs)
@@ -0,0 +1,37 @@
+"""Shared fixtures. Tests run from ``backend/`` (see ``[tool.pytest.ini_options]``)."""
+
+from __future__ import annotations
+
+from uuid import uuid4
+
+import pytest
+
+from config import Settings, get_settings
+from utils import close_redis, get_redis
+
+
+@pytest.fixture
+def settings(monkeypatch: pytest.MonkeyPatch) -> Settings:
+    """The process settings; set fields with ``monkeypatch.setattr`` so they are restored."""
+    return get_settings()
+
+
+@pytest.fixture
+async def redis_prefix():
+    """A scratch key prefix on the configured Redis, removed afterwards.
+
+    Skips the test when no Redis server answers.
+    """
+    client = get_redis()
+    try:
+        await client.ping()
+    except Exception:
+        await close_redis()
+        pytest.skip("Redis is not reachable")
+    prefix = f"slingshot:test:{uuid4().hex}:"
+    yield prefix
+    keys = [key async for key in client.scan_iter(match=prefix + "*")]
+    if keys:
+        await client.delete(*keys)
+    # The client is bound to this test's event loop
+    await close_redis()
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from uuid import uuid4
+
+import pytest
+
+from agents import deep_research
+from agents.deep_research import ResearchGraph, parse_plan, task_waves
+from agents.state import ResearchPlan
+from llm.providers import LLMRequest, StubProvider
+
+
+def plan_text(*tasks: dict) -> str:
+    return json.dumps({"tasks": list(tasks), "rationale": "why"})
+
+
+def test_parse_plan_reads_tools_and_dependencies() -> None:
+    plan = parse_plan(
+        plan_text(
+            {"task": "Fundamentals", "tools": [{"tool_name": "screener", "params": {"t": 1}}]},
+            {"task": "News", "tools": [{"tool_name": "news"}]},
+            {"task": "Weigh", "depends_on": [0, 1]},
+        ),
+        "query",
+    )
+    assert plan.tasks == ["Fundamentals", "News", "Weigh"]
+    assert plan.tools_needed == ["news", "screener"]
+    assert plan.task_tools[0][0].params == {"t": 1}
+    assert plan.depends_on == {0: [], 1: [], 2: [0, 1]}
+    assert plan.rationale == "why"
+
+
+def test_parse_plan_renumbers_around_skipped_items() -> None:
+    plan = parse_plan(
+        plan_text(
+            {"task": "A", "tools": [{"tool_name": "a"}]},
+            "not a task",
+            {"task": ""},
+            {"task": "B", "tools": [{"tool_name": "b"}], "depends_on": [0, 1]},
+        ),
+        "query",
+    )
+    assert plan.tasks == ["A", "B"]
+    # Tools stay with their task; the dependency on a skipped item is dropped
+    assert [c.tool_name for c in plan.task_tools[1]] == ["b"]
+    assert plan.depends_on == {0: [], 1: [0]}
+
+
+def test_parse_plan_accepts_fenced_json() -> None:
+    plan = parse_plan("```json\n" + plan_text({"task": "A"}) + "\n```", "query")
+    assert plan.tasks == ["A"]
+
+
+def test_parse_plan_falls_back_to_the_query() -> None:
+    for text in ("not json", plan_text(), plan_text({"tools": []})):
+        plan = parse_plan(text, "Is TCS cheap?")
+        assert plan.tasks == ["Is TCS cheap?"]
+        assert plan.task_tools == {}
+
+
+def test_task_waves_orders_by_dependency() -> None:
+    plan = ResearchPlan(
+        tasks=["a", "b", "c", "d"],
+        tools_needed=[],
+        rationale="",
+        depends_on={2: [0, 1], 3: [2]},
+    )
+    assert task_waves(plan) == [[0, 1], [2], [3]]
+
+
+def test_task_waves_ignores_bad_edges_and_breaks_cycles() -> None:
+    plan = ResearchPlan(
+        tasks=["a", "b", "c"],
+        tools_needed=[],
+        rationale="",
+        depends_on={0: [0, 7], 1: [2], 2: [1]},
+    )
+    assert task_waves(plan) == [[0], [1, 2]]
+
+
+async def test_stub_answers_planner_prompts_with_a_plan() -> None:
+    request = LLMRequest(
+        provider="stub",
+        model="stub",
+        system='Reply with JSON: {"tasks": [...]}',
+        prompt="Query: TCS\nTools:\n- screener: fundamentals\n- news: headlines\n",
+    )
+    plan = parse_plan((await StubProvider().complete(request)).text, "TCS")
+    assert len(plan.tasks) == 3
+    assert plan.tools_needed == ["news", "screener"]
+    assert task_waves(plan) == [[0, 1], [2]]
+
+
+async def test_stub_answers_critic_prompts_with_a_review() -> None:
+    request = LLMRequest(
+        provider="stub",
+        model="stub",
+        system='Reply with JSON: {"confidence": 0.0, "feedback": "", "flagged_tools": []}',
+        prompt="Findings...\nTools used: screener, news\n",
+    )
+    review = json.loads((await StubProvider().complete(request)).text)
+    assert 0.5 <= review["confidence"] <= 1.0
+    assert review["flagged_tools"] in (["screener"], ["news"])
+
+
+class Generations:
+    """A gateway stand-in whose streams record whether they were closed."""
+
+    def __init__(self) -> None:
+        self.closed: list[str] = []
+
+    async def stream(self, prompt: str, **kwargs):
+        name = "summary" if prompt.startswith("Summarize") else "report"
+        try:
+            for word in ("a", "b", "c"):
+                yield word
+                await asyncio.sleep(0)
+        finally:
+            self.closed.append(name)
+
+
+async def test_report_closes_both_generations_when_writing_fails(monkeypatch) -> None:
+    async def set_status(self, state, status) -> None:
+        pass
+
+    async def write(self, section: str, text: str) -> None:
+        await asyncio.sleep(0)  # the report's generation starts meanwhile
+        raise ConnectionError("report row unavailable")
+
+    monkeypatch.setattr(ResearchGraph, "_set_status", set_status)
+    monkeypatch.setattr(deep_research.ReportStream, "write", write)
+    llm = Generations()
+    graph = ResearchGraph(llm=llm)
+    state = {"session_id": str(uuid4()), "query": "TCS", "analysis_draft": "draft"}
+
+    with pytest.raises(ConnectionError):
+        await graph._report(state)
+    assert sorted(llm.closed) == ["report", "summary"]
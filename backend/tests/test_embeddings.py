@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import numpy as np
+
+from rag.embeddings import EmbeddingCache, EmbeddingService
+
+
+def vectors(*rows: float) -> np.ndarray:
+    return np.array([[row, -row] for row in rows], dtype=np.float32)
+
+
+def test_cache_keeps_the_first_vector_per_key(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    a, b = EmbeddingCache.key("a"), EmbeddingCache.key("b")
+    cache.put_many([a, b, a], vectors(1, 2, 3))
+    cache.put_many([b], vectors(9))
+
+    found = cache.lookup([a, b, EmbeddingCache.key("c")])
+    assert len(cache) == 2
+    assert found[a].tolist() == [1.0, -1.0]
+    assert found[b].tolist() == [2.0, -2.0]
+
+
+def test_cache_sees_keys_appended_by_another_process(tmp_path: Path) -> None:
+    reader, writer = EmbeddingCache(tmp_path), EmbeddingCache(tmp_path)
+    assert reader.dim is None
+    writer.put_many([EmbeddingCache.key("a")], vectors(1))
+    writer.put_many([EmbeddingCache.key("b")], vectors(2))
+
+    found = reader.lookup([EmbeddingCache.key("b")])
+    assert reader.dim == 2
+    assert found[EmbeddingCache.key("b")].tolist() == [2.0, -2.0]
+
+
+def test_a_torn_append_is_overwritten(tmp_path: Path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    cache.put_many([EmbeddingCache.key("a")], vectors(1))
+    with (tmp_path / "vectors.f32").open("ab") as f:
+        f.write(vectors(7).tobytes())  # a vector whose key was never written
+    cache.put_many([EmbeddingCache.key("b")], vectors(2))
+
+    assert EmbeddingCache(tmp_path).lookup([EmbeddingCache.key("b")])[
+        EmbeddingCache.key("b")
+    ].tolist() == [2.0, -2.0]
+
+
+async def test_service_batches_concurrent_calls_and_caches(tmp_path: Path) -> None:
+    service = EmbeddingService(
+        model_name="test/model", batch_size=8, window_ms=20, workers=1, cache_dir=tmp_path
+    )
+    batches: list[list[str]] = []
+
+    async def encode(texts: list[str]) -> np.ndarray:
+        batches.append(texts)
+        return vectors(*(float(len(text)) for text in texts))
+
+    service._encode = encode
+    try:
+        first, second = await asyncio.gather(
+            service.embed(["a", "bb"]), service.embed(["bb", "ccc"])
+        )
+        assert batches == [["a", "bb", "ccc"]]  # one batch, "bb" encoded once
+        assert second[:, 0].tolist() == [2.0, 3.0]
+
+        again = await service.embed(["ccc", "a"])
+        assert again[:, 0].tolist() == [3.0, 1.0]
+        assert len(batches) == 1
+        assert (tmp_path / "test--model" / "keys.bin").stat().st_size == 48
+    finally:
+        await service.close()
+    assert first[:, 0].tolist() == [1.0, 2.0]
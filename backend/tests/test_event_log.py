@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from api import event_log
+from api.event_log import MemoryEventLog, seq_of, stamp_seq
+
+
+def test_seq_is_stamped_first_and_read_back() -> None:
+    assert stamp_seq(7, '{"type":"status"}') == '{"seq":7,"type":"status"}'
+    assert stamp_seq(7, "{}") == '{"seq":7}'
+    assert seq_of('{"seq":12,"type":"status"}') == 12
+    assert seq_of('{"seq":3}') == 3
+    assert seq_of('{"type":"status"}') == 0
+
+
+async def test_replay_sends_only_missed_events() -> None:
+    log = MemoryEventLog(max_events=10)
+    for n in range(3):
+        await log.append("s", "thought_step", f'{{"n":{n}}}')
+
+    events, truncated = await log.since("s", 1)
+    assert events == [("thought_step", '{"seq":2,"n":1}'), ("thought_step", '{"seq":3,"n":2}')]
+    assert not truncated
+    assert await log.since("s", 3) == ([], False)
+
+
+async def test_replay_past_the_ring_is_truncated() -> None:
+    log = MemoryEventLog(max_events=2)
+    for n in range(4):
+        await log.append("s", "thought_step", "{}")
+
+    events, truncated = await log.since("s", 1)
+    assert [seq_of(text) for _, text in events] == [3, 4]
+    assert truncated
+    assert (await log.since("s", 2))[1] is False
+    assert await log.since("gone", 5) == ([], True)
+    assert await log.since("gone", 0) == ([], False)
+
+
+async def test_a_closed_log_is_kept_if_the_session_appends_again() -> None:
+    log = MemoryEventLog(grace_seconds=0.01)
+    await log.append("retried", "status", "{}")
+    await log.append("done", "status", "{}")
+    await log.close_session("retried")
+    await log.close_session("done")
+    await log.append("retried", "status", "{}")  # the job's next attempt
+
+    await asyncio.sleep(0.05)
+    assert [seq_of(t) for _, t in (await log.since("retried", 0))[0]] == [1, 2]
+    assert await log.since("done", 1) == ([], True)
+
+
+async def test_idle_sessions_are_evicted_oldest_first(monkeypatch) -> None:
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(event_log, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    log = MemoryEventLog(idle_seconds=10)
+    await log.append("a", "status", "{}")
+    clock.now = 5
+    await log.append("b", "status", "{}")
+    clock.now = 8
+    await log.append("a", "status", "{}")  # "a" is now the most recent
+
+    clock.now = 16
+    await log.append("c", "status", "{}")
+    assert list(log._logs) == ["a", "c"]
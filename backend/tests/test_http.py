@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from tools.http import CircuitBreaker, CircuitOpenError, HttpClient, ValidatorCache
+
+HOST = "upstream.test"
+
+
+class Upstream:
+    """A mock host answering from a list of statuses (the last one repeats)."""
+
+    def __init__(self, *statuses: int) -> None:
+        self.statuses = list(statuses)
+        self.requests: list[httpx.Request] = []
+        self.hold: asyncio.Event | None = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if self.hold is not None:
+            await self.hold.wait()
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        return httpx.Response(status, text="ok")
+
+
+@pytest.fixture
+def client() -> HttpClient:
+    client = HttpClient(cache=ValidatorCache(use_redis=False))
+    client.backoff_base = 0.0
+    client.max_retries = 2
+    client._breaker_failures = 3
+    return client
+
+
+def route(client: HttpClient, upstream: Upstream) -> None:
+    client._clients[HOST] = httpx.AsyncClient(transport=httpx.MockTransport(upstream))
+
+
+# -- Breaker -----------------------------------------------------------------
+
+
+def test_breaker_opens_after_consecutive_failures() -> None:
+    breaker = CircuitBreaker(failures=3, reset_seconds=30)
+    assert not breaker.record(False)
+    assert not breaker.record(False)
+    assert breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.before_request() > 0
+
+
+def test_breaker_success_resets_the_count() -> None:
+    breaker = CircuitBreaker(failures=2, reset_seconds=30)
+    breaker.record(False)
+    breaker.record(True)
+    breaker.record(False)
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_through() -> None:
+    breaker = CircuitBreaker(failures=1, reset_seconds=30)
+    breaker.record(False)
+    breaker.opened_at = time.monotonic() - 31
+    assert breaker.state == "half_open"
+    assert breaker.before_request() == 0.0
+    assert breaker.before_request() > 0  # the trial is still in flight
+
+    breaker.record(False)  # a failed trial reopens without reporting a new opening
+    assert breaker.state == "open"
+
+    breaker.opened_at = time.monotonic() - 31
+    assert breaker.before_request() == 0.0
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+
+# -- Client ------------------------------------------------------------------
+
+
+async def test_get_is_retried_on_transient_statuses(client: HttpClient) -> None:
+    upstream = Upstream(503, 502, 200)
+    route(client, upstream)
+    response = await client.get(f"https://{HOST}/quote")
+    assert response.status_code == 200
+    assert len(upstream.requests) == 3
+
+
+async def test_post_is_not_resent_after_reaching_the_server(client: HttpClient) -> None:
+    upstream = Upstream(503, 200)
+    route(client, upstream)
+    response = await client.request("POST", f"https://{HOST}/orders", json={"qty": 1})
+    assert response.status_code == 503
+    assert len(upstream.requests) == 1
+
+
+async def test_post_is_resent_when_it_never_left_the_client(client: HttpClient) -> None:
+    attempts = []
+
+    def refuse_once(request: httpx.Request) -> httpx.Response:
+        attempts.append(request)
+        if len(attempts) == 1:
+            raise httpx.ConnectError("connection refused", request=request)
+        return httpx.Response(200)
+
+    client._clients[HOST] = httpx.AsyncClient(transport=httpx.MockTransport(refuse_once))
+    response = await client.request("POST", f"https://{HOST}/orders")
+    assert response.status_code == 200
+    assert len(attempts) == 2
+
+
+async def test_open_circuit_stops_requests(client: HttpClient) -> None:
+    upstream = Upstream(500)
+    route(client, upstream)
+    await client.get(f"https://{HOST}/a")  # three failures open the circuit
+    assert client.breaker(HOST).state == "open"
+    with pytest.raises(CircuitOpenError):
+        await client.get(f"https://{HOST}/a")
+    assert len(upstream.requests) == 3
+
+
+async def test_cancelled_trial_releases_the_half_open_slot(client: HttpClient) -> None:
+    upstream = Upstream(200)
+    upstream.hold = asyncio.Event()
+    route(client, upstream)
+    breaker = client.breaker(HOST)
+    for _ in range(3):
+        breaker.record(False)
+    breaker.opened_at = time.monotonic() - breaker.reset_seconds - 1
+
+    trial = asyncio.create_task(client.get(f"https://{HOST}/a"))
+    while not upstream.requests:
+        await asyncio.sleep(0)
+    trial.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await trial
+
+    breaker.opened_at = time.monotonic() - breaker.reset_seconds - 1
+    upstream.hold.set()
+    response = await client.get(f"https://{HOST}/a")
+    assert response.status_code == 200
+    assert breaker.state == "closed"
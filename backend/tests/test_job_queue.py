@@ -0,0 +1,129 @@
+"""Claim semantics, run against the in-process queue and the Redis claim script.
+
+The Redis cases skip when no server is reachable.
+"""
+
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from config import Settings
+from jobs.queue import Job, JobQueue, MemoryJobQueue, RedisJobQueue
+
+
+@pytest.fixture(params=["memory", "redis"])
+def queue(request: pytest.FixtureRequest, settings: Settings, monkeypatch) -> JobQueue:
+    monkeypatch.setattr(settings, "job_user_concurrency", 1)
+    monkeypatch.setattr(settings, "job_backoff_base_seconds", 0.0)
+    if request.param == "memory":
+        return MemoryJobQueue()
+    prefix = request.getfixturevalue("redis_prefix")
+    return RedisJobQueue(prefix=prefix, scan=2)
+
+
+def job(job_id: str, user: str = "u1", priority: int = 5, **kwargs) -> Job:
+    return Job(id=job_id, kind="research", user_id=user, priority=priority, **kwargs)
+
+
+async def test_claims_by_priority_then_fifo(queue: JobQueue) -> None:
+    await queue.enqueue(job("late", user="a", enqueued_ms=2))
+    await queue.enqueue(job("early", user="b", enqueued_ms=1))
+    await queue.enqueue(job("urgent", user="c", priority=0, enqueued_ms=3))
+    claimed = [(await queue.claim()).id for _ in range(3)]
+    assert claimed == ["urgent", "early", "late"]
+    assert await queue.claim() is None
+
+
+async def test_user_concurrency_skips_to_other_users(queue: JobQueue) -> None:
+    await queue.enqueue(job("a1", user="a", enqueued_ms=1))
+    await queue.enqueue(job("a2", user="a", enqueued_ms=2))
+    await queue.enqueue(job("b1", user="b", enqueued_ms=3))
+
+    first = await queue.claim()
+    assert first.id == "a1"
+    assert (await queue.claim()).id == "b1"  # a2 waits for a1's slot
+    assert await queue.claim() is None
+
+    await queue.ack(first)
+    assert (await queue.claim()).id == "a2"
+
+
+async def test_failed_job_is_retried_then_dead_lettered(queue: JobQueue) -> None:
+    await queue.enqueue(job("j", max_attempts=2))
+    claimed = await queue.claim()
+    assert await queue.fail(claimed, "boom")  # backoff is zero: due at once
+
+    retried = await queue.claim()
+    assert retried.id == "j"
+    assert retried.attempts == 1
+    assert retried.last_error == "boom"
+    assert not await queue.fail(retried, "boom again")
+    assert await queue.claim() is None
+    assert await queue.get("j") is None
+
+
+async def test_expired_lease_is_reclaimed(
+    queue: JobQueue, settings: Settings, monkeypatch
+) -> None:
+    await queue.enqueue(job("j"))
+    await queue.enqueue(job("k"))
+    monkeypatch.setattr(settings, "job_lease_seconds", -1.0)
+    crashed = await queue.claim()
+    monkeypatch.setattr(settings, "job_lease_seconds", 120.0)
+    reclaimed = await queue.claim()
+    assert reclaimed.id == crashed.id
+    # The reclaim gave the user's running slot back before taking it again
+    assert await queue.claim() is None
+
+
+async def test_capped_users_do_not_starve_the_rest(queue: JobQueue) -> None:
+    for i in range(5):
+        await queue.enqueue(job(f"a{i}", user="a", enqueued_ms=i))
+    await queue.enqueue(job("b0", user="b", enqueued_ms=10))
+    assert (await queue.claim()).id == "a0"
+    # a1..a4 fill more than one scan page ahead of b0
+    assert (await queue.claim()).id == "b0"
+
+
+async def test_a_job_that_keeps_killing_its_worker_is_dead_lettered(
+    queue: JobQueue, settings: Settings, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "job_lease_seconds", -1.0)  # every lease expires at once
+    await queue.enqueue(job("j", max_attempts=2, payload={"tickers": [], "weights": {}}))
+    await queue.claim()
+    retried = await queue.claim()
+    assert retried.attempts == 1
+    assert retried.last_error == "lease expired"
+    assert retried.payload == {"tickers": [], "weights": {}}
+
+    assert await queue.claim() is None  # the second expiry used the last attempt
+    assert await queue.get("j") is None
+
+
+async def test_cancel_drops_a_queued_job(queue: JobQueue) -> None:
+    await queue.enqueue(job("j"))
+    await queue.cancel("j")
+    assert await queue.is_cancelled("j")
+    assert await queue.claim() is None
+    assert await queue.get("j") is None
+
+
+async def test_get_sees_queued_and_running_jobs(queue: JobQueue) -> None:
+    await queue.enqueue(job("j", payload={"query": "TCS"}))
+    assert (await queue.get("j")).payload == {"query": "TCS"}
+    assert not await queue.is_leased("j")
+    claimed = await queue.claim()
+    assert (await queue.get("j")).id == "j"
+    assert await queue.is_leased("j")
+    await queue.ack(claimed)
+    assert await queue.get("j") is None
+    assert not await queue.is_leased("j")
+
+
+def test_score_orders_priority_before_age() -> None:
+    now = int(time.time() * 1000)
+    assert int(job("a", priority=1, enqueued_ms=now).score) < int(
+        job("b", priority=2, enqueued_ms=0).score
+    )
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from services.market_data import MarketDataStore
+
+
+@pytest.fixture
+def store(tmp_path: Path) -> MarketDataStore:
+    return MarketDataStore(tmp_path / "market")
+
+
+def bar(day: str, close: float) -> dict:
+    return {"date": day, "open": close, "high": close, "low": close, "close": close, "volume": 1}
+
+
+def test_load_csv_skips_bad_rows(store: MarketDataStore, tmp_path: Path) -> None:
+    export = tmp_path / "RELIANCE.csv"
+    export.write_text(
+        "Date,Open,High,Low,Close,Adj Close,Volume\n"
+        '2024-01-02,"2,580.00","2,600.50","2,570.00","2,590.25","2,590.25","1,234,567"\n'
+        "2024-01-03,2590,2610,2580,2605,2605,1000\n"
+        "2024-01-04,2605,2620\n"
+        "2024-01-05,abc,2620,2600,2610,2610,900\n"
+        "\n"
+        "2024-01-08,2610,2630,2600,null,null,0\n"
+        "09-Jan-2024,2615,2640,2610,2630,2630,800\n"
+    )
+    assert store.load_csv("RELIANCE", export) == 3
+
+    history = store.history("RELIANCE")
+    assert history.date.astype(str).tolist() == ["2024-01-02", "2024-01-03", "2024-01-09"]
+    assert history.close.tolist() == [2590.25, 2605.0, 2630.0]
+    assert history.volume.tolist() == [1234567, 1000, 800]
+
+
+def test_append_replaces_the_last_bar_and_ignores_older_ones(store: MarketDataStore) -> None:
+    store.write("TCS", [bar("2024-01-02", 1.0), bar("2024-01-03", 2.0)])
+    assert store.append("TCS", [bar("2024-01-01", 9.0)]) == 0
+    assert store.append("TCS", [bar("2024-01-03", 3.0), bar("2024-01-04", 4.0)]) == 2
+    assert store.history("TCS").close.tolist() == [1.0, 3.0, 4.0]
+
+
+def test_between_slices_without_copying(store: MarketDataStore) -> None:
+    store.write("TCS", [bar(f"2024-01-0{d}", float(d)) for d in range(1, 8)])
+    history = store.history("TCS")
+    window = history.between("2024-01-03", "2024-01-05")
+    assert window.close.tolist() == [3.0, 4.0, 5.0]
+    assert np.shares_memory(window.close, history.close)
+    assert store.latest_close(["TCS", "INFY"]).tolist()[0] == 7.0
+    assert np.isnan(store.latest_close(["INFY"])[0])
+
+
+def test_load_csv_reads_compact_dates(store: MarketDataStore, tmp_path: Path) -> None:
+    export = tmp_path / "TCS.csv"
+    export.write_text(
+        "Date,Open,High,Low,Close,Volume\n"
+        "20240105,1,1,1,1,10\n"
+        "20240108,2,2,2,2,20\n"
+    )
+    assert store.load_csv("TCS", export) == 2
+    assert store.history("TCS").date.astype(str).tolist() == ["2024-01-05", "2024-01-08"]
+
+
+def test_bhavcopy_skips_truncated_rows(store: MarketDataStore, tmp_path: Path) -> None:
+    bhavcopy = tmp_path / "bhav.csv"
+    bhavcopy.write_text(
+        "SYMBOL,SERIES,TIMESTAMP,OPEN,HIGH,LOW,CLOSE,TOTTRDQTY\n"
+        "TCS,EQ,05-Jan-2024,3700,3750,3690,3740,\"1,200\"\n"
+        "INFY\n"
+        "GOLDBEES,ETF,05-Jan-2024,55,56,54,55,900\n"
+        "HDFCBANK,EQ,05-Jan-2024,1650,1660,1640,1655,800\n"
+    )
+    assert store.load_bhavcopy(bhavcopy) == 2
+    assert store.tickers() == ["HDFCBANK", "TCS"]
+    assert store.history("TCS").volume.tolist() == [1200]
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from vault.monte_carlo import MonteCarloConfig, MonteCarloEngine
+from vault.positions import Positions
+
+
+@pytest.fixture
+async def engine(settings, monkeypatch):
+    monkeypatch.setattr(settings, "mc_paths_per_shard", 500)
+    engine = MonteCarloEngine(workers=2)
+    yield engine
+    await engine.close()
+
+
+def positions() -> Positions:
+    return Positions(
+        tickers=np.array(["TCS", "HDFCBANK", "RELIANCE"]),
+        sectors=np.array(["IT", "Banking", ""]),
+        quantity=np.array([10.0, 20.0, 5.0]),
+        price=np.array([3700.0, 1650.0, 2900.0]),
+    )
+
+
+async def test_var_and_cvar_are_ordered(engine: MonteCarloEngine) -> None:
+    config = MonteCarloConfig(paths=2000, horizon_days=10, seed=7)
+    result = await engine.simulate(positions(), config)
+
+    assert result["portfolio_value"] == 84500.0
+    assert result["paths"] == 2000
+    low, high = result["risk"]
+    assert 0 < low["var"] <= low["cvar"]
+    assert low["var"] <= high["var"] <= high["cvar"]
+    assert 0 < result["max_drawdown"]["mean_pct"] <= result["max_drawdown"]["worst_pct"]
+
+
+async def test_a_seed_reproduces_the_result_across_worker_counts(
+    engine: MonteCarloEngine,
+) -> None:
+    config = MonteCarloConfig(paths=1200, horizon_days=5, distribution="t", seed=11)
+    progress = []
+
+    async def on_progress(done: int, total: int) -> None:
+        progress.append(done)
+
+    first = await engine.simulate(positions(), config, on_progress)
+    single = MonteCarloEngine(workers=1)
+    try:
+        assert await single.simulate(positions(), config) == first
+    finally:
+        await single.close()
+    assert sorted(progress) == progress and progress[-1] == 1200  # three shards
+
+
+async def test_a_drawn_seed_is_reported(engine: MonteCarloEngine) -> None:
+    result = await engine.simulate(positions(), MonteCarloConfig(paths=100, horizon_days=1))
+    again = MonteCarloConfig(paths=100, horizon_days=1, seed=result["seed"])
+    assert await engine.simulate(positions(), again) == result
+
+
+async def test_rejects_bad_configs(engine: MonteCarloEngine) -> None:
+    for config in (
+        MonteCarloConfig(paths=10, horizon_days=1, distribution="cauchy"),
+        MonteCarloConfig(paths=10, horizon_days=1, distribution="t", df=2),
+        MonteCarloConfig(paths=10, horizon_days=1, confidence_levels=[1.0]),
+    ):
+        with pytest.raises(ValueError):
+            await engine.simulate(positions(), config)
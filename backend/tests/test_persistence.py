@@ -0,0 +1,158 @@
+"""Flush isolation, against a stand-in for the async session (no database needed)."""
+
+from __future__ import annotations
+
+import asyncio
+from contextlib import asynccontextmanager
+from uuid import UUID, uuid4
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from services import persistence
+from services.persistence import SessionWriter
+
+
+class Database:
+    """Rows committed through savepoints; rows for ``rejected`` sessions fail."""
+
+    def __init__(self) -> None:
+        self.rejected: set[UUID] = set()
+        self.fail_commit = False
+        self.gate: asyncio.Event | None = None  # held commits wait for it
+        self.held = 0
+        self.committed: list[dict] = []
+        self.statements: list = []
+        self._pending: list[dict] = []
+
+    def session(self) -> Database:
+        return self
+
+    async def __aenter__(self) -> Database:
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._pending.clear()  # anything uncommitted is rolled back
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        mark = len(self._pending)
+        try:
+            yield
+        except Exception:
+            del self._pending[mark:]
+            raise
+
+    async def execute(self, statement, rows: list[dict] | None = None) -> None:
+        if rows is None:
+            self.statements.append(statement)
+            return
+        if any(row.get("session_id") in self.rejected for row in rows):
+            raise IntegrityError("INSERT", {}, Exception("violates foreign key constraint"))
+        self._pending.extend(rows)
+
+    async def commit(self) -> None:
+        if self.gate is not None:
+            self.held += 1
+            await self.gate.wait()
+        if self.fail_commit:
+            raise OperationalError("COMMIT", {}, Exception("connection reset"))
+        self.committed.extend(self._pending)
+        self._pending.clear()
+
+
+@pytest.fixture
+def db(monkeypatch: pytest.MonkeyPatch) -> Database:
+    database = Database()
+
+    async def send_thought_step(*args, **kwargs) -> None:
+        pass
+
+    monkeypatch.setattr(persistence, "async_session_factory", database.session)
+    monkeypatch.setattr(persistence.ws_manager, "send_thought_step", send_thought_step)
+    return database
+
+
+async def record(writer: SessionWriter, session_id: str, steps: int) -> None:
+    for n in range(steps):
+        step = await writer.record_thought_step(session_id, n, "researching", f"step {n}")
+        await writer.record_tool_execution(session_id, step, "news")
+
+
+async def test_a_rejected_session_does_not_sink_the_others(db: Database) -> None:
+    writer = SessionWriter(flush_rows=1000, flush_interval=3600)
+    good, gone = str(uuid4()), str(uuid4())
+    db.rejected.add(UUID(gone))
+    await record(writer, good, 2)
+    await record(writer, gone, 2)
+
+    await writer.flush()
+    await writer.close()
+
+    assert len(db.committed) == 4  # two steps and two tool rows, all for ``good``
+    assert {row["session_id"] for row in db.committed if "session_id" in row} == {UUID(good)}
+    assert writer._buffers == {}  # the rejected rows are dropped, not retried
+
+
+async def test_a_failed_transaction_requeues_every_session(db: Database) -> None:
+    writer = SessionWriter(flush_rows=1000, flush_interval=3600)
+    first, second = str(uuid4()), str(uuid4())
+    await record(writer, first, 1)
+    await record(writer, second, 1)
+
+    db.fail_commit = True
+    await writer.flush()
+    assert db.committed == []
+    await record(writer, first, 1)  # newer rows queue behind the requeued ones
+
+    db.fail_commit = False
+    await writer.close()
+    steps = [row for row in db.committed if row.get("session_id") == UUID(first)]
+    assert [row["title"] for row in steps] == ["step 0", "step 0"]
+    assert len(db.committed) == 6
+
+
+async def test_only_writes_for_the_same_session_wait_for_each_other(db: Database) -> None:
+    writer = SessionWriter(flush_rows=1000, flush_interval=3600)
+    first, second = str(uuid4()), str(uuid4())
+    await record(writer, first, 1)
+    await record(writer, second, 1)
+
+    db.gate = asyncio.Event()
+    flushes = [asyncio.create_task(writer.flush(sid)) for sid in (first, second)]
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert db.held == 2  # both sessions are mid-commit at once
+
+    await record(writer, first, 1)
+    flushes.append(asyncio.create_task(writer.flush(first)))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert db.held == 2  # the next write for ``first`` waits for its last one
+
+    db.gate.set()
+    await asyncio.gather(*flushes)
+    assert db.held == 3
+    assert len(db.committed) == 6
+    assert writer._writing == {}
+
+
+async def test_reset_drops_buffered_rows_and_the_cached_read(
+    db: Database, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    invalidated = []
+
+    async def invalidate(session_id: str) -> None:
+        invalidated.append(session_id)
+
+    monkeypatch.setattr(persistence.session_reads, "invalidate", invalidate)
+    writer = SessionWriter(flush_rows=1000, flush_interval=3600)
+    session_id = str(uuid4())
+    await record(writer, session_id, 2)
+
+    await writer.reset_session(session_id)
+    await writer.close()
+
+    assert db.committed == []
+    assert [type(s).__name__ for s in db.statements] == ["Delete"] * 4
+    assert invalidated == [session_id]
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import csv
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from config import Settings
+from services.portfolio_import import _csv_rows
+
+# Quoted fields with commas, doubled quotes and line breaks, a multi-byte
+# currency sign, CRLF endings and no final newline
+EXPORT = (
+    "Symbol,Qty,Avg Price,Notes\r\n"
+    'TCS,10,"₹3,400.50","long term"\r\n'
+    'INFY,5,1500,"split\r\nacross ""two"" lines"\r\n'
+    "HDFCBANK,20,1600.25,\r\n"
+    '"RELIANCE",3,"2,450","a,b"'
+)
+
+
+async def read_all(data: bytes) -> list[tuple[int, list[str]]]:
+    return [row async for row in _csv_rows(UploadFile(io.BytesIO(data), filename="h.csv"))]
+
+
+@pytest.mark.parametrize("chunk", [29, 30, 31, 37, 41, 64, 1 << 16])
+async def test_records_survive_any_chunk_boundary(
+    chunk: int, settings: Settings, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "portfolio_upload_chunk_bytes", chunk)
+    rows = await read_all(EXPORT.encode())
+
+    expected = list(csv.reader(io.StringIO(EXPORT, newline="")))
+    assert [cells for _, cells in rows] == expected
+    # Numbered by the line each record starts on
+    assert [line for line, _ in rows] == [1, 2, 3, 5, 6]
+
+
+async def test_bom_is_stripped_and_semicolons_are_sniffed(
+    settings: Settings, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "portfolio_upload_chunk_bytes", 32)
+    data = "﻿Symbol;Qty;Avg Price\nTCS;10;3400\nINFY;5;1500\n".encode()
+    rows = await read_all(data)
+    assert rows == [
+        (1, ["Symbol", "Qty", "Avg Price"]),
+        (2, ["TCS", "10", "3400"]),
+        (3, ["INFY", "5", "1500"]),
+    ]
+
+
+async def test_a_sniffed_quote_character_decides_where_records_end(
+    settings: Settings, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "portfolio_upload_chunk_bytes", 90)  # cuts the INFY record
+    data = (
+        "Symbol,Qty,Avg Price,Notes\n"
+        "TCS,10,3400,'6\" and 8\" lots, long term'\n"
+        "INFY,5,1500,'split\nacross lines'\n"
+        "HDFCBANK,20,1600,'none'\n"
+    ).encode()
+    rows = await read_all(data)
+    assert rows[1:] == [
+        (2, ["TCS", "10", "3400", '6" and 8" lots, long term']),
+        (3, ["INFY", "5", "1500", "split\nacross lines"]),
+        (5, ["HDFCBANK", "20", "1600", "none"]),
+    ]
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from services import quotes
+from services.quotes import QuoteRefresher, parse_quotes, quote_symbol
+
+
+def test_parse_quotes_keeps_positive_prices() -> None:
+    payload = {
+        "quoteResponse": {
+            "result": [
+                {"symbol": "TCS.NS", "regularMarketPrice": 3812.5},
+                {"symbol": "500325.BO", "regularMarketPrice": 2901},
+                {"symbol": "HALTED.NS", "regularMarketPrice": 0},
+                {"symbol": "ODD.NS", "regularMarketPrice": "12"},
+                {"regularMarketPrice": 10.0},
+            ]
+        }
+    }
+    assert parse_quotes(payload) == {"TCS.NS": 3812.5, "500325.BO": 2901.0}
+    assert parse_quotes({}) == parse_quotes({"quoteResponse": None}) == {}
+
+
+async def test_fetch_maps_symbols_back_to_tickers(monkeypatch: pytest.MonkeyPatch) -> None:
+    sent = []
+
+    async def get(url: str, params: dict, revalidate: bool) -> httpx.Response:
+        sent.append(params["symbols"])
+        body = {
+            "quoteResponse": {
+                "result": [
+                    {"symbol": "TCS.NS", "regularMarketPrice": 3812.5},
+                    {"symbol": "500325.BO", "regularMarketPrice": 2901.0},
+                    {"symbol": "UNASKED.NS", "regularMarketPrice": 1.0},
+                ]
+            }
+        }
+        return httpx.Response(200, json=body, request=httpx.Request("GET", url))
+
+    async def throttle() -> None:
+        pass
+
+    refresher = QuoteRefresher()
+    monkeypatch.setattr(quotes.http_client, "get", get)
+    monkeypatch.setattr(refresher, "_throttle", throttle)
+
+    prices = await refresher.fetch(["TCS", "500325", "INFY"])
+    assert sent == ["TCS.NS,500325.BO,INFY.NS"]
+    assert prices == {"TCS": 3812.5, "500325": 2901.0}
+    assert quote_symbol("INFY") == "INFY.NS"
+
+
+async def test_store_writes_a_batch_in_one_update(monkeypatch: pytest.MonkeyPatch) -> None:
+    statements = []
+
+    class Database:
+        async def __aenter__(self) -> Database:
+            return self
+
+        async def __aexit__(self, *exc) -> None:
+            pass
+
+        async def execute(self, statement):
+            statements.append(statement)
+            return type("Result", (), {"rowcount": 3})()
+
+        async def commit(self) -> None:
+            pass
+
+    monkeypatch.setattr(quotes, "async_session_factory", Database)
+    refresher = QuoteRefresher()
+
+    assert await refresher._store({}) == 0
+    assert await refresher._store({"TCS": 3812.5, "INFY": 1510.0}) == 3
+    (statement,) = statements
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.startswith("UPDATE holdings SET current_price=quotes.price")
+    assert "FROM (VALUES" in sql
+    assert "RETURNING" not in sql
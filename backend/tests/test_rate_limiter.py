@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+import utils
+from utils import RateLimiter, RedisRateLimiter
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(utils, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def test_burst_then_one_token_per_interval(clock: Clock) -> None:
+    limiter = RateLimiter(max_calls=3, period=3.0)
+    assert [limiter.is_allowed("a") for _ in range(3)] == [True, True, True]
+    assert limiter.retry_after("a") == pytest.approx(1.0)
+
+    clock.now += 0.5
+    assert limiter.retry_after("a") == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.is_allowed("a")
+    assert not limiter.is_allowed("a")
+
+
+def test_denied_calls_do_not_consume_tokens(clock: Clock) -> None:
+    limiter = RateLimiter(max_calls=2, period=2.0)
+    limiter.is_allowed("a")
+    limiter.is_allowed("a")
+    for _ in range(10):
+        assert not limiter.is_allowed("a")
+    clock.now += 1.0
+    assert limiter.is_allowed("a")
+
+
+def test_keys_are_independent(clock: Clock) -> None:
+    limiter = RateLimiter(max_calls=1, period=60.0)
+    assert limiter.is_allowed("a")
+    assert not limiter.is_allowed("a")
+    assert limiter.is_allowed("b")
+
+
+def test_idle_keys_are_evicted_and_capped(clock: Clock) -> None:
+    limiter = RateLimiter(max_calls=2, period=2.0, max_keys=3)
+    for i in range(10):
+        limiter.is_allowed(f"k{i}")
+    assert len(limiter._tat) <= 3
+
+    clock.now += 10
+    limiter.is_allowed("fresh")
+    assert list(limiter._tat) == ["fresh"]
+
+
+async def test_acquire_gives_up_when_the_wait_exceeds_the_timeout(clock: Clock) -> None:
+    limiter = RateLimiter(max_calls=1, period=10.0)
+    assert await limiter.acquire("a", timeout=0)
+    assert not await limiter.acquire("a", timeout=5.0)
+
+
+async def test_redis_limiter_shares_the_algorithm(redis_prefix: str) -> None:
+    limiter = RedisRateLimiter(max_calls=2, period=60.0, prefix=redis_prefix)
+    assert await limiter.is_allowed("a")
+    assert await limiter.is_allowed("a")
+    wait = await limiter.retry_after("a")
+    assert 0 < wait <= 30.0
+    assert await limiter.is_allowed("b")
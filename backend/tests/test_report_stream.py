@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import hashlib
+from uuid import uuid4
+
+import pytest
+
+from config import Settings
+from services import report_stream
+from services.report_stream import SECTIONS, ReportStream
+
+
+@pytest.fixture
+def events(monkeypatch: pytest.MonkeyPatch) -> list[dict]:
+    sent: list[dict] = []
+
+    async def send_event(session_id: str, event: dict) -> None:
+        sent.append(event)
+
+    monkeypatch.setattr(report_stream.ws_manager, "send_event", send_event)
+    return sent
+
+
+@pytest.fixture
+def saved(monkeypatch: pytest.MonkeyPatch) -> dict[str, str]:
+    """The text each section's row would hold, without a database."""
+    rows = dict.fromkeys(SECTIONS, "")
+
+    async def save(self: ReportStream, metadata=None, strict: bool = False) -> None:
+        for section, parts in self._unsaved.items():
+            rows[section] += "".join(parts)
+            parts.clear()
+        self._unsaved_chars = 0
+
+    monkeypatch.setattr(ReportStream, "_save", save)
+    return rows
+
+
+async def test_deltas_reassemble_to_the_announced_checksums(
+    events: list[dict], saved: dict[str, str], settings: Settings, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "report_delta_chars", 7)
+    monkeypatch.setattr(settings, "report_delta_interval_seconds", 3600)
+    monkeypatch.setattr(settings, "report_persist_chars", 20)
+    stream = ReportStream(str(uuid4()))
+    written = {
+        "executive_summary": ["TCS ", "looks ", "fairly valued at ₹3,400; ", "margins hold."],
+        "full_report": ["## Valuation\n", "P/E of 28× ", "vs 5-yr median 26×.\n" * 3],
+    }
+    for section, parts in written.items():
+        for part in parts:
+            await stream.write(section, part)
+    digest = await stream.finish({"model": "stub"})
+
+    deltas = [e for e in events if e["event"] == "report_delta"]
+    complete = events[-1]
+    assert complete["event"] == "report_complete"
+    assert complete["chunks"] == digest["chunks"] == len(deltas)
+    assert [e["index"] for e in deltas] == list(range(len(deltas)))
+    assert all(len(e["text"]) <= 7 for e in deltas)
+
+    for section in SECTIONS:
+        text = "".join(e["text"] for e in deltas if e["section"] == section)
+        assert text == "".join(written[section]) == saved[section]
+        encoded = text.encode()
+        assert complete["sections"][section] == {
+            "bytes": len(encoded),
+            "sha256": hashlib.sha256(encoded).hexdigest(),
+        }
+
+
+async def test_writes_after_finish_are_refused(events: list[dict], saved: dict) -> None:
+    stream = ReportStream(str(uuid4()))
+    await stream.write("executive_summary", "done")
+    await stream.finish()
+    with pytest.raises(RuntimeError):
+        await stream.write("full_report", "late")
+    with pytest.raises(ValueError):
+        await ReportStream(str(uuid4())).write("appendix", "text")
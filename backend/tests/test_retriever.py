@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import pytest
+
+from rag.retriever import KeywordIndex, reciprocal_rank_fusion, tokenize
+
+
+def test_rrf_rewards_agreement_between_lists() -> None:
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]], k=60)
+    assert fused["b"] == pytest.approx(1 / 62 + 1 / 61)
+    assert fused["a"] == pytest.approx(1 / 61)
+    assert fused["d"] == pytest.approx(1 / 62)
+    assert max(fused, key=fused.get) == "b"
+
+
+def test_rrf_depends_only_on_rank() -> None:
+    assert reciprocal_rank_fusion([["x"]], k=0) == {"x": 1.0}
+    assert reciprocal_rank_fusion([[], []], k=60) == {}
+
+
+def test_tokenize_keeps_figures_and_ampersands() -> None:
+    tokens = tokenize("M&M NIM at 4.1% on 1,200 cr")
+    assert tokens == ["m&m", "nim", "at", "4.1%", "on", "1,200", "cr"]
+
+
+def test_bm25_finds_exact_tokens_and_filters() -> None:
+    index = KeywordIndex()
+    index.on_upsert(
+        ["1", "2", "3"],
+        [
+            "HDFC Bank NIM at 4.1% this quarter",
+            "Bank credit growth slowed",
+            "TCS order book",
+        ],
+        [
+            {"ticker": "HDFCBANK", "source_type": "transcript"},
+            {"ticker": "SBIN", "source_type": "news"},
+            {"ticker": "TCS", "source_type": "news"},
+        ],
+    )
+    assert index.search("NIM 4.1%", k=5)[0][0] == "1"
+    assert [cid for cid, _ in index.search("bank", k=5, source_types=["news"])] == ["2"]
+
+    index.on_delete(["1"])
+    assert index.search("NIM", k=5) == []
+    assert len(index) == 2
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from uuid import uuid4
+
+import pytest
+
+from config import Settings
+from models import ResearchSession
+from services import session_reads
+from services.session_reads import get_research_json, invalidate
+
+
+class Redis:
+    def __init__(self) -> None:
+        self.data: dict[str, bytes] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.data.get(key)
+
+    async def set(self, key: str, value: bytes, ex: int | None = None) -> None:
+        self.data[key] = value
+
+    async def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+
+@pytest.fixture
+def redis(monkeypatch: pytest.MonkeyPatch) -> Redis:
+    redis = Redis()
+    monkeypatch.setattr(session_reads, "get_redis", lambda: redis)
+    monkeypatch.setattr(session_reads, "_local", type(session_reads._local)())
+    return redis
+
+
+class Sessions(dict):
+    """Sessions the read path finds, counting database loads."""
+
+    loads = 0
+
+    async def load(self, db, session_id: str) -> ResearchSession | None:
+        self.loads += 1
+        return self.get(session_id)
+
+
+@pytest.fixture
+def sessions(monkeypatch: pytest.MonkeyPatch) -> Sessions:
+    rows = Sessions()
+    monkeypatch.setattr(session_reads, "load_research_session", rows.load)
+    return rows
+
+
+def session(status: str) -> ResearchSession:
+    return ResearchSession(
+        id=uuid4(), query="Is TCS cheap?", status=status, thought_steps=[], citations=[]
+    )
+
+
+async def test_only_complete_sessions_are_cached(redis: Redis, sessions: Sessions) -> None:
+    running, done = session("researching"), session("complete")
+    sessions[str(running.id)] = running
+    sessions[str(done.id)] = done
+
+    for _ in range(2):
+        assert b'"researching"' in await get_research_json(None, str(running.id))
+        assert b'"complete"' in await get_research_json(None, str(done.id))
+    assert sessions.loads == 3  # the running session is read each time
+    assert list(redis.data) == [session_reads.REDIS_PREFIX + str(done.id)]
+
+
+async def test_redis_hits_fill_the_local_tier(redis: Redis, sessions: Sessions) -> None:
+    redis.data[session_reads.REDIS_PREFIX + "s1"] = b"{}"
+    assert await get_research_json(None, "s1") == b"{}"
+    redis.data.clear()
+    assert await get_research_json(None, "s1") == b"{}"
+    assert sessions.loads == 0
+
+
+async def test_invalidate_drops_both_tiers(redis: Redis, sessions: Sessions) -> None:
+    done = session("complete")
+    sessions[str(done.id)] = done
+    await get_research_json(None, str(done.id))
+
+    done.status = "cancelled"
+    await invalidate(str(done.id))
+    assert b'"cancelled"' in await get_research_json(None, str(done.id))
+
+
+async def test_local_tier_is_bounded(
+    redis: Redis, sessions: Sessions, settings: Settings, monkeypatch
+) -> None:
+    monkeypatch.setattr(settings, "session_cache_max_entries", 2)
+    for i in range(4):
+        redis.data[session_reads.REDIS_PREFIX + f"s{i}"] = b"{}"
+        await get_research_json(None, f"s{i}")
+    assert list(session_reads._local) == ["s2", "s3"]
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from vault.positions import Positions
+from vault.stress_test import (
+    SCENARIOS,
+    SECTOR_BETA,
+    Scenario,
+    resolve_scenarios,
+    run_stress_tests,
+)
+
+
+def positions() -> Positions:
+    return Positions(
+        tickers=np.array(["HDFCBANK", "TCS", "INFY", "XYZ"]),
+        sectors=np.array(["Banks", "IT", "Information Technology", ""]),
+        quantity=np.array([10.0, 5.0, 4.0, 100.0]),
+        price=np.array([1600.0, 3800.0, 1500.0, 10.0]),
+    )
+
+
+def test_market_crash_moves_each_holding_by_its_beta() -> None:
+    result = run_stress_tests(positions(), [SCENARIOS["market_crash"]])
+    (crash,) = result["scenarios"]
+
+    assert result["portfolio_value"] == 42000.0
+    assert crash["by_sector"] == {
+        "banking": round(16000 * SECTOR_BETA["banking"] * -0.3, 2),
+        "it": round(25000 * SECTOR_BETA["it"] * -0.3, 2),
+        "other": round(1000 * SECTOR_BETA["other"] * -0.3, 2),
+    }
+    assert crash["pnl"] == pytest.approx(sum(crash["by_sector"].values()), abs=0.02)
+    assert crash["stressed_value"] == pytest.approx(42000 + crash["pnl"])
+
+
+def test_replays_land_each_sector_on_its_realised_return() -> None:
+    result = run_stress_tests(positions(), [SCENARIOS["historical_gfc_2008"]])
+    worst = {h["ticker"]: h["return_pct"] for h in result["scenarios"][0]["worst_holdings"]}
+    assert worst["HDFCBANK"] == -60.0
+    assert worst["TCS"] == worst["INFY"] == -55.0
+
+
+def test_losses_stop_at_the_holding_value_and_list_the_worst_first() -> None:
+    wipeout = Scenario(name="wipeout", market=-3.0)
+    rally = Scenario(name="rally", market=0.2)
+    crash, up = run_stress_tests(positions(), [wipeout, rally], top_n=2)["scenarios"]
+
+    assert crash["pnl_pct"] == -100.0
+    assert [h["ticker"] for h in crash["worst_holdings"]] == ["TCS", "HDFCBANK"]
+    assert up["worst_holdings"] == []  # only losing holdings are listed
+
+
+def test_resolve_scenarios() -> None:
+    assert len(resolve_scenarios("all", {}, ["market_crash"])) == len(SCENARIOS)
+    (custom,) = resolve_scenarios("my_view", {"market": -0.05, "rate_bps": 25}, [])
+    assert custom.description == "Custom scenario"
+    with pytest.raises(ValueError):
+        resolve_scenarios("market_crash", {}, ["nope"])
+    with pytest.raises(ValueError):
+        Scenario(name="bad", sectors={"shipbuilding": -0.1}).shocks()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from agents.state import ToolResult
+from tools.cache import ToolResultCache
+
+
+class Fetch:
+    """A tool body that counts its runs and can be held open."""
+
+    def __init__(self, error: str | None = None) -> None:
+        self.calls = 0
+        self.error = error
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self) -> ToolResult:
+        self.calls += 1
+        await self.release.wait()
+        return ToolResult(tool_name="quote", output={"run": self.calls}, error=self.error)
+
+
+@pytest.fixture
+def cache() -> ToolResultCache:
+    return ToolResultCache(max_entries=8, use_redis=False)
+
+
+async def test_concurrent_identical_calls_share_one_run(cache: ToolResultCache) -> None:
+    fetch = Fetch()
+    fetch.release.clear()
+    calls = [cache.get_or_run("quote", {"ticker": "TCS"}, 60, fetch) for _ in range(10)]
+    waiting = asyncio.gather(*calls)
+    await asyncio.sleep(0)
+    fetch.release.set()
+    results = await waiting
+
+    assert fetch.calls == 1
+    assert all(r.output == {"run": 1} for r in results)
+    # Each caller gets its own copy to mutate
+    assert len({id(r) for r in results}) == len(results)
+
+
+async def test_hits_are_served_from_the_cache(cache: ToolResultCache) -> None:
+    fetch = Fetch()
+    await cache.get_or_run("quote", {"ticker": "TCS"}, 60, fetch)
+    await cache.get_or_run("quote", {"ticker": "TCS"}, 60, fetch)
+    await cache.get_or_run("quote", {"ticker": "INFY"}, 60, fetch)
+    assert fetch.calls == 2
+
+
+async def test_failed_results_are_not_cached(cache: ToolResultCache) -> None:
+    fetch = Fetch(error="upstream timeout")
+    first = await cache.get_or_run("quote", {"ticker": "TCS"}, 60, fetch)
+    await cache.get_or_run("quote", {"ticker": "TCS"}, 60, fetch)
+    assert first.error == "upstream timeout"
+    assert fetch.calls == 2
+
+
+async def test_a_cancelled_caller_does_not_cancel_the_shared_fill(
+    cache: ToolResultCache,
+) -> None:
+    fetch = Fetch()
+    fetch.release.clear()
+    first = asyncio.create_task(cache.get_or_run("quote", {}, 60, fetch))
+    second = asyncio.create_task(cache.get_or_run("quote", {}, 60, fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    fetch.release.set()
+
+    assert (await second).output == {"run": 1}
+    assert first.cancelled()
+    assert fetch.calls == 1
+
+
+async def test_invalidate_forces_a_fresh_run(cache: ToolResultCache) -> None:
+    fetch = Fetch()
+    await cache.get_or_run("quote", {"ticker": "TCS"}, 60, fetch)
+    await cache.invalidate("quote", {"ticker": "TCS"})
+    result = await cache.get_or_run("quote", {"ticker": "TCS"}, 60, fetch)
+    assert result.output == {"run": 2}
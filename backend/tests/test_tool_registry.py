@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from agents.state import ToolResult
+from tools.base import BaseTool, ToolCall, ToolRegistry, remaining_time
+
+
+class Sleeper(BaseTool):
+    """Sleeps for ``params["seconds"]``, recording how many run at once."""
+
+    def __init__(self, name: str, running: list[int] | None = None) -> None:
+        self.name = name
+        self.running = running if running is not None else [0, 0]  # now, peak
+
+    async def execute(self, params: dict[str, Any]) -> ToolResult:
+        self.running[0] += 1
+        self.running[1] = max(self.running)
+        try:
+            if params.get("fail"):
+                raise RuntimeError("upstream said no")
+            await asyncio.sleep(params.get("seconds", 0))
+            return ToolResult(tool_name=self.name, output={"left": remaining_time()})
+        finally:
+            self.running[0] -= 1
+
+
+def registry(*names: str, max_concurrency: int = 8) -> ToolRegistry:
+    tools = ToolRegistry(max_concurrency=max_concurrency)
+    running = [0, 0]
+    for name in names:
+        tools.register(Sleeper(name, running))
+    return tools
+
+
+async def test_results_come_back_in_plan_order_and_failures_do_not_raise() -> None:
+    tools = registry("slow", "fast", "broken")
+    results = await tools.run_many(
+        [
+            ToolCall(tool_name="slow", params={"seconds": 0.02}),
+            ToolCall(tool_name="fast"),
+            ToolCall(tool_name="broken", params={"fail": True}),
+            ToolCall(tool_name="missing"),
+        ]
+    )
+    assert [r.tool_name for r in results] == ["slow", "fast", "broken", "missing"]
+    assert [r.error for r in results[:2]] == [None, None]
+    assert results[2].error == "upstream said no"
+    assert results[3].error == "unknown tool: missing"
+
+
+async def test_timeouts_and_the_shared_deadline_bound_each_call() -> None:
+    tools = registry("a", "b")
+    timed, bounded = await tools.run_many(
+        [
+            ToolCall(tool_name="a", params={"seconds": 1}, timeout=0.02),
+            ToolCall(tool_name="b", params={"seconds": 0}),
+        ],
+        deadline=0.5,
+    )
+    assert timed.error.startswith("timed out")
+    assert 0 < bounded.output["left"] <= 0.5  # the tool sees its remaining budget
+
+
+async def test_optional_calls_are_cancelled_once_required_ones_finish() -> None:
+    tools = registry("needed", "nice")
+    needed, nice = await tools.run_many(
+        [
+            ToolCall(tool_name="needed", params={"seconds": 0.01}),
+            ToolCall(tool_name="nice", params={"seconds": 1}, required=False),
+        ]
+    )
+    assert needed.error is None
+    assert nice.error == "cancelled: required tools finished first"
+
+
+async def test_calls_share_the_concurrency_cap() -> None:
+    tools = registry("t", max_concurrency=2)
+    plan = [ToolCall(tool_name="t", params={"seconds": 0.01}) for _ in range(6)]
+    results = await tools.run_many(plan)
+    assert all(r.error is None for r in results)
+    assert tools.get("t").running == [0, 2]
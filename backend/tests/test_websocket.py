@@ -0,0 +1,76 @@
+"""Slow-consumer handling of one client's send queue.
+
+Frames are pushed without awaiting, so the writer never gets a turn to drain them.
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from api.websocket import _ClientConnection, _Frame
+from config import Settings
+
+
+class Socket:
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+
+    async def send_text(self, text: str) -> None:
+        self.sent.append(text)
+
+
+def client(
+    settings: Settings, monkeypatch, policy: str, size: int = 4, paused: bool = False
+) -> _ClientConnection:
+    monkeypatch.setattr(settings, "ws_send_queue_size", size)
+    monkeypatch.setattr(settings, "ws_slow_consumer_policy", policy)
+    return _ClientConnection(Socket(), on_dead=lambda: None, paused=paused)
+
+
+@pytest.mark.parametrize("policy", ["coalesce", "drop"])
+async def test_undroppable_frames_are_capped(policy: str, settings: Settings, monkeypatch) -> None:
+    conn = client(settings, monkeypatch, policy)
+    accepted = [conn.push(_Frame("report_delta", "{}")) for _ in range(6)]
+    assert accepted == [True] * 4 + [False] * 2
+    assert len(conn._queue) == 4
+    conn.close()
+
+
+async def test_coalesce_merges_thought_steps_to_make_room(
+    settings: Settings, monkeypatch
+) -> None:
+    conn = client(settings, monkeypatch, "coalesce")
+    for i in range(3):
+        assert conn.push(_Frame("thought_step", f'{{"n":{i}}}'))
+    assert conn.push(_Frame("report_delta", "{}"))
+    assert conn.push(_Frame("report_delta", "{}"))
+
+    assert [f.kind for f in conn._queue] == ["batch", "report_delta", "report_delta"]
+    assert conn._queue[0].count == 3
+    conn.close()
+
+
+async def test_drop_policy_sheds_thought_steps_first(settings: Settings, monkeypatch) -> None:
+    conn = client(settings, monkeypatch, "drop", size=2)
+    assert conn.push(_Frame("thought_step", '{"n":1}'))
+    assert conn.push(_Frame("report_delta", '{"n":2}'))
+    assert conn.push(_Frame("thought_step", '{"n":3}'))  # dropped on arrival
+    assert conn.push(_Frame("report_delta", '{"n":4}'))  # evicts the queued step
+    assert [f.text for f in conn._queue] == ['{"n":2}', '{"n":4}']
+    conn.close()
+
+
+async def test_disconnect_policy_refuses_when_full(settings: Settings, monkeypatch) -> None:
+    conn = client(settings, monkeypatch, "disconnect", size=1)
+    assert conn.push(_Frame("thought_step", "{}"))
+    assert not conn.push(_Frame("thought_step", "{}"))
+    conn.close()
+
+
+async def test_replayed_backlog_raises_the_cap(settings: Settings, monkeypatch) -> None:
+    conn = client(settings, monkeypatch, "coalesce", size=2, paused=True)
+    conn.push(_Frame("report_delta", "{}", seq=10))
+    conn.replay([_Frame("report_delta", "{}", seq=i) for i in range(1, 10)])
+    assert [f.seq for f in conn._queue] == list(range(1, 11))
+    assert conn.limit == 2 + 9
+    conn.close()
@@ -2,13 +2,35 @@
 
 from __future__ import annotations
 
+import asyncio
 import time
 from abc import ABC, abstractmethod
-from typing import Any
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any
 
 from pydantic import BaseModel, Field
 
 from agents.state import Citation, ToolResult
+from config import get_settings
+from telemetry.metrics import TOOL_SECONDS
+from telemetry.tracing import start_span
+from tools.cache import tool_cache
+from utils import logger
+
+if TYPE_CHECKING:
+    from tools.http import HttpClient
+
+# Absolute event-loop deadline (loop.time()) for the tool currently running.
+# Tools and the transports they use can read it to bound their own waits.
+_tool_deadline: ContextVar[float | None] = ContextVar("tool_deadline", default=None)
+
+
+def remaining_time() -> float | None:
+    """Seconds left before the current tool's deadline, or None if unbounded."""
+    deadline = _tool_deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - asyncio.get_running_loop().time())
 
 
 class ToolInput(BaseModel):
@@ -17,6 +39,17 @@ class ToolInput(BaseModel):
     pass
 
 
+class ToolCall(BaseModel):
+    """A single entry in a fan-out plan for ToolRegistry.run_many."""
+
+    tool_name: str
+    params: dict[str, Any] = Field(default_factory=dict)
+    timeout: float | None = Field(default=None, gt=0, description="Per-tool timeout in seconds")
+    required: bool = Field(
+        default=True, description="Optional calls are cancelled once required ones finish"
+    )
+
+
 class BaseTool(ABC):
     """Abstract base class for all Slingshot research tools.
 
@@ -24,10 +57,20 @@ class BaseTool(ABC):
       - Has a name and description for the LLM to select it.
       - Produces structured output with citations.
       - Tracks execution time.
+      - Caches successful results for ``cache_ttl`` seconds (0 disables).
+      - Fetches upstream data through ``self.http`` (see ``tools.http``).
     """
 
     name: str = ""
     description: str = ""
+    cache_ttl: int = 0  # e.g. hours for fundamentals, minutes for news
+
+    @property
+    def http(self) -> HttpClient:
+        """The process-wide pooled HTTP transport."""
+        from tools.http import http_client
+
+        return http_client
 
     @abstractmethod
     async def execute(self, params: dict[str, Any]) -> ToolResult:
@@ -35,7 +78,28 @@ class BaseTool(ABC):
         ...
 
     async def run(self, params: dict[str, Any]) -> ToolResult:
-        """Execute with timing wrapper."""
+        """Execute with timing wrapper, served from the result cache when enabled."""
+        settings = get_settings()
+        ttl = settings.tool_cache_ttls.get(self.name, self.cache_ttl)
+        if not settings.tool_cache_enabled or ttl <= 0:
+            return await self._run_timed(params)
+        return await tool_cache.get_or_run(
+            self.name, self.normalize_params(params), ttl, lambda: self._run_timed(params)
+        )
+
+    async def invalidate(self, params: dict[str, Any]) -> None:
+        """Drop the cached result for params, so the next run fetches fresh data."""
+        await tool_cache.invalidate(self.name, self.normalize_params(params))
+
+    def normalize_params(self, params: dict[str, Any]) -> dict[str, Any]:
+        """Canonical form of params for cache keys. Override to fold aliases."""
+        return {
+            k: v.strip() if isinstance(v, str) else v
+            for k, v in params.items()
+            if v is not None
+        }
+
+    async def _run_timed(self, params: dict[str, Any]) -> ToolResult:
         start = time.perf_counter()
         result = await self.execute(params)
         elapsed_ms = int((time.perf_counter() - start) * 1000)
@@ -68,8 +132,10 @@ class BaseTool(ABC):
 class ToolRegistry:
     """Central registry for all available tools."""
 
-    def __init__(self) -> None:
+    def __init__(self, max_concurrency: int | None = None) -> None:
         self._tools: dict[str, BaseTool] = {}
+        self._max_concurrency = max_concurrency or get_settings().tool_max_concurrency
+        self._semaphore = asyncio.Semaphore(self._max_concurrency)
 
     def register(self, tool: BaseTool) -> None:
         """Register a tool by its name."""
@@ -87,6 +153,118 @@ class ToolRegistry:
     def available(self) -> list[str]:
         return list(self._tools.keys())
 
+    async def run_many(
+        self,
+        plan: list[ToolCall],
+        deadline: float | None = None,
+    ) -> list[ToolResult]:
+        """Run a plan of tool calls concurrently and return results in plan order.
+
+        Calls share the registry-wide concurrency cap. Each call is bounded by
+        its own timeout (or ``tool_timeout_seconds``) and by ``deadline``, a
+        budget in seconds for the whole fan-out. Once every required call has
+        finished, optional calls still in flight are cancelled, so the wall
+        time is set by the slowest required tool. Calls that fail, time out or
+        get cancelled yield a ToolResult with ``error`` set instead of raising.
+        """
+        if not plan:
+            return []
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        abs_deadline = started + deadline if deadline is not None else None
+        # Respect a deadline inherited from an enclosing tool run
+        outer = _tool_deadline.get()
+        if outer is not None:
+            abs_deadline = outer if abs_deadline is None else min(abs_deadline, outer)
+
+        tasks = [asyncio.create_task(self._run_call(call, abs_deadline)) for call in plan]
+        required = [t for t, call in zip(tasks, plan) if call.required] or tasks
+        try:
+            await asyncio.wait(required)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        results: list[ToolResult] = []
+        for task, call in zip(tasks, plan):
+            if task.cancelled():
+                results.append(
+                    ToolResult(
+                        tool_name=call.tool_name,
+                        output={},
+                        execution_time_ms=int((loop.time() - started) * 1000),
+                        error="cancelled: required tools finished first",
+                    )
+                )
+            else:
+                results.append(task.result())
+
+        await logger.ainfo(
+            "tools_fanout_complete",
+            tools=[c.tool_name for c in plan],
+            failed=[r.tool_name for r in results if r.error],
+            elapsed_ms=int((loop.time() - started) * 1000),
+        )
+        return results
+
+    async def _run_call(self, call: ToolCall, abs_deadline: float | None) -> ToolResult:
+        """Run one planned call in its own span, timed into ``TOOL_SECONDS``."""
+        start = time.perf_counter()
+        outcome = "cancelled"
+        try:
+            with start_span("tool.call", tool=call.tool_name) as span:
+                result = await self._call(call, abs_deadline)
+                if result.error is None:
+                    outcome = "ok"
+                elif result.error.startswith("timed out"):
+                    outcome = "timeout"
+                else:
+                    outcome = "error"
+                span.set(outcome=outcome)
+            return result
+        finally:
+            TOOL_SECONDS.observe(time.perf_counter() - start, call.tool_name, outcome)
+
+    async def _call(self, call: ToolCall, abs_deadline: float | None) -> ToolResult:
+        """Run one planned call under the concurrency cap and its deadline."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        def failed(error: str) -> ToolResult:
+            return ToolResult(
+                tool_name=call.tool_name,
+                output={},
+                execution_time_ms=int((loop.time() - started) * 1000),
+                error=error,
+            )
+
+        tool = self._tools.get(call.tool_name)
+        if tool is None:
+            return failed(f"unknown tool: {call.tool_name}")
+
+        async with self._semaphore:
+            timeout = call.timeout or get_settings().tool_timeout_seconds
+            if abs_deadline is not None:
+                timeout = min(timeout, abs_deadline - loop.time())
+            if timeout <= 0:
+                return failed("deadline exceeded before start")
+
+            token = _tool_deadline.set(loop.time() + timeout)
+            try:
+                async with asyncio.timeout(timeout):
+                    return await tool.run(call.params)
+            except TimeoutError:
+                await logger.awarning("tool_timeout", tool=call.tool_name, timeout_s=timeout)
+                return failed(f"timed out after {timeout:.1f}s")
+            except Exception as exc:
+                await logger.aerror("tool_failed", tool=call.tool_name, error=str(exc))
+                return failed(str(exc))
+            finally:
+                _tool_deadline.reset(token)
+
 
 # Global registry - tools register themselves on import
 tool_registry = ToolRegistry()
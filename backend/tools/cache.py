@@ -0,0 +1,158 @@
+"""Content-addressed cache for tool results.
+
+Results are keyed by a hash of (tool name, normalized params) and kept in a
+small in-process LRU in front of Redis, so one upstream fetch per key per TTL
+is shared across sessions and workers. Concurrent identical calls within a
+process are coalesced onto a single in-flight execution.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from agents.state import ToolResult
+from config import get_settings
+from utils import get_redis, logger
+
+REDIS_PREFIX = "slingshot:tool:"
+
+
+def make_cache_key(tool_name: str, params: dict[str, Any]) -> str:
+    """Hash a tool name and its (already normalized) params into a cache key."""
+    payload = json.dumps(
+        {"tool": tool_name, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ToolResultCache:
+    """Two-tier (LRU + Redis) tool result cache with single-flight fills."""
+
+    def __init__(self, max_entries: int | None = None, use_redis: bool = True) -> None:
+        self.max_entries = max_entries or get_settings().tool_cache_max_entries
+        self.use_redis = use_redis
+        # key -> (expires_at monotonic, result)
+        self._local: OrderedDict[str, tuple[float, ToolResult]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task[ToolResult]] = {}
+
+    # -- Local LRU ---------------------------------------------------------
+
+    def _get_local(self, key: str) -> ToolResult | None:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return result
+
+    def _set_local(self, key: str, result: ToolResult, ttl: float) -> None:
+        self._local[key] = (time.monotonic() + ttl, result)
+        self._local.move_to_end(key)
+        while len(self._local) > self.max_entries:
+            self._local.popitem(last=False)
+
+    # -- Redis -------------------------------------------------------------
+
+    async def _get_remote(self, key: str) -> tuple[ToolResult, float] | None:
+        if not self.use_redis:
+            return None
+        try:
+            pipe = get_redis().pipeline()
+            pipe.get(REDIS_PREFIX + key)
+            pipe.pttl(REDIS_PREFIX + key)
+            raw, pttl = await pipe.execute()
+        except Exception as exc:
+            await logger.awarning("tool_cache_redis_error", op="get", error=str(exc))
+            return None
+        if raw is None or pttl is None or pttl <= 0:
+            return None
+        return ToolResult.model_validate_json(raw), pttl / 1000
+
+    async def _set_remote(self, key: str, result: ToolResult, ttl: float) -> None:
+        if not self.use_redis:
+            return
+        try:
+            await get_redis().set(
+                REDIS_PREFIX + key, result.model_dump_json(), px=max(1, int(ttl * 1000))
+            )
+        except Exception as exc:
+            await logger.awarning("tool_cache_redis_error", op="set", error=str(exc))
+
+    # -- Public API --------------------------------------------------------
+
+    async def get(self, key: str) -> ToolResult | None:
+        """Look a key up in the LRU, then Redis (promoting remote hits)."""
+        result = self._get_local(key)
+        if result is not None:
+            return result
+        remote = await self._get_remote(key)
+        if remote is None:
+            return None
+        result, ttl = remote
+        self._set_local(key, result, ttl)
+        return result
+
+    async def get_or_run(
+        self,
+        tool_name: str,
+        params: dict[str, Any],
+        ttl: float,
+        fn: Callable[[], Awaitable[ToolResult]],
+    ) -> ToolResult:
+        """Return a cached result or run ``fn`` once for all concurrent callers.
+
+        Failed results (``error`` set) and exceptions are never cached. The
+        fill runs in its own task, so a caller that times out does not cancel
+        the fetch other callers are waiting on.
+        """
+        key = make_cache_key(tool_name, params)
+        cached = await self.get(key)
+        if cached is not None:
+            return cached.model_copy(deep=True)
+
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fill(key, ttl, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        result = await asyncio.shield(task)
+        return result.model_copy(deep=True)
+
+    async def _fill(
+        self, key: str, ttl: float, fn: Callable[[], Awaitable[ToolResult]]
+    ) -> ToolResult:
+        result = await fn()
+        if result.error is None:
+            self._set_local(key, result, ttl)
+            await self._set_remote(key, result, ttl)
+        return result
+
+    async def invalidate(self, tool_name: str, params: dict[str, Any]) -> None:
+        """Drop a cached result from both tiers."""
+        key = make_cache_key(tool_name, params)
+        self._local.pop(key, None)
+        if self.use_redis:
+            try:
+                await get_redis().delete(REDIS_PREFIX + key)
+            except Exception as exc:
+                await logger.awarning("tool_cache_redis_error", op="delete", error=str(exc))
+
+    def clear_local(self) -> None:
+        """Empty the in-process tier."""
+        self._local.clear()
+
+
+# Global cache shared by all tools
+tool_cache = ToolResultCache()
@@ -0,0 +1,412 @@
+"""Shared HTTP transport for tools.
+
+Tools fetch upstream data (Screener.in, NSE/BSE, news, search) through
+``http_client`` instead of opening their own connections. It keeps one
+pooled ``httpx.AsyncClient`` per upstream host (HTTP/2 when ``h2`` is
+installed, keep-alive, at most ``http_max_connections_per_host``
+connections), so requests to a host reuse warm connections.
+
+GET responses that carry an ``ETag`` or ``Last-Modified`` are stored in a
+validator cache (an LRU in front of Redis). Later GETs for the same URL
+send ``If-None-Match`` / ``If-Modified-Since``, and a 304 is answered from
+the stored body. Transient failures are retried with full-jitter
+exponential backoff within the calling tool's deadline; requests that are
+not idempotent (POST, PATCH) are only resent when they never left the
+client. A per-host circuit breaker stops calling a host that keeps failing
+and lets one trial request through once ``http_breaker_reset_seconds`` have
+passed.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import importlib.util
+import json
+import random
+import time
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+
+from config import get_settings
+from tools.base import remaining_time
+from utils import get_redis, logger
+
+REDIS_PREFIX = "slingshot:http:"
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+# Failures before any of the request was sent; safe to retry for every method
+_NOT_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+# Response headers kept with a cached body (the rest describe the transfer)
+_STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "content-language")
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """The host's circuit breaker is open; the request was not sent."""
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"Circuit open for {host}; retry in {retry_in:.1f}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+# ---------------------------------------------------------------------------
+# Circuit breaker
+# ---------------------------------------------------------------------------
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker for one host: closed -> open -> half-open."""
+
+    def __init__(self, failures: int, reset_seconds: float) -> None:
+        self.max_failures = failures
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial = False  # a half-open trial request is in flight
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def before_request(self) -> float:
+        """0 if a request may go out, else seconds until the breaker half-opens."""
+        state = self.state
+        if state == "closed":
+            return 0.0
+        if state == "half_open" and not self._trial:
+            self._trial = True
+            return 0.0
+        return max(0.1, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    def record(self, ok: bool) -> bool:
+        """Record an outcome; returns True if this failure opened the circuit."""
+        self._trial = False
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            return False
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= self.max_failures:
+            was_closed = self.opened_at is None
+            self.opened_at = time.monotonic()
+            return was_closed
+        return False
+
+
+# ---------------------------------------------------------------------------
+# Validator cache (ETag / Last-Modified)
+# ---------------------------------------------------------------------------
+
+
+class _Stored:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: dict[str, str], body: bytes) -> None:
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def encode(self) -> bytes:
+        meta = json.dumps({"status": self.status, "headers": self.headers}).encode()
+        return meta + b"\n" + self.body
+
+    @classmethod
+    def decode(cls, raw: bytes) -> _Stored:
+        meta, _, body = raw.partition(b"\n")
+        data = json.loads(meta)
+        return cls(data["status"], data["headers"], body)
+
+
+class ValidatorCache:
+    """Bodies of responses with validators, in a size-bounded LRU in front of Redis."""
+
+    def __init__(self, max_bytes: int | None = None, use_redis: bool = True) -> None:
+        settings = get_settings()
+        self.max_bytes = max_bytes or settings.http_cache_max_bytes
+        self.ttl = settings.http_cache_ttl_seconds
+        self.use_redis = use_redis
+        self._local: OrderedDict[str, _Stored] = OrderedDict()
+        self._bytes = 0
+
+    @staticmethod
+    def key(url: httpx.URL, vary: str = "") -> str:
+        return hashlib.sha256(f"{url}\n{vary}".encode()).hexdigest()
+
+    def _remember(self, key: str, entry: _Stored) -> None:
+        old = self._local.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+        if len(entry.body) > self.max_bytes // 4:
+            return  # too large to be worth keeping in memory
+        self._local[key] = entry
+        self._bytes += len(entry.body)
+        while self._bytes > self.max_bytes:
+            _, dropped = self._local.popitem(last=False)
+            self._bytes -= len(dropped.body)
+
+    async def get(self, key: str) -> _Stored | None:
+        entry = self._local.get(key)
+        if entry is not None:
+            self._local.move_to_end(key)
+            return entry
+        if not self.use_redis:
+            return None
+        try:
+            raw = await get_redis().get(REDIS_PREFIX + key)
+        except Exception as exc:
+            await logger.awarning("http_cache_redis_error", op="get", error=str(exc))
+            return None
+        if raw is None:
+            return None
+        entry = _Stored.decode(raw)
+        self._remember(key, entry)
+        return entry
+
+    async def put(self, key: str, entry: _Stored) -> None:
+        self._remember(key, entry)
+        if not self.use_redis:
+            return
+        try:
+            await get_redis().set(REDIS_PREFIX + key, entry.encode(), ex=self.ttl)
+        except Exception as exc:
+            await logger.awarning("http_cache_redis_error", op="set", error=str(exc))
+
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class HttpClient:
+    """Pooled per-host clients with revalidation, retries and circuit breaking."""
+
+    def __init__(self, cache: ValidatorCache | None = None) -> None:
+        settings = get_settings()
+        self.max_connections = settings.http_max_connections_per_host
+        self.timeout = settings.http_timeout_seconds
+        self.max_retries = settings.http_max_retries
+        self.backoff_base = settings.http_backoff_base_seconds
+        self.backoff_max = settings.http_backoff_max_seconds
+        self.http2 = settings.http_http2 and importlib.util.find_spec("h2") is not None
+        self.headers = {"User-Agent": settings.http_user_agent}
+        self._breaker_failures = settings.http_breaker_failures
+        self._breaker_reset = settings.http_breaker_reset_seconds
+        self.cache = cache or ValidatorCache()
+        self._clients: dict[str, httpx.AsyncClient] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def client_for(self, host: str) -> httpx.AsyncClient:
+        client = self._clients.get(host)
+        if client is None:
+            client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                headers=self.headers,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=get_settings().http_keepalive_expiry_seconds,
+                ),
+            )
+            self._clients[host] = client
+        return client
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(self._breaker_failures, self._breaker_reset)
+            self._breakers[host] = breaker
+        return breaker
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: dict[str, Any] | None = None,
+        headers: dict[str, str] | None = None,
+        revalidate: bool = True,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> httpx.Response:
+        """Send a request through the host's pooled client.
+
+        For GETs with ``revalidate``, a stored response is revalidated with
+        its ETag / Last-Modified and returned (as 200) on a 304. Raises
+        ``CircuitOpenError`` while the host's breaker is open and
+        ``httpx.HTTPError`` once retries are exhausted; other 4xx/5xx
+        responses are returned for the caller to handle. Methods outside
+        ``IDEMPOTENT_METHODS`` are retried only on connection failures, so a
+        POST is never processed twice. ``timeout`` replaces
+        ``http_timeout_seconds`` for slow endpoints.
+        """
+        target = httpx.URL(url, params=params)
+        host = target.host
+        client = self.client_for(host)
+        breaker = self.breaker(host)
+        headers = dict(headers or {})
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        cache_key = stored = None
+        if method == "GET" and revalidate:
+            cache_key = self.cache.key(target, headers.get("Accept", ""))
+            stored = await self.cache.get(cache_key)
+            if stored is not None:
+                if etag := stored.headers.get("etag"):
+                    headers["If-None-Match"] = etag
+                if modified := stored.headers.get("last-modified"):
+                    headers["If-Modified-Since"] = modified
+
+        attempt = 0
+        while True:
+            wait = breaker.before_request()
+            if wait:
+                raise CircuitOpenError(host, wait)
+            budget = remaining_time()
+            limit = timeout or self.timeout
+            if budget is not None:
+                limit = min(limit, budget)
+            try:
+                response = await client.request(
+                    method, target, headers=headers, timeout=limit, **kwargs
+                )
+            except httpx.TransportError as exc:
+                error: Exception | None = exc
+                response = None
+            except BaseException:
+                # Cancelled (a tool deadline) or an unexpected error: still an
+                # outcome, so a half-open trial never stays in flight
+                breaker.record(False)
+                raise
+            else:
+                error = None
+
+            failed = error is not None or response.status_code in RETRY_STATUSES
+            opened = breaker.record(not failed)
+            if opened:
+                await logger.awarning("http_circuit_opened", host=host, failures=breaker.failures)
+            if not failed:
+                break
+            # A non-idempotent request that reached the server may have been
+            # processed; only resend it if it never left the client
+            resend = idempotent or isinstance(error, _NOT_SENT)
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+            if response is not None:
+                delay = max(delay, min(_retry_after(response) or 0.0, self.backoff_max))
+            budget = remaining_time()
+            out_of_time = budget is not None and delay >= budget
+            if opened or not resend or attempt >= self.max_retries or out_of_time:
+                if error is not None:
+                    raise error
+                break
+            attempt += 1
+            await logger.adebug(
+                "http_retry",
+                host=host,
+                attempt=attempt,
+                status=response.status_code if response is not None else None,
+                error=str(error) if error is not None else None,
+                delay_s=round(delay, 2),
+            )
+            if response is not None:
+                await response.aclose()
+            await asyncio.sleep(delay)
+
+        if cache_key is None:
+            return response
+        if response.status_code == 304 and stored is not None:
+            # Keep validators the server sent with the 304 for next time
+            for name in ("etag", "last-modified"):
+                if name in response.headers:
+                    stored.headers[name] = response.headers[name]
+            await self.cache.put(cache_key, stored)
+            return httpx.Response(
+                stored.status,
+                headers={**stored.headers, "x-cache": "revalidated"},
+                content=stored.body,
+                request=response.request,
+            )
+        if response.status_code == 200 and (
+            "etag" in response.headers or "last-modified" in response.headers
+        ):
+            stored_headers = {
+                name: response.headers[name] for name in _STORED_HEADERS if name in response.headers
+            }
+            await self.cache.put(cache_key, _Stored(200, stored_headers, response.content))
+        return response
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        method: str,
+        url: str,
+        *,
+        params: dict[str, Any] | None = None,
+        timeout: float | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[httpx.Response]:
+        """Send a request and yield its response with the body still unread.
+
+        For bodies consumed as they arrive (server-sent events). The outcome
+        counts toward the host's circuit breaker, but the request is never
+        retried: part of the body may already have been used. Raises
+        ``CircuitOpenError`` while the breaker is open.
+        """
+        target = httpx.URL(url, params=params)
+        breaker = self.breaker(target.host)
+        wait = breaker.before_request()
+        if wait:
+            raise CircuitOpenError(target.host, wait)
+        limit = timeout or self.timeout
+        budget = remaining_time()
+        if budget is not None:
+            limit = min(limit, budget)
+        failed = True  # until a response arrives
+        try:
+            async with self.client_for(target.host).stream(
+                method, target, timeout=limit, **kwargs
+            ) as response:
+                failed = response.status_code in RETRY_STATUSES
+                try:
+                    yield response
+                except httpx.TransportError:
+                    failed = True  # the body broke off
+                    raise
+        finally:
+            if breaker.record(not failed):
+                logger.warning("http_circuit_opened", host=target.host, failures=breaker.failures)
+
+    async def close(self) -> None:
+        clients, self._clients = self._clients, {}
+        await asyncio.gather(*(c.aclose() for c in clients.values()), return_exceptions=True)
+
+
+# Global transport shared by all tools in this process
+http_client = HttpClient()
@@ -2,33 +2,32 @@
 
 from __future__ import annotations
 
+import asyncio
 import time
 import uuid
+from collections import OrderedDict
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
 from functools import wraps
+from pathlib import Path
 from typing import Any
 
 import structlog
+from fastapi import Request
+from redis import asyncio as aioredis
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from config import get_settings
+from telemetry.logs import configure_logging
+from telemetry.metrics import instrument_engine
 
 # ---------------------------------------------------------------------------
 # Structured Logging
 # ---------------------------------------------------------------------------
 
-structlog.configure(
-    processors=[
-        structlog.contextvars.merge_contextvars,
-        structlog.processors.add_log_level,
-        structlog.processors.TimeStamper(fmt="iso"),
-        structlog.dev.ConsoleRenderer(),
-    ],
-    wrapper_class=structlog.make_filtering_bound_logger(0),
-    context_class=dict,
-    logger_factory=structlog.PrintLoggerFactory(),
-)
+configure_logging(get_settings())
 
 logger = structlog.get_logger()
 
@@ -40,9 +39,11 @@ _settings = get_settings()
 engine = create_async_engine(
     _settings.database_url,
     echo=_settings.debug,
-    pool_size=10,
-    max_overflow=20,
+    pool_size=_settings.db_pool_size,
+    max_overflow=_settings.db_max_overflow,
 )
+if _settings.metrics_enabled:
+    instrument_engine(engine)
 
 async_session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
@@ -58,6 +59,80 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             raise
 
 
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+
+def _alembic_head() -> str | None:
+    """Head revision of the migration scripts on disk (no database access)."""
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    return ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_current_head()
+
+
+async def check_schema_version() -> None:
+    """Verify the database is migrated to the code's Alembic head.
+
+    A single-row read instead of create_all's full introspection. With
+    ``auto_migrate`` (dev only) a stale schema is upgraded in place;
+    otherwise startup fails so a deploy never runs against the wrong schema.
+    """
+    head = _alembic_head()
+    async with engine.connect() as conn:
+        try:
+            current = (
+                await conn.execute(text("SELECT version_num FROM alembic_version"))
+            ).scalar_one_or_none()
+        except ProgrammingError:
+            current = None  # never migrated
+    if current == head:
+        return
+    if not _settings.auto_migrate:
+        raise RuntimeError(
+            f"Database schema is at {current or 'no revision'}, code expects {head}; "
+            "run `alembic upgrade head`"
+        )
+    from alembic import command
+    from alembic.config import Config
+
+    await logger.ainfo("schema_migrating", current=current, head=head)
+    # env.py runs its own event loop, so upgrade from a worker thread
+    await asyncio.to_thread(command.upgrade, Config(str(ALEMBIC_INI)), "head")
+
+
+async def warm_pool() -> None:
+    """Open ``pool_size`` connections up front so early requests skip connect cost."""
+    conns = await asyncio.gather(*(engine.connect() for _ in range(_settings.db_pool_size)))
+    try:
+        await asyncio.gather(*(conn.execute(text("SELECT 1")) for conn in conns))
+    finally:
+        # Returning them checks them back into the pool, still open
+        await asyncio.gather(*(conn.close() for conn in conns))
+
+
+# ---------------------------------------------------------------------------
+# Redis
+# ---------------------------------------------------------------------------
+
+_redis: aioredis.Redis | None = None
+
+
+def get_redis() -> aioredis.Redis:
+    """Return the shared Redis client (connections are opened lazily)."""
+    global _redis
+    if _redis is None:
+        _redis = aioredis.from_url(_settings.redis_url)
+    return _redis
+
+
+async def close_redis() -> None:
+    """Close the shared Redis client if it was ever opened."""
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
+
+
 # ---------------------------------------------------------------------------
 # ID Generation
 # ---------------------------------------------------------------------------
@@ -68,27 +143,125 @@ def generate_session_id() -> str:
     return str(uuid.uuid4())
 
 
+def get_user_id(request: Request) -> str:
+    """Identify the caller for per-user limits (no auth yet: header, else client IP)."""
+    user_id = request.headers.get("X-User-Id")
+    if user_id:
+        return user_id[:64]
+    return request.client.host if request.client else "anonymous"
+
+
 # ---------------------------------------------------------------------------
-# Rate Limiter (simple in-memory, swap for Redis in production)
+# Rate Limiters (GCRA: O(1) time and memory per key)
 # ---------------------------------------------------------------------------
 
 
 class RateLimiter:
-    """Simple token-bucket rate limiter."""
+    """In-memory GCRA rate limiter (equivalent to a token bucket).
+
+    Allows ``max_calls`` per ``period`` with bursts up to ``max_calls``. Each
+    key stores only its theoretical arrival time (TAT); a key whose TAT has
+    passed is indistinguishable from a fresh one, so idle keys are evicted.
+    """
 
-    def __init__(self, max_calls: int = 10, period: float = 60.0):
+    def __init__(self, max_calls: int = 10, period: float = 60.0, max_keys: int = 100_000):
         self.max_calls = max_calls
         self.period = period
-        self._calls: dict[str, list[float]] = {}
+        self.max_keys = max_keys
+        self._interval = period / max_calls
+        # key -> TAT, ordered by last update so idle keys sit at the front
+        self._tat: OrderedDict[str, float] = OrderedDict()
+
+    def retry_after(self, key: str) -> float:
+        """Consume a token if available; otherwise return seconds until one is."""
+        now = time.monotonic()
+        self._evict(now)
+        tat = max(self._tat.get(key, now), now)
+        allow_at = tat - (self.period - self._interval)
+        if now < allow_at:
+            return allow_at - now
+        self._tat[key] = tat + self._interval
+        self._tat.move_to_end(key)
+        return 0.0
 
     def is_allowed(self, key: str) -> bool:
-        now = time.time()
-        calls = self._calls.setdefault(key, [])
-        # Prune old calls
-        calls[:] = [t for t in calls if now - t < self.period]
-        if len(calls) >= self.max_calls:
-            return False
-        calls.append(now)
+        return self.retry_after(key) == 0.0
+
+    async def acquire(self, key: str, timeout: float | None = None) -> bool:
+        """Wait until a token is available. Returns False if ``timeout`` elapses first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (wait := self.retry_after(key)) > 0:
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+    def _evict(self, now: float) -> None:
+        # Amortised O(1): drop expired keys from the front, then enforce the cap
+        while self._tat:
+            key, tat = next(iter(self._tat.items()))
+            if tat > now and len(self._tat) < self.max_keys:
+                break
+            del self._tat[key]
+
+
+_GCRA_SCRIPT = """
+local interval = tonumber(ARGV[1])
+local tolerance = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000000 + tonumber(t[2])
+local tat = tonumber(redis.call('GET', KEYS[1])) or now
+if tat < now then tat = now end
+local allow_at = tat - tolerance
+if now < allow_at then return allow_at - now end
+local new_tat = tat + interval
+redis.call('SET', KEYS[1], string.format('%d', new_tat), 'PX', math.ceil((new_tat - now) / 1000))
+return 0
+"""
+
+
+class RedisRateLimiter:
+    """GCRA rate limiter whose state lives in Redis, shared by all workers.
+
+    Each check is a single atomic script call using the Redis server clock;
+    keys expire on their own once idle. Methods mirror ``RateLimiter`` but
+    are coroutines.
+    """
+
+    def __init__(
+        self,
+        max_calls: int = 10,
+        period: float = 60.0,
+        prefix: str = "slingshot:ratelimit:",
+        redis: aioredis.Redis | None = None,
+    ):
+        self.max_calls = max_calls
+        self.period = period
+        self.prefix = prefix
+        self._redis = redis
+        self._interval_us = int(period / max_calls * 1_000_000)
+        self._tolerance_us = int(period * 1_000_000) - self._interval_us
+        self._script = None
+
+    async def retry_after(self, key: str) -> float:
+        """Consume a token if available; otherwise return seconds until one is."""
+        if self._script is None:
+            self._script = (self._redis or get_redis()).register_script(_GCRA_SCRIPT)
+        wait_us = await self._script(
+            keys=[self.prefix + key], args=[self._interval_us, self._tolerance_us]
+        )
+        return int(wait_us) / 1_000_000
+
+    async def is_allowed(self, key: str) -> bool:
+        return await self.retry_after(key) == 0.0
+
+    async def acquire(self, key: str, timeout: float | None = None) -> bool:
+        """Wait until a token is available. Returns False if ``timeout`` elapses first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while (wait := await self.retry_after(key)) > 0:
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
         return True
 
 
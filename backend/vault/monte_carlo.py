@@ -0,0 +1,315 @@
+"""Monte Carlo value-at-risk, expected shortfall and drawdown for portfolios.
+
+Daily returns are simulated through the stress-test factor model: factor
+returns (market, sectors, commodities, rates) are drawn with the factor
+covariance through its Cholesky factor, so every path keeps the
+co-movement between factors, and each holding adds its own idiosyncratic
+noise. Fat tails are optional: with ``distribution="t"`` each path-day is
+scaled by a shared chi-square draw (a multivariate Student-t).
+
+Paths are split into fixed-size shards, each with its own child of one
+``SeedSequence``, so a seed gives the same result whatever the number of
+worker processes. Shards run in a process pool and simulate a bounded
+number of paths at a time, so memory does not grow with the path count.
+Volatilities and correlations are rounded long-run estimates for Indian
+markets, not fitted to price history.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Awaitable, Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from config import get_settings
+from vault.positions import Positions
+from vault.stress_test import COMMODITIES, FACTORS, SECTORS, exposure_matrix, normalize_sector
+
+TRADING_DAYS = 252
+
+# ---------------------------------------------------------------------------
+# Factor covariance
+# ---------------------------------------------------------------------------
+
+# Annualized volatility of each factor. Sector factors are the sector's own
+# move on top of its market beta; rates are in units of 100bp.
+MARKET_VOL = 0.18
+SECTOR_VOL = {
+    "banking": 0.12,
+    "financials": 0.15,
+    "it": 0.16,
+    "pharma": 0.14,
+    "fmcg": 0.11,
+    "auto": 0.13,
+    "oil_gas": 0.15,
+    "oil_marketing": 0.2,
+    "metals": 0.2,
+    "cement": 0.14,
+    "capital_goods": 0.15,
+    "realty": 0.25,
+    "telecom": 0.17,
+    "power": 0.18,
+    "chemicals": 0.16,
+    "consumer_durables": 0.14,
+    "aviation": 0.28,
+    "other": 0.12,
+}
+COMMODITY_VOL = {"crude_oil": 0.35, "base_metals": 0.22, "coal": 0.3, "gold": 0.14}
+RATES_VOL = 0.75
+IDIOSYNCRATIC_VOL = 0.22  # stock-specific, uncorrelated across holdings
+
+# Factor correlations not implied by the model; all other pairs are 0
+FACTOR_CORRELATION = {
+    ("market", "commodity:crude_oil"): 0.15,
+    ("market", "commodity:base_metals"): 0.35,
+    ("market", "commodity:gold"): -0.1,
+    ("market", "rates"): -0.2,
+    ("commodity:crude_oil", "commodity:base_metals"): 0.3,
+    ("commodity:crude_oil", "commodity:coal"): 0.35,
+    ("commodity:base_metals", "commodity:coal"): 0.25,
+    ("commodity:crude_oil", "rates"): 0.15,
+}
+
+
+def factor_covariance() -> np.ndarray:
+    """Annualized covariance of ``FACTORS``."""
+    vols = np.array(
+        [MARKET_VOL]
+        + [SECTOR_VOL[s] for s in SECTORS]
+        + [COMMODITY_VOL[c] for c in COMMODITIES]
+        + [RATES_VOL]
+    )
+    index = {name: i for i, name in enumerate(FACTORS)}
+    corr = np.eye(len(FACTORS))
+    for (a, b), rho in FACTOR_CORRELATION.items():
+        corr[index[a], index[b]] = corr[index[b], index[a]] = rho
+    return corr * np.outer(vols, vols)
+
+
+def cholesky(cov: np.ndarray) -> np.ndarray:
+    """Lower Cholesky factor, nudging the diagonal if ``cov`` is not quite positive definite."""
+    jitter = 0.0
+    scale = float(np.mean(np.diag(cov))) or 1.0
+    for _ in range(6):
+        try:
+            return np.linalg.cholesky(cov + jitter * np.eye(len(cov)))
+        except np.linalg.LinAlgError:
+            jitter = scale * 1e-10 if jitter == 0 else jitter * 100
+    raise ValueError("Covariance matrix is not positive semi-definite")
+
+
+# ---------------------------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------------------------
+
+
+class MonteCarloConfig(BaseModel):
+    paths: int = Field(..., gt=0)
+    horizon_days: int = Field(..., gt=0)
+    confidence_levels: list[float] = Field(default_factory=lambda: [0.95, 0.99])
+    distribution: str = "normal"  # normal | t
+    df: float = 5.0  # degrees of freedom for "t"
+    seed: int | None = None
+
+
+def _simulate_shard(
+    values: np.ndarray,
+    exposures: np.ndarray,
+    chol: np.ndarray,
+    idio_vol: float,
+    horizon: int,
+    paths: int,
+    seed: np.random.SeedSequence,
+    df: float | None,
+    chunk_paths: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Simulate ``paths`` daily paths; return their final P&L and max drawdown.
+
+    Runs in a pool process. Paths are processed ``chunk_paths`` at a time
+    and day by day, so the working set is ``chunk_paths x holdings``.
+    """
+    rng = np.random.default_rng(seed)
+    total = float(values.sum())
+    # Log-return drift that makes each holding's expected simple return zero
+    loadings = exposures @ chol
+    var = np.einsum("ij,ij->i", loadings, loadings) + idio_vol**2
+    drift = -0.5 * var
+    pnl = np.empty(paths)
+    drawdown = np.empty(paths)
+    for start in range(0, paths, chunk_paths):
+        n = min(chunk_paths, paths - start)
+        log_growth = np.zeros((n, len(values)))
+        peak = np.full(n, total)
+        worst = np.zeros(n)
+        value = peak.copy()
+        for _ in range(horizon):
+            factors = rng.standard_normal((n, chol.shape[0])) @ chol.T
+            returns = factors @ exposures.T
+            returns += idio_vol * rng.standard_normal(returns.shape)
+            if df is not None:
+                # Shared chi-square mixing: unit variance, fat joint tails
+                returns *= np.sqrt((df - 2) / rng.chisquare(df, n))[:, None]
+            log_growth += returns
+            log_growth += drift
+            value = np.exp(log_growth) @ values
+            np.maximum(peak, value, out=peak)
+            np.maximum(worst, 1 - value / peak, out=worst)
+        pnl[start : start + n] = value - total
+        drawdown[start : start + n] = worst
+    return pnl, drawdown
+
+
+def _summarize(
+    pnl: np.ndarray, drawdown: np.ndarray, total: float, config: MonteCarloConfig
+) -> dict[str, Any]:
+    def money(x: float) -> float:
+        return round(float(x), 2)
+
+    def pct(x: float) -> float:
+        return round(float(x / total * 100), 2) if total else 0.0
+
+    losses = np.sort(-pnl)
+    risk = []
+    for level in config.confidence_levels:
+        cut = int(np.floor(level * len(losses)))
+        var = losses[min(cut, len(losses) - 1)]
+        cvar = losses[cut:].mean() if cut < len(losses) else var
+        risk.append(
+            {
+                "confidence": level,
+                "var": money(var),
+                "var_pct": pct(var),
+                "cvar": money(cvar),
+                "cvar_pct": pct(cvar),
+            }
+        )
+    quantiles = (1, 5, 25, 50, 75, 95, 99)
+    return {
+        "portfolio_value": money(total),
+        "paths": len(pnl),
+        "horizon_days": config.horizon_days,
+        "distribution": config.distribution,
+        "seed": config.seed,
+        "expected_pnl": money(pnl.mean()),
+        "probability_of_loss": round(float((pnl < 0).mean()), 4),
+        "pnl_percentiles": {
+            str(q): money(v) for q, v in zip(quantiles, np.percentile(pnl, quantiles))
+        },
+        "risk": risk,
+        "max_drawdown": {
+            "mean_pct": round(float(drawdown.mean() * 100), 2),
+            "p95_pct": round(float(np.percentile(drawdown, 95) * 100), 2),
+            "worst_pct": round(float(drawdown.max() * 100), 2),
+        },
+    }
+
+
+ProgressCallback = Callable[[int, int], Awaitable[None]]
+
+
+class MonteCarloEngine:
+    """Runs simulations on a shared pool of worker processes."""
+
+    def __init__(self, workers: int | None = None) -> None:
+        settings = get_settings()
+        self.workers = workers or settings.mc_workers or os.cpu_count() or 1
+        self.paths_per_shard = settings.mc_paths_per_shard
+        self.chunk_bytes = settings.mc_chunk_bytes
+        self._pool: ProcessPoolExecutor | None = None
+
+    async def simulate(
+        self,
+        positions: Positions,
+        config: MonteCarloConfig,
+        on_progress: ProgressCallback | None = None,
+    ) -> dict[str, Any]:
+        """Simulate ``config.paths`` paths and summarize VaR, CVaR and drawdown."""
+        if config.distribution not in ("normal", "t"):
+            raise ValueError(f"Unknown distribution: {config.distribution}")
+        if config.distribution == "t" and config.df <= 2:
+            raise ValueError("Degrees of freedom must be greater than 2")
+        if not all(0.5 <= level < 1 for level in config.confidence_levels):
+            raise ValueError("Confidence levels must be between 0.5 and 1")
+        if config.seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+            config = config.model_copy(update={"seed": seed})
+
+        values = positions.values
+        total = float(values.sum())
+        if not len(values) or total <= 0:
+            raise ValueError("Portfolio has no holdings with a value")
+
+        labels, inverse = np.unique(positions.sectors, return_inverse=True)
+        sectors = np.array([normalize_sector(label) for label in labels], dtype=object)[inverse]
+        exposures = exposure_matrix(sectors)
+        chol = cholesky(factor_covariance() / TRADING_DAYS)
+        idio_vol = IDIOSYNCRATIC_VOL / np.sqrt(TRADING_DAYS)
+        df = config.df if config.distribution == "t" else None
+        # Two (chunk x holdings) float64 arrays dominate a shard's memory
+        chunk_paths = max(1, min(self.paths_per_shard, self.chunk_bytes // (16 * len(values))))
+
+        sizes = [self.paths_per_shard] * (config.paths // self.paths_per_shard)
+        if config.paths % self.paths_per_shard:
+            sizes.append(config.paths % self.paths_per_shard)
+        seeds = np.random.SeedSequence(config.seed).spawn(len(sizes))
+
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        futures = [
+            loop.run_in_executor(
+                pool,
+                _simulate_shard,
+                values,
+                exposures,
+                chol,
+                idio_vol,
+                config.horizon_days,
+                size,
+                seed,
+                df,
+                chunk_paths,
+            )
+            for size, seed in zip(sizes, seeds)
+        ]
+
+        async def tracked(i: int, future: asyncio.Future) -> tuple[int, Any]:
+            return i, await future
+
+        results: list[Any] = [None] * len(futures)
+        done = 0
+        try:
+            for next_done in asyncio.as_completed([tracked(i, f) for i, f in enumerate(futures)]):
+                i, result = await next_done
+                results[i] = result
+                done += sizes[i]
+                if on_progress is not None:
+                    await on_progress(done, config.paths)
+        finally:
+            for future in futures:
+                future.cancel()
+
+        # Concatenate in shard order so the output does not depend on scheduling
+        pnl = np.concatenate([r[0] for r in results])
+        drawdown = np.concatenate([r[1] for r in results])
+        return _summarize(pnl, drawdown, total, config)
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown, cancel_futures=True)
+            self._pool = None
+
+
+monte_carlo_engine = MonteCarloEngine()
@@ -0,0 +1,63 @@
+"""Columnar view of a portfolio's holdings for the risk engines."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import Holding
+from services.market_data import MarketDataStore, market_data
+
+
+@dataclass
+class Positions:
+    """One array per column, one row per holding."""
+
+    tickers: np.ndarray  # str
+    sectors: np.ndarray  # str, "" when unknown
+    quantity: np.ndarray  # float64
+    price: np.ndarray  # float64: current price, else last stored close, else average buy price
+
+    @property
+    def values(self) -> np.ndarray:
+        return self.quantity * self.price
+
+    def __len__(self) -> int:
+        return len(self.tickers)
+
+
+async def load_positions(
+    db: AsyncSession, portfolio_id: UUID, prices: MarketDataStore = market_data
+) -> Positions:
+    """Load holdings straight into columns, without building ORM objects."""
+    rows = (
+        await db.execute(
+            select(
+                Holding.ticker,
+                Holding.sector,
+                Holding.quantity,
+                Holding.current_price,
+                Holding.avg_buy_price,
+            ).where(Holding.portfolio_id == portfolio_id)
+        )
+    ).all()
+    if not rows:
+        empty = np.empty(0)
+        return Positions(np.empty(0, dtype=str), np.empty(0, dtype=str), empty, empty)
+    tickers, sectors, quantity, current, avg = zip(*rows)
+    price = np.array(current, dtype=np.float64)  # None -> nan
+    missing = np.isnan(price)
+    if missing.any():
+        price[missing] = prices.latest_close([t for t, m in zip(tickers, missing) if m])
+        missing = np.isnan(price)
+        price[missing] = np.array(avg, dtype=np.float64)[missing]
+    return Positions(
+        tickers=np.array(tickers),
+        sectors=np.array([s or "" for s in sectors]),
+        quantity=np.array(quantity, dtype=np.float64),
+        price=price,
+    )
@@ -0,0 +1,431 @@
+"""Portfolio stress testing with a linear factor model.
+
+Each holding is exposed to a set of factors: the market (through its sector
+beta), its own sector, commodity prices and interest rates. A scenario is
+a vector of factor shocks. Stacking scenarios as columns of a shock matrix
+turns every scenario for every holding into one matrix product:
+
+    returns (holdings x scenarios)
+        = exposures (holdings x factors) @ shocks (factors x scenarios)
+
+Historical replays give realised sector returns directly. They are
+converted into shocks so that each sector's holdings get exactly that
+return. Betas, sensitivities and historical moves are rounded estimates for
+Indian sectors, meant for scenario analysis rather than precise attribution.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Any
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from vault.positions import Positions
+
+# ---------------------------------------------------------------------------
+# Factor model
+# ---------------------------------------------------------------------------
+
+SECTORS = (
+    "banking",
+    "financials",
+    "it",
+    "pharma",
+    "fmcg",
+    "auto",
+    "oil_gas",
+    "oil_marketing",
+    "metals",
+    "cement",
+    "capital_goods",
+    "realty",
+    "telecom",
+    "power",
+    "chemicals",
+    "consumer_durables",
+    "aviation",
+    "other",
+)
+COMMODITIES = ("crude_oil", "base_metals", "coal", "gold")
+
+SECTOR_BETA = {
+    "banking": 1.15,
+    "financials": 1.25,
+    "it": 0.85,
+    "pharma": 0.65,
+    "fmcg": 0.6,
+    "auto": 1.1,
+    "oil_gas": 0.95,
+    "oil_marketing": 1.0,
+    "metals": 1.4,
+    "cement": 1.0,
+    "capital_goods": 1.15,
+    "realty": 1.5,
+    "telecom": 0.8,
+    "power": 1.05,
+    "chemicals": 1.0,
+    "consumer_durables": 0.95,
+    "aviation": 1.2,
+    "other": 1.0,
+}
+
+# Return for a +100% move in the commodity price
+COMMODITY_SENSITIVITY = {
+    "crude_oil": {
+        "oil_gas": 0.25,
+        "oil_marketing": -0.35,
+        "aviation": -0.4,
+        "chemicals": -0.15,
+        "cement": -0.1,
+        "auto": -0.08,
+        "consumer_durables": -0.08,
+        "fmcg": -0.05,
+    },
+    "base_metals": {
+        "metals": 0.6,
+        "consumer_durables": -0.1,
+        "auto": -0.1,
+        "capital_goods": -0.08,
+        "realty": -0.05,
+    },
+    "coal": {"power": -0.1, "cement": -0.1, "metals": -0.05},
+    "gold": {"financials": 0.05},
+}
+
+# Return for a +100bp move in policy rates
+RATE_SENSITIVITY = {
+    "banking": -0.04,
+    "financials": -0.08,
+    "realty": -0.12,
+    "auto": -0.05,
+    "capital_goods": -0.05,
+    "power": -0.06,
+    "consumer_durables": -0.05,
+    "fmcg": -0.02,
+    "it": 0.01,
+    "pharma": -0.01,
+}
+DEFAULT_RATE_SENSITIVITY = -0.03
+
+FACTORS = (
+    ("market",)
+    + tuple(f"sector:{s}" for s in SECTORS)
+    + tuple(f"commodity:{c}" for c in COMMODITIES)
+    + ("rates",)
+)
+_FACTOR_INDEX = {name: i for i, name in enumerate(FACTORS)}
+_SECTOR_INDEX = {s: i for i, s in enumerate(SECTORS)}
+
+# Sector labels seen in broker exports and symbol masters
+_SECTOR_ALIASES = {
+    "bank": "banking",
+    "banks": "banking",
+    "privatebank": "banking",
+    "psubank": "banking",
+    "financialservices": "financials",
+    "finance": "financials",
+    "nbfc": "financials",
+    "insurance": "financials",
+    "informationtechnology": "it",
+    "itservices": "it",
+    "software": "it",
+    "technology": "it",
+    "healthcare": "pharma",
+    "pharmaceuticals": "pharma",
+    "consumerstaples": "fmcg",
+    "automobile": "auto",
+    "automobiles": "auto",
+    "autoancillaries": "auto",
+    "oilandgas": "oil_gas",
+    "oilgas": "oil_gas",
+    "energy": "oil_gas",
+    "refineries": "oil_marketing",
+    "omc": "oil_marketing",
+    "metal": "metals",
+    "mining": "metals",
+    "steel": "metals",
+    "constructionmaterials": "cement",
+    "infrastructure": "capital_goods",
+    "industrials": "capital_goods",
+    "capitalgoods": "capital_goods",
+    "realestate": "realty",
+    "telecommunication": "telecom",
+    "utilities": "power",
+    "specialtychemicals": "chemicals",
+    "consumerdurables": "consumer_durables",
+    "airlines": "aviation",
+}
+
+
+_SECTOR_KEYS = {s.replace("_", ""): s for s in SECTORS} | _SECTOR_ALIASES
+
+
+def normalize_sector(label: str | None) -> str:
+    """Map a free-text sector label onto one of ``SECTORS`` ("other" if unknown)."""
+    return _SECTOR_KEYS.get(re.sub(r"[^a-z]", "", (label or "").lower()), "other")
+
+
+def _scenario_sector(label: str) -> str:
+    sector = normalize_sector(label)
+    if sector == "other" and label.lower() != "other":
+        raise ValueError(f"Unknown sector: {label}")
+    return sector
+
+
+def exposure_matrix(sectors: np.ndarray) -> np.ndarray:
+    """Factor exposures (holdings x factors) for canonical sector labels."""
+    exposures = np.zeros((len(sectors), len(FACTORS)))
+    # Each row only depends on the sector, so fill one row per sector and gather
+    rows = np.zeros((len(SECTORS), len(FACTORS)))
+    for i, sector in enumerate(SECTORS):
+        rows[i, _FACTOR_INDEX["market"]] = SECTOR_BETA[sector]
+        rows[i, _FACTOR_INDEX[f"sector:{sector}"]] = 1.0
+        for commodity, sensitivity in COMMODITY_SENSITIVITY.items():
+            rows[i, _FACTOR_INDEX[f"commodity:{commodity}"]] = sensitivity.get(sector, 0.0)
+        rows[i, _FACTOR_INDEX["rates"]] = RATE_SENSITIVITY.get(sector, DEFAULT_RATE_SENSITIVITY)
+    if len(sectors):
+        exposures[:] = rows[[_SECTOR_INDEX[s] for s in sectors]]
+    return exposures
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+# ---------------------------------------------------------------------------
+
+
+class Scenario(BaseModel):
+    """Factor shocks; returns and commodity moves are fractions (-0.2 = -20%)."""
+
+    name: str
+    description: str = ""
+    market: float = 0.0
+    sectors: dict[str, float] = Field(default_factory=dict)  # extra return on top of beta
+    commodities: dict[str, float] = Field(default_factory=dict)
+    rate_bps: float = 0.0
+    # Historical replays: realised total return per sector, used as-is
+    sector_returns: dict[str, float] = Field(default_factory=dict)
+
+    def shocks(self) -> np.ndarray:
+        """This scenario as a column of the shock matrix."""
+        vector = np.zeros(len(FACTORS))
+        vector[_FACTOR_INDEX["market"]] = self.market
+        for sector, shock in self.sectors.items():
+            vector[_FACTOR_INDEX[f"sector:{_scenario_sector(sector)}"]] += shock
+        for commodity, move in self.commodities.items():
+            if f"commodity:{commodity}" not in _FACTOR_INDEX:
+                raise ValueError(f"Unknown commodity: {commodity}")
+            vector[_FACTOR_INDEX[f"commodity:{commodity}"]] = move
+        vector[_FACTOR_INDEX["rates"]] = self.rate_bps / 100
+        for sector, realised in self.sector_returns.items():
+            sector = _scenario_sector(sector)
+            # Cancel the beta-driven part so the sector lands exactly on `realised`
+            beta_part = SECTOR_BETA[sector] * self.market
+            vector[_FACTOR_INDEX[f"sector:{sector}"]] = realised - beta_part
+        return vector
+
+
+def _replay(name: str, description: str, market: float, **sector_returns: float) -> Scenario:
+    return Scenario(
+        name=name, description=description, market=market, sector_returns=sector_returns
+    )
+
+
+SCENARIOS: dict[str, Scenario] = {
+    s.name: s
+    for s in (
+        Scenario(name="market_crash", description="Broad market falls 30%", market=-0.30),
+        Scenario(name="market_correction", description="Broad market falls 10%", market=-0.10),
+        Scenario(
+            name="rate_hike",
+            description="RBI hikes 100bp; market dips 3%",
+            market=-0.03,
+            rate_bps=100,
+        ),
+        Scenario(name="rate_cut", description="RBI cuts 50bp", rate_bps=-50),
+        Scenario(
+            name="crude_spike",
+            description="Crude oil up 50%; market dips 5%",
+            market=-0.05,
+            commodities={"crude_oil": 0.5},
+        ),
+        Scenario(
+            name="crude_crash", description="Crude oil down 40%", commodities={"crude_oil": -0.4}
+        ),
+        Scenario(
+            name="commodity_supercycle",
+            description="Crude, metals and coal up 30%",
+            commodities={"crude_oil": 0.3, "base_metals": 0.3, "coal": 0.3},
+        ),
+        Scenario(
+            name="sector_rotation",
+            description="Defensives and IT sold for banks and capital goods",
+            sectors={
+                "it": -0.10,
+                "pharma": -0.05,
+                "fmcg": -0.06,
+                "banking": 0.08,
+                "capital_goods": 0.10,
+            },
+        ),
+        Scenario(
+            name="us_recession",
+            description="US recession hits IT exports; market falls 12%",
+            market=-0.12,
+            sectors={"it": -0.15, "pharma": 0.03},
+        ),
+        _replay(
+            "historical_gfc_2008",
+            "Global financial crisis, Jan-Oct 2008",
+            -0.60,
+            banking=-0.60,
+            financials=-0.70,
+            it=-0.55,
+            pharma=-0.35,
+            fmcg=-0.25,
+            auto=-0.60,
+            oil_gas=-0.55,
+            metals=-0.75,
+            cement=-0.55,
+            capital_goods=-0.70,
+            realty=-0.90,
+            telecom=-0.50,
+            power=-0.65,
+        ),
+        _replay(
+            "historical_covid_2020",
+            "COVID-19 crash, 19 Feb - 23 Mar 2020",
+            -0.38,
+            banking=-0.45,
+            financials=-0.48,
+            it=-0.30,
+            pharma=-0.15,
+            fmcg=-0.22,
+            auto=-0.45,
+            oil_gas=-0.35,
+            oil_marketing=-0.35,
+            metals=-0.42,
+            cement=-0.35,
+            capital_goods=-0.42,
+            realty=-0.48,
+            telecom=-0.20,
+            power=-0.35,
+            chemicals=-0.30,
+            consumer_durables=-0.35,
+            aviation=-0.55,
+        ),
+        _replay(
+            "historical_taper_tantrum_2013",
+            "Taper tantrum, May-Aug 2013",
+            -0.12,
+            banking=-0.30,
+            financials=-0.30,
+            it=0.15,
+            pharma=0.05,
+            fmcg=-0.05,
+            auto=-0.10,
+            metals=-0.15,
+            cement=-0.20,
+            capital_goods=-0.30,
+            realty=-0.40,
+            power=-0.25,
+        ),
+        _replay(
+            "historical_demonetisation_2016",
+            "Demonetisation, Nov-Dec 2016",
+            -0.08,
+            banking=-0.10,
+            financials=-0.18,
+            fmcg=-0.10,
+            auto=-0.12,
+            cement=-0.12,
+            realty=-0.25,
+            consumer_durables=-0.15,
+        ),
+        _replay(
+            "historical_ilfs_2018",
+            "IL&FS default, Sep-Oct 2018",
+            -0.13,
+            banking=-0.15,
+            financials=-0.30,
+            realty=-0.30,
+            it=0.03,
+        ),
+    )
+}
+
+
+def resolve_scenarios(
+    scenario_name: str, parameters: dict[str, Any], extra: list[str]
+) -> list[Scenario]:
+    """Scenarios for a request: built-ins by name ("all" for every one), else custom.
+
+    A name that is not built in is a custom scenario described by
+    ``parameters`` (``market``, ``sectors``, ``commodities``, ``rate_bps``).
+    """
+    scenarios = []
+    for name in [scenario_name, *extra]:
+        if name == "all":
+            scenarios.extend(SCENARIOS.values())
+        elif name in SCENARIOS:
+            scenarios.append(SCENARIOS[name])
+        elif name == scenario_name and parameters:
+            scenarios.append(Scenario(name=name, description="Custom scenario", **parameters))
+        else:
+            raise ValueError(f"Unknown scenario: {name}")
+    return list({s.name: s for s in scenarios}.values())
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+
+def run_stress_tests(
+    positions: Positions, scenarios: list[Scenario], top_n: int = 5
+) -> dict[str, Any]:
+    """Apply every scenario to every holding in one batched matrix product."""
+    values = positions.values
+    total = float(values.sum())
+    labels, inverse = np.unique(positions.sectors, return_inverse=True)
+    sectors = np.array([normalize_sector(label) for label in labels], dtype=object)[inverse]
+
+    exposures = exposure_matrix(sectors)  # holdings x factors
+    shocks = np.column_stack([s.shocks() for s in scenarios])  # factors x scenarios
+    returns = np.maximum(exposures @ shocks, -1.0)  # a holding cannot lose more than 100%
+    pnl = values[:, None] * returns  # holdings x scenarios
+    totals = pnl.sum(axis=0)
+
+    present, sector_of = np.unique(sectors, return_inverse=True)
+    by_sector = np.zeros((len(present), len(scenarios)))
+    np.add.at(by_sector, sector_of, pnl)
+
+    k = min(top_n, len(values))
+    worst = np.argsort(pnl, axis=0)[:k]  # most negative first, per scenario
+
+    results = []
+    for j, scenario in enumerate(scenarios):
+        results.append(
+            {
+                "scenario": scenario.name,
+                "description": scenario.description,
+                "pnl": round(float(totals[j]), 2),
+                "pnl_pct": round(float(totals[j] / total * 100), 2) if total else 0.0,
+                "stressed_value": round(total + float(totals[j]), 2),
+                "by_sector": {
+                    str(sector): round(float(by_sector[i, j]), 2)
+                    for i, sector in enumerate(present)
+                },
+                "worst_holdings": [
+                    {
+                        "ticker": str(positions.tickers[i]),
+                        "pnl": round(float(pnl[i, j]), 2),
+                        "return_pct": round(float(returns[i, j] * 100), 2),
+                    }
+                    for i in worst[:, j]
+                    if pnl[i, j] < 0
+                ],
+            }
+        )
+    return {"portfolio_value": round(total, 2), "scenarios": results}
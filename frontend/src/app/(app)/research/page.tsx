@@ -141,7 +141,10 @@ export default function HomePage() {
         research.setSession(res);
 
         // Connect WebSocket for real-time updates
-        createResearchSocket(res.session_id, thoughts.handleWSEvent);
+        createResearchSocket(res.session_id, (event) => {
+          thoughts.handleWSEvent(event);
+          research.handleWSEvent(event);
+        });
       } catch {
         // For demo purposes, show the demo data
         setShowDemo(true);
@@ -28,15 +28,33 @@ export function createMacroSocket(
   return createSocket(url, onEvent);
 }
 
+function isFinal(event: WSEvent) {
+  return (
+    event.event === "report_complete" ||
+    event.event === "error" ||
+    (event.event === "status_change" &&
+      (event.status === "complete" ||
+        event.status === "error" ||
+        event.status === "cancelled"))
+  );
+}
+
 function createSocket(url: string, onEvent: WSEventHandler) {
   let ws: WebSocket | null = null;
   let pingInterval: ReturnType<typeof setInterval> | null = null;
+  // Highest event seq seen; the server replays anything after it on reconnect
+  let lastSeq = 0;
+  let finished = false;
+  let closedByClient = false;
+  let retryDelay = 1_000;
 
   function connect() {
-    ws = new WebSocket(url);
+    if (closedByClient) return;
+    ws = new WebSocket(`${url}?last_seq=${lastSeq}`);
 
     ws.onopen = () => {
       console.log("[WS] Connected:", url);
+      retryDelay = 1_000;
       // Keep-alive ping every 30s
       pingInterval = setInterval(() => {
         if (ws?.readyState === WebSocket.OPEN) {
@@ -48,8 +66,17 @@ function createSocket(url: string, onEvent: WSEventHandler) {
     ws.onmessage = (msg) => {
       if (msg.data === "pong") return;
       try {
-        const event: WSEvent = JSON.parse(msg.data);
-        onEvent(event);
+        // A client that falls behind receives queued events as one JSON array
+        const parsed: WSEvent | WSEvent[] = JSON.parse(msg.data);
+        const events = Array.isArray(parsed) ? parsed : [parsed];
+        for (const event of events) {
+          if (event.seq !== undefined) {
+            if (event.seq <= lastSeq) continue;
+            lastSeq = event.seq;
+          }
+          if (isFinal(event)) finished = true;
+          onEvent(event);
+        }
       } catch (err) {
         console.error("[WS] Failed to parse message:", err);
       }
@@ -58,6 +85,10 @@ function createSocket(url: string, onEvent: WSEventHandler) {
     ws.onclose = () => {
       console.log("[WS] Disconnected:", url);
       if (pingInterval) clearInterval(pingInterval);
+      if (!closedByClient && !finished) {
+        setTimeout(connect, retryDelay);
+        retryDelay = Math.min(retryDelay * 2, 10_000);
+      }
     };
 
     ws.onerror = (err) => {
@@ -66,6 +97,7 @@ function createSocket(url: string, onEvent: WSEventHandler) {
   }
 
   function disconnect() {
+    closedByClient = true;
     if (pingInterval) clearInterval(pingInterval);
     if (ws) {
       ws.close();
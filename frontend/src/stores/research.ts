@@ -1,13 +1,50 @@
 // Zustand store for research state
 
 import { create } from "zustand";
+import { getReport } from "@/lib/api";
 import type {
   ResearchResponse,
   ResearchStatus,
   ThoughtStep,
   Citation,
+  ReportSection,
+  WSEvent,
+  WSReportCompleteEvent,
 } from "@/types";
 
+// Streamed report text by section; chunks sit at their report-wide index
+type ReportChunks = Record<ReportSection, string[]>;
+
+const SECTIONS: ReportSection[] = ["executive_summary", "full_report"];
+
+async function sha256Hex(text: string): Promise<string> {
+  const digest = await crypto.subtle.digest(
+    "SHA-256",
+    new TextEncoder().encode(text)
+  );
+  return Array.from(new Uint8Array(digest), (b) =>
+    b.toString(16).padStart(2, "0")
+  ).join("");
+}
+
+async function matches(
+  chunks: ReportChunks,
+  expected: WSReportCompleteEvent["sections"]
+): Promise<boolean> {
+  for (const section of SECTIONS) {
+    const text = chunks[section].join("");
+    const want = expected[section];
+    if (
+      !want ||
+      new TextEncoder().encode(text).length !== want.bytes ||
+      (await sha256Hex(text)) !== want.sha256
+    ) {
+      return false;
+    }
+  }
+  return true;
+}
+
 interface ResearchStore {
   // Current session
   sessionId: string | null;
@@ -18,6 +55,7 @@ interface ResearchStore {
   executiveSummary: string | null;
   fullReport: string | null;
   error: string | null;
+  reportChunks: ReportChunks;
 
   // Loading
   isLoading: boolean;
@@ -27,6 +65,7 @@ interface ResearchStore {
   addThoughtStep: (step: ThoughtStep) => void;
   setStatus: (status: ResearchStatus) => void;
   setReport: (summary: string, report: string) => void;
+  handleWSEvent: (event: WSEvent) => void;
   setError: (message: string) => void;
   setLoading: (loading: boolean) => void;
   reset: () => void;
@@ -41,10 +80,11 @@ const initialState = {
   executiveSummary: null,
   fullReport: null,
   error: null,
+  reportChunks: { executive_summary: [], full_report: [] },
   isLoading: false,
 };
 
-export const useResearchStore = create<ResearchStore>((set) => ({
+export const useResearchStore = create<ResearchStore>((set, get) => ({
   ...initialState,
 
   setSession: (res) =>
@@ -73,6 +113,42 @@ export const useResearchStore = create<ResearchStore>((set) => ({
       status: "complete",
     }),
 
+  handleWSEvent: (event) => {
+    switch (event.event) {
+      case "report_delta":
+        set((state) => {
+          // A replayed chunk lands on its own index, so it is never doubled
+          const chunks = state.reportChunks[event.section].slice();
+          chunks[event.index] = event.text;
+          const text = chunks.join("");
+          return {
+            reportChunks: { ...state.reportChunks, [event.section]: chunks },
+            ...(event.section === "executive_summary"
+              ? { executiveSummary: text }
+              : { fullReport: text }),
+          };
+        });
+        break;
+      case "report_complete": {
+        const { sessionId, reportChunks } = get();
+        matches(reportChunks, event.sections).then(async (ok) => {
+          if (get().sessionId !== sessionId) return;
+          if (ok) {
+            set({ status: "complete" });
+            return;
+          }
+          // Chunks were missed (e.g. a truncated replay): use the stored report
+          const report = await getReport(event.session_id);
+          if (get().sessionId !== sessionId) return;
+          get().setReport(report.executive_summary, report.full_report);
+        }).catch((err) => {
+          console.error("[Research] Failed to load report:", err);
+        });
+        break;
+      }
+    }
+  },
+
   setError: (message) => set({ error: message, status: "error" }),
 
   setLoading: (loading) => set({ isLoading: loading }),
@@ -31,7 +31,7 @@ export const useThoughtsStore = create<ThoughtsStore>((set, get) => ({
       case "status_change":
         set({ currentStatus: event.status });
         break;
-      case "report_ready":
+      case "report_complete":
         set({ currentStatus: "complete" });
         break;
       case "error":
@@ -49,7 +49,8 @@ export type ResearchStatus =
   | "reflecting"
   | "reporting"
   | "complete"
-  | "error";
+  | "error"
+  | "cancelled";
 
 export interface ResearchRequest {
   query: string;
@@ -121,33 +122,57 @@ export interface MacroAnalysisResponse {
 export interface WSThoughtEvent {
   event: "thought_step";
   session_id: string;
+  seq?: number;
   data: ThoughtStep;
 }
 
 export interface WSStatusEvent {
   event: "status_change";
   session_id: string;
+  seq?: number;
   status: ResearchStatus;
 }
 
-export interface WSReportEvent {
-  event: "report_ready";
+export type ReportSection = "executive_summary" | "full_report";
+
+export interface WSReportDeltaEvent {
+  event: "report_delta";
   session_id: string;
-  executive_summary: string;
-  full_report: string;
+  seq?: number;
+  section: ReportSection;
+  /** Chunk number across the whole report, from 0 */
+  index: number;
+  text: string;
+}
+
+export interface WSReportCompleteEvent {
+  event: "report_complete";
+  session_id: string;
+  seq?: number;
+  chunks: number;
+  /** UTF-8 length and SHA-256 of each reassembled section */
+  sections: Record<ReportSection, { bytes: number; sha256: string }>;
 }
 
 export interface WSErrorEvent {
   event: "error";
   session_id: string;
+  seq?: number;
   message: string;
 }
 
+export interface WSReplayTruncatedEvent {
+  event: "replay_truncated";
+  session_id: string;
+}
+
 export type WSEvent =
   | WSThoughtEvent
   | WSStatusEvent
-  | WSReportEvent
-  | WSErrorEvent;
+  | WSReportDeltaEvent
+  | WSReportCompleteEvent
+  | WSErrorEvent
+  | WSReplayTruncatedEvent;
 
 // ==========================================================================
 // Portfolio types